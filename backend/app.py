@@ -1,20 +1,37 @@
-from flask_mail import Mail
 from routes import routes
 from flask import Flask
 from flask_cors import CORS
 from models import db
-from config import Config
+from commands import register_commands
+from query_stats import init_query_stats
+from metrics import init_metrics
+from logging_setup import init_logging
+from db_pool import init_pool
+from json_provider import init_json
 
-app = Flask(__name__)
-app.register_blueprint(routes)
-app.config.from_object(Config)
-CORS(app, supports_credentials=True)
-db.init_app(app)
-mail = Mail()
-mail.init_app(app)
+# Fábrica de la aplicación. Crear la app no toca la base: las tablas se crean
+# con `flask --app app crear-tablas` (una vez por despliegue, no en cada
+# arranque). Flask-Mail y el generador de PDFs se cargan con el primer uso.
+#
+# `config_object` es la clase o la ruta de importación de la configuración
+# (None para no cargar ninguna); `overrides` se aplican encima.
+def create_app(config_object='config.Config', **overrides):
+    app = Flask(__name__)
+    app.register_blueprint(routes)
+    if config_object is not None:
+        app.config.from_object(config_object)
+    app.config.update(overrides)
+    init_logging(app)
+    init_json(app)
+    # El frontend necesita leer las cabeceras de paginación (pagination.py)
+    CORS(app, supports_credentials=True, expose_headers=['X-Next-Cursor', 'Link'])
+    init_pool(app)
+    db.init_app(app)
+    register_commands(app)
+    init_query_stats(app)
+    init_metrics(app)
+    return app
 
-with app.app_context():
-    db.create_all()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
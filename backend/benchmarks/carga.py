@@ -0,0 +1,174 @@
+from datetime import datetime
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Prueba de carga del servidor de producción (gunicorn) con distinto número
+# de workers. Genera datos sintéticos, levanta gunicorn con gunicorn.conf.py
+# para cada valor de --workers y mide peticiones por segundo y latencia con
+# --concurrency clientes HTTP (keep-alive) durante --duration segundos.
+#
+#   cd backend
+#   python -m benchmarks.carga --workers 1 2 4 --threads 4 --output carga.json
+#
+# Por defecto usa un SQLite temporal; --database-url permite usar PostgreSQL
+# (la base debe estar vacía: se crean y borran las tablas).
+
+WORKERS = [1, 2, 4]
+# Mezcla de peticiones: listado paginado y detalle de una visita
+PATHS = ['/visitas?limit=50', '/visita/{visita_id}']
+
+
+# Fábrica para gunicorn: benchmarks.carga:server_app()
+def server_app():
+    from benchmarks.run import build_app
+    return build_app(os.environ['CARGA_DATABASE_URL'], os.environ['CARGA_UPLOAD_FOLDER'])
+
+
+def _prepare(database_url, upload_folder, n_visitas):
+    from benchmarks import synthetic
+    from benchmarks.run import build_app, _reset_db
+
+    app = build_app(database_url, upload_folder)
+    with app.app_context():
+        _reset_db()
+        visita_ids = synthetic.generate(n_empresas=5, n_clientes=max(n_visitas // 50, 1), n_visitas=n_visitas,
+                                        zonas_por_visita=6, fotos_por_visita=0)
+    return app, visita_ids[len(visita_ids) // 2]
+
+
+def _wait_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/visitas?limit=1')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn no respondió a tiempo')
+
+
+def _client(port, paths, stop, samples, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    i = 0
+    while not stop.is_set():
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+    conn.close()
+
+
+def _load(port, paths, concurrency, duration):
+    stop = threading.Event()
+    samples, errors = [], []
+    clients = [threading.Thread(target=_client, args=(port, paths, stop, samples, errors))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in clients:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in clients:
+        t.join()
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        'requests': len(samples),
+        'errors': len(errors),
+        'rps': round(len(samples) / elapsed, 1),
+        'median_ms': round(statistics.median(samples), 3) if samples else None,
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3) if samples else None,
+    }
+
+
+def run_server(workers, threads, port, env):
+    env = dict(env, GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_BIND=f'127.0.0.1:{port}')
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'benchmarks.carga:server_app()'],
+        cwd=backend, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prueba de carga de Informetec con gunicorn')
+    parser.add_argument('--output', default='carga.json')
+    parser.add_argument('--database-url', help='Por defecto un SQLite temporal')
+    parser.add_argument('--workers', type=int, nargs='+', default=WORKERS)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--visitas', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    workdir = tempfile.mkdtemp(prefix='informetec-carga-')
+    upload_folder = os.path.join(workdir, 'uploads')
+    os.makedirs(upload_folder)
+    database_url = args.database_url or f'sqlite:///{os.path.join(workdir, "carga.db")}'
+    env = dict(os.environ, CARGA_DATABASE_URL=database_url, CARGA_UPLOAD_FOLDER=upload_folder)
+
+    results = {}
+    try:
+        app, visita_id = _prepare(database_url, upload_folder, args.visitas)
+        paths = [p.format(visita_id=visita_id) for p in PATHS]
+        for workers in args.workers:
+            server = run_server(workers, args.threads, args.port, env)
+            try:
+                _wait_ready(args.port)
+                results[f'workers_{workers}'] = _load(args.port, paths, args.concurrency, args.duration)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=60)
+            print(f'workers={workers:<3d} ' + '  '.join(
+                f'{k}={v}' for k, v in sorted(results[f'workers_{workers}'].items())))
+        with app.app_context():
+            from models import db
+            db.session.remove()
+            db.drop_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'cpus': os.cpu_count(),
+        'threads': args.threads,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'Resultados en {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
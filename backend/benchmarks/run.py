@@ -0,0 +1,280 @@
+from datetime import datetime
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Benchmarks de generación de PDF, de los endpoints de visitas y del arranque en frío.
+#
+#   cd backend
+#   python -m benchmarks.run --output bench.json
+#   python -m benchmarks.run --output nuevo.json --baseline bench.json --threshold 0.2
+#
+# Con --baseline se compara cada métrica contra la corrida anterior y el
+# proceso termina con código 1 si alguna empeora más que el umbral.
+# Por defecto usa un SQLite temporal; --database-url permite usar PostgreSQL
+# (la base debe estar vacía: se crean y borran las tablas).
+
+PHOTO_COUNTS = [0, 5, 20, 50]
+TABLE_SIZES = [100, 1000, 10000]
+
+# Métricas donde un valor mayor es peor (las que se comparan con la línea base)
+LOWER_IS_BETTER = ('median_ms', 'p95_ms', 'peak_python_mb', 'output_kb')
+
+
+def _bench_config(database_url, upload_folder):
+    return dict(
+        SECRET_KEY='bench',
+        SQLALCHEMY_DATABASE_URI=database_url,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        UPLOAD_FOLDER=upload_folder,
+        PDF_CACHE_FOLDER=os.path.join(os.path.dirname(upload_folder), 'pdf_cache'),
+        LOG_LEVEL='WARNING',
+    )
+
+
+def build_app(database_url, upload_folder):
+    from app import create_app
+    return create_app(None, **_bench_config(database_url, upload_folder))
+
+
+def _timings(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return _stats(samples)
+
+
+def _stats(samples):
+    samples = sorted(samples)
+    return {
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'min_ms': round(samples[0], 3),
+    }
+
+
+def _reset_db():
+    from models import db
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def bench_pdf(app, workdir, photo_counts, repeat):
+    from benchmarks import synthetic
+    from pdf_generator import generate_pdf
+    from render_context import render_context
+
+    results = {}
+    with app.app_context():
+        _reset_db()
+        pool = synthetic.generate_photos(app.config['UPLOAD_FOLDER'], max(photo_counts + [1]))
+        synthetic.generate(n_empresas=1, n_clientes=1, n_visitas=0, photo_pool=pool)
+        from models import User, Cliente
+        supervisor_id = User.query.first().id
+        cliente_id = Cliente.query.first().id
+
+        for fotos in photo_counts:
+            visita_id = synthetic.generate_photo_visit(f'PDF{fotos:04d}', fotos, pool, supervisor_id, cliente_id)
+            output = os.path.join(workdir, f'bench_{fotos}.pdf')
+
+            # Primer render en frío: incluye generar los derivados de las fotos
+            render_context.clear()
+            start = time.perf_counter()
+            generate_pdf(visita_id, filename=output, use_cache=False)
+            cold_ms = (time.perf_counter() - start) * 1000
+
+            tracemalloc.start()
+            generate_pdf(visita_id, filename=output, use_cache=False)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            stats = _timings(lambda: generate_pdf(visita_id, filename=output, use_cache=False), repeat)
+            stats.update({
+                'cold_ms': round(cold_ms, 3),
+                'peak_python_mb': round(peak / (1024 * 1024), 3),
+                'output_kb': round(os.path.getsize(output) / 1024, 3),
+            })
+            results[f'pdf.fotos_{fotos}'] = stats
+    return results
+
+
+def bench_api(app, table_sizes, repeat):
+    from benchmarks import synthetic
+    from models import Visita, User, Cliente
+
+    results = {}
+    client = app.test_client()
+    for size in table_sizes:
+        with app.app_context():
+            _reset_db()
+            visita_ids = synthetic.generate(n_empresas=5, n_clientes=max(size // 50, 1), n_visitas=size,
+                                            zonas_por_visita=6, fotos_por_visita=0)
+            supervisor_id = User.query.first().id
+            cliente_id = Cliente.query.first().id
+        visita_id = visita_ids[len(visita_ids) // 2]
+
+        def list_page():
+            assert client.get('/visitas?limit=50').status_code == 200
+
+        def detail():
+            assert client.get(f'/visita/{visita_id}').status_code == 200
+
+        def create():
+            response = client.post('/visita', json={
+                'fecha': '2024-06-01', 'supervisor_id': supervisor_id, 'cliente_id': cliente_id,
+                'conclusiones': 'bench', 'zonas': [{
+                    'seccion': 'Colaborador', 'concepto_actividad': f'Actividad {i}',
+                    'calificacion': 'Buena', 'observaciones': 'ok',
+                } for i in range(6)],
+            })
+            assert response.status_code == 201
+            # El id se arma con la hora: se elimina para poder repetir
+            with app.app_context():
+                from models import db, Zona
+                Zona.query.filter_by(visita_id=response.json['id']).delete()
+                Visita.query.filter_by(id=response.json['id']).delete()
+                db.session.commit()
+
+        results[f'api.get_visitas.n_{size}'] = _timings(list_page, repeat)
+        results[f'api.get_visita.n_{size}'] = _timings(detail, repeat)
+        results[f'api.create_visita.n_{size}'] = _timings(create, max(repeat // 2, 1))
+    return results
+
+
+# Arranque en frío: un proceso nuevo por repetición, desde el import de la
+# app hasta la primera respuesta de /visitas. También informa qué módulos
+# pesados quedaron cargados (no debería haber ninguno).
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(None, **json.loads(sys.argv[1]))
+created = time.perf_counter()
+assert app.test_client().get('/visitas?limit=1').status_code == 200
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'total_ms': (done - start) * 1000,
+    'pesados': [m for m in ('reportlab', 'pypdf', 'flask_mail') if m in sys.modules],
+}))
+"""
+
+
+def bench_startup(app, database_url, upload_folder, repeat):
+    from models import db
+    with app.app_context():
+        db.create_all()
+    config = json.dumps(_bench_config(database_url, upload_folder))
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', _STARTUP_SCRIPT, config], cwd=backend, text=True)
+        run = json.loads(output.strip().splitlines()[-1])
+        run['process_ms'] = (time.perf_counter() - start) * 1000
+        runs.append(run)
+    stats = _stats([r['total_ms'] for r in runs])
+    for key in ('import_ms', 'create_app_ms', 'process_ms'):
+        stats[key] = round(statistics.median(r[key] for r in runs), 3)
+    stats['modulos_pesados'] = len(runs[-1]['pesados'])
+    return {'startup.primera_respuesta': stats}
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for name, metrics in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in LOWER_IS_BETTER:
+            if metric in metrics and base.get(metric):
+                ratio = metrics[metric] / base[metric]
+                if ratio > 1 + threshold:
+                    regressions.append(f'{name}.{metric}: {base[metric]} -> {metrics[metric]} (+{(ratio - 1) * 100:.0f}%)')
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks de Informetec')
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--baseline', help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Empeoramiento tolerado (0.2 = 20%%)')
+    parser.add_argument('--database-url', help='Por defecto un SQLite temporal')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--photo-counts', type=int, nargs='+', default=PHOTO_COUNTS)
+    parser.add_argument('--table-sizes', type=int, nargs='+', default=TABLE_SIZES)
+    parser.add_argument('--only', choices=['pdf', 'api', 'startup'])
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = tempfile.mkdtemp(prefix='informetec-bench-')
+    upload_folder = os.path.join(workdir, 'uploads')
+    os.makedirs(upload_folder)
+    database_url = args.database_url or f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    commit = _git_commit()
+
+    try:
+        app = build_app(database_url, upload_folder)
+        results = {}
+        if args.only in (None, 'pdf'):
+            results.update(bench_pdf(app, workdir, args.photo_counts, args.repeat))
+        if args.only in (None, 'api'):
+            results.update(bench_api(app, args.table_sizes, args.repeat))
+        if args.only in (None, 'startup'):
+            results.update(bench_startup(app, database_url, upload_folder, args.repeat))
+        with app.app_context():
+            from models import db
+            db.session.remove()
+            db.drop_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    for name, metrics in sorted(results.items()):
+        print(f'{name:40s} ' + '  '.join(f'{k}={v}' for k, v in sorted(metrics.items())))
+    print(f'Resultados en {output}')
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('Regresiones:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print('Sin regresiones respecto a la línea base')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
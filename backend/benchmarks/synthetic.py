@@ -0,0 +1,115 @@
+from datetime import date, timedelta
+from PIL import Image as PILImage
+from models import db, User, Empresa, Cliente, Visita, Zona
+from zona_sync import bulk_insert_zonas
+from sqlalchemy import insert
+import os
+import random
+
+# Generador de datos sintéticos para los benchmarks: empresas (con su
+# usuario supervisor), clientes, visitas y zonas, con fotos JPEG generadas.
+# Usa una semilla fija para que dos corridas produzcan los mismos datos.
+
+SECCIONES = ['Aseo y Limpieza', 'Seguridad y Salud', 'Colaborador']
+CALIFICACIONES = ['Buena', 'Media', 'Mala']
+OBSERVACIONES = [
+    'Se encontró el área en buen estado.',
+    'Hay una fuga en el lavamanos del baño del segundo piso.',
+    'Falta señalización en la zona de parqueaderos.',
+    'Pisos sin brillar en el lobby, se programa mantenimiento.',
+    'Personal con dotación completa.',
+]
+
+
+# Foto con degradado y ruido: se comprime como una foto de celular y no como
+# una imagen plana, así el tamaño en disco es realista.
+def generate_jpeg(path, width=2048, height=1536, seed=0, quality=90):
+    rng = random.Random(seed)
+    base = PILImage.linear_gradient('L').resize((width, height))
+    noise = PILImage.effect_noise((width, height), 40 + rng.randint(0, 40))
+    r = PILImage.blend(base, noise, 0.5)
+    g = PILImage.blend(base.rotate(90, expand=False), noise, 0.4)
+    b = noise.point(lambda v: (v + rng.randint(0, 255)) % 256)
+    PILImage.merge('RGB', (r, g, b)).save(path, 'JPEG', quality=quality)
+    return path
+
+
+def generate_photos(upload_folder, count, width=2048, height=1536):
+    os.makedirs(upload_folder, exist_ok=True)
+    urls = []
+    for i in range(count):
+        name = f'bench_{width}x{height}_{i}.jpg'
+        path = os.path.join(upload_folder, name)
+        if not os.path.exists(path):
+            generate_jpeg(path, width, height, seed=i)
+        urls.append(f'/uploads/{name}')
+    return urls
+
+
+def generate(n_empresas=2, n_clientes=10, n_visitas=100, zonas_por_visita=6,
+             fotos_por_visita=2, photo_pool=None, seed=42):
+    rng = random.Random(seed)
+    photo_pool = photo_pool or []
+
+    supervisores = []
+    for i in range(n_empresas):
+        user = User(nombre=f'Supervisor {i}', email=f'supervisor{i}@bench.local', rol='user')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Empresa(
+            user_id=user.id, nombre=f'Empresa {i}', nit=f'900{i:06d}',
+            telefono='3000000000', correo=f'empresa{i}@bench.local', direccion='Calle 1 # 2-3',
+            logo_url=photo_pool[0] if photo_pool else '',
+        ))
+        supervisores.append(user.id)
+
+    db.session.execute(insert(Cliente), [{
+        'nit': f'800{i:06d}', 'nombre': f'Conjunto {i}', 'administrador': f'Administrador {i}',
+        'correo': f'cliente{i}@bench.local', 'tipo_codigo': 'AL', 'logo_url': '',
+    } for i in range(n_clientes)])
+    clientes = [c.id for c in Cliente.query.with_entities(Cliente.id).all()]
+
+    inicio = date(2020, 1, 1)
+    visitas = []
+    for i in range(n_visitas):
+        visitas.append({
+            'id': f'B{i:08d}',
+            'fecha': inicio + timedelta(days=rng.randint(0, 5 * 365)),
+            'supervisor_id': rng.choice(supervisores),
+            'cliente_id': rng.choice(clientes),
+            'conclusiones': 'Visita de benchmark. ' + rng.choice(OBSERVACIONES),
+        })
+    for start in range(0, len(visitas), 1000):
+        db.session.execute(insert(Visita), visitas[start:start + 1000])
+        for visita in visitas[start:start + 1000]:
+            bulk_insert_zonas(visita['id'], _zonas(rng, zonas_por_visita, fotos_por_visita, photo_pool))
+    db.session.commit()
+    return [v['id'] for v in visitas]
+
+
+def _zonas(rng, count, fotos, photo_pool):
+    zonas = []
+    for j in range(count):
+        # Las fotos van en las secciones que las muestran en el PDF
+        seccion = SECCIONES[j % 2] if j < fotos else rng.choice(SECCIONES)
+        zonas.append({
+            'seccion': seccion,
+            'concepto_actividad': f'Actividad {j}',
+            'calificacion': rng.choice(CALIFICACIONES),
+            'observaciones': rng.choice(OBSERVACIONES),
+            'foto_url': photo_pool[j % len(photo_pool)] if j < fotos and photo_pool else '',
+        })
+    return zonas
+
+
+# Una visita con `fotos` zonas con foto, para medir el render en función
+# del número de fotos.
+def generate_photo_visit(visita_id, fotos, photo_pool, supervisor_id, cliente_id):
+    db.session.add(Visita(id=visita_id, fecha=date(2024, 1, 1), supervisor_id=supervisor_id,
+                          cliente_id=cliente_id, conclusiones='Visita con fotos'))
+    db.session.flush()
+    zonas = _zonas(random.Random(fotos), max(fotos, 1), fotos, photo_pool)
+    bulk_insert_zonas(visita_id, zonas)
+    db.session.commit()
+    return visita_id
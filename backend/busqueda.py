@@ -0,0 +1,176 @@
+from models import db, Visita, Zona
+from sqlalchemy import column, event, func, literal_column, select, table, text
+import re
+
+# Búsqueda de texto completo sobre las visitas.
+# Cada visita tiene un documento con sus conclusiones y el concepto y las
+# observaciones de sus zonas, que se actualiza en la misma transacción en que
+# se escribe la visita (indexar_visita / quitar_visita).
+#
+# - PostgreSQL: tabla visitas_busqueda con un tsvector (diccionario 'spanish',
+#   así "fugas" encuentra "fuga") e índice GIN.
+# - SQLite (desarrollo): índice FTS5 sobre visitas_fts_docs. SQLite no trae
+#   stemming en español, así que cada término se busca como prefijo.
+#
+# La tabla se crea junto con las demás en db.create_all() (también en bases
+# que ya existían); `flask reconstruir-busqueda` la llena con las visitas
+# que había antes.
+
+_PG_DDL = (
+    """CREATE TABLE IF NOT EXISTS visitas_busqueda (
+        visita_id VARCHAR(20) PRIMARY KEY REFERENCES visitas(id) ON DELETE CASCADE,
+        documento TSVECTOR NOT NULL
+    )""",
+    'CREATE INDEX IF NOT EXISTS ix_visitas_busqueda_documento ON visitas_busqueda USING GIN (documento)',
+)
+# Los documentos viven en visitas_fts_docs (con índice por visita_id) y los
+# triggers mantienen al día el índice FTS5, que solo guarda los términos.
+_SQLITE_DDL = (
+    """CREATE TABLE IF NOT EXISTS visitas_fts_docs (
+        id INTEGER PRIMARY KEY,
+        visita_id VARCHAR(20) NOT NULL UNIQUE,
+        conclusiones TEXT,
+        zonas TEXT
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS visitas_fts USING fts5(
+        conclusiones, zonas, content='visitas_fts_docs', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS visitas_fts_ai AFTER INSERT ON visitas_fts_docs BEGIN
+        INSERT INTO visitas_fts (rowid, conclusiones, zonas) VALUES (new.id, new.conclusiones, new.zonas);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitas_fts_ad AFTER DELETE ON visitas_fts_docs BEGIN
+        INSERT INTO visitas_fts (visitas_fts, rowid, conclusiones, zonas)
+        VALUES ('delete', old.id, old.conclusiones, old.zonas);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitas_fts_au AFTER UPDATE ON visitas_fts_docs BEGIN
+        INSERT INTO visitas_fts (visitas_fts, rowid, conclusiones, zonas)
+        VALUES ('delete', old.id, old.conclusiones, old.zonas);
+        INSERT INTO visitas_fts (rowid, conclusiones, zonas) VALUES (new.id, new.conclusiones, new.zonas);
+    END""",
+)
+
+_pg_table = table('visitas_busqueda', column('visita_id'), column('documento'))
+_fts_table = table('visitas_fts', column('rowid'))
+_fts_docs = table('visitas_fts_docs', column('id'), column('visita_id'))
+
+REINDEX_BATCH = 1000
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _tabla():
+    return 'visitas_busqueda' if _dialect() == 'postgresql' else 'visitas_fts_docs'
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _crear_tablas(target, connection, **kw):
+    statements = {'postgresql': _PG_DDL, 'sqlite': _SQLITE_DDL}.get(connection.dialect.name, ())
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+# visitas_busqueda referencia a visitas: se elimina antes que ella
+@event.listens_for(db.metadata, 'before_drop')
+def _eliminar_tablas(target, connection, **kw):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('DROP TABLE IF EXISTS visitas_busqueda'))
+    elif connection.dialect.name == 'sqlite':
+        connection.execute(text('DROP TABLE IF EXISTS visitas_fts'))
+        connection.execute(text('DROP TABLE IF EXISTS visitas_fts_docs'))
+
+
+def texto_zonas(zonas):
+    return '\n'.join(' '.join(filter(None, z)) for z in zonas)
+
+
+def _textos(visita_id):
+    conclusiones = db.session.query(Visita.conclusiones).filter(Visita.id == visita_id).scalar() or ''
+    zonas = db.session.query(Zona.seccion, Zona.concepto_actividad, Zona.observaciones) \
+        .filter(Zona.visita_id == visita_id).all()
+    return conclusiones, texto_zonas(zonas)
+
+
+# Escribe (o reemplaza) los documentos de varias visitas de una vez.
+# `documentos`: dicts con visita_id, conclusiones y zonas (texto).
+def indexar_documentos(documentos):
+    if not documentos:
+        return
+    if _dialect() == 'postgresql':
+        db.session.execute(text(
+            """INSERT INTO visitas_busqueda (visita_id, documento)
+            VALUES (:visita_id, setweight(to_tsvector('spanish', :conclusiones), 'A')
+                             || setweight(to_tsvector('spanish', :zonas), 'B'))
+            ON CONFLICT (visita_id) DO UPDATE SET documento = EXCLUDED.documento"""
+        ), documentos)
+    else:
+        db.session.execute(text(
+            """INSERT INTO visitas_fts_docs (visita_id, conclusiones, zonas)
+            VALUES (:visita_id, :conclusiones, :zonas)
+            ON CONFLICT (visita_id) DO UPDATE SET conclusiones = excluded.conclusiones, zonas = excluded.zonas"""
+        ), documentos)
+
+
+# Vuelve a armar el documento de la visita. Llamar después de escribir la
+# visita y sus zonas, antes del commit.
+def indexar_visita(visita_id):
+    conclusiones, zonas = _textos(visita_id)
+    indexar_documentos([{'visita_id': visita_id, 'conclusiones': conclusiones, 'zonas': zonas}])
+
+
+def quitar_visita(visita_id):
+    db.session.execute(text(f'DELETE FROM {_tabla()} WHERE visita_id = :visita_id'), {'visita_id': visita_id})
+
+
+# Recorre las visitas en lotes de `lote` (yield_per): por lote, una consulta
+# para sus zonas y una escritura con indexar_documentos.
+def reconstruir(lote=REINDEX_BATCH):
+    db.session.execute(text(f'DELETE FROM {_tabla()}'))
+    total = 0
+    visitas = db.session.execute(select(Visita.id, Visita.conclusiones).order_by(Visita.id)
+                                 .execution_options(yield_per=lote))
+    for filas in visitas.partitions():
+        ids = [visita_id for visita_id, _ in filas]
+        zonas = {}
+        for visita_id, *zona in db.session.query(
+                Zona.visita_id, Zona.seccion, Zona.concepto_actividad, Zona.observaciones) \
+                .filter(Zona.visita_id.in_(ids)).order_by(Zona.visita_id, Zona.id):
+            zonas.setdefault(visita_id, []).append(zona)
+        indexar_documentos([
+            {'visita_id': visita_id, 'conclusiones': conclusiones or '', 'zonas': texto_zonas(zonas.get(visita_id, ()))}
+            for visita_id, conclusiones in filas
+        ])
+        total += len(filas)
+    db.session.commit()
+    return total
+
+
+# Devuelve una consulta de (Visita, rank) con las visitas que coinciden con
+# `q`, de la más relevante a la menos. Sobre ella se pueden aplicar más filtros.
+# Lanza ValueError si `q` no tiene ningún término.
+def buscar(q, query=None):
+    terminos = WORD_RE.findall(q or '')
+    if not terminos:
+        raise ValueError('El parámetro q debe tener al menos una palabra')
+    if query is None:
+        query = db.session.query(Visita)
+    if _dialect() == 'postgresql':
+        tsquery = func.websearch_to_tsquery('spanish', q)
+        rank = func.ts_rank(_pg_table.c.documento, tsquery)
+        query = query.add_columns(rank.label('rank')) \
+            .join(_pg_table, _pg_table.c.visita_id == Visita.id) \
+            .filter(_pg_table.c.documento.op('@@')(tsquery))
+    else:
+        # Cada término entre comillas (sin sintaxis FTS5 del usuario) y como prefijo
+        match = ' '.join(f'"{t}"*' for t in terminos)
+        # bm25: más negativo es más relevante; conclusiones pesa el doble que zonas
+        rank = -func.bm25(literal_column('visitas_fts'), 2.0, 1.0)
+        query = query.add_columns(rank.label('rank')) \
+            .join(_fts_docs, _fts_docs.c.visita_id == Visita.id) \
+            .join(_fts_table, _fts_table.c.rowid == _fts_docs.c.id) \
+            .filter(literal_column('visitas_fts').op('MATCH')(match))
+    return query.order_by(rank.desc(), Visita.id)
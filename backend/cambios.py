@@ -0,0 +1,169 @@
+from models import db, Cliente, Visita, Zona, Eliminacion
+from pagination import InvalidPageError, encode_cursor, decode_cursor, after_cursor_asc
+from sqlalchemy import insert, text
+from datetime import datetime, timedelta
+
+# Feed de cambios: GET /cambios?since=<cursor> devuelve los clientes, visitas
+# y zonas creados o modificados (updated_at) y las filas eliminadas
+# (tabla eliminaciones) desde el cursor, para que el frontend actualice lo que
+# ya tiene en lugar de volver a pedir los listados completos.
+#
+# Cada fuente se recorre por (updated_at, id) con su propio índice; el cursor
+# guarda la última posición de cada una. Sin `since` se empieza desde el
+# principio.
+#
+# updated_at se asigna al escribir la fila, no al hacer commit: una
+# transacción larga (una importación de miles de filas, un /sync grande) hace
+# visibles sus filas con un updated_at de varios segundos atrás, y un cursor
+# que ya pasó ese punto se las saltaría. Por eso el feed solo llega hasta
+#   min(ahora, inicio de la transacción de escritura abierta más antigua) - CAMBIOS_MARGEN
+# La transacción abierta más antigua se toma de pg_stat_activity (todos los
+# procesos que usan la base), así que el límite cubre la transacción más
+# larga hasta CAMBIOS_MAX_ESPERA; CAMBIOS_MARGEN solo cubre la diferencia de reloj
+# entre los servidores de la app y la base, y el instante entre calcular
+# updated_at y el primer INSERT. En SQLite (desarrollo) solo se aplica el margen.
+# Una transacción abierta hace más de CAMBIOS_MAX_ESPERA (p. ej. una sesión
+# olvidada en 'idle in transaction') deja de frenar el feed; las abortadas no
+# cuentan porque ya no pueden confirmar nada.
+#
+# La tabla eliminaciones se purga con `flask purgar-eliminaciones` (las de más
+# de CAMBIOS_RETENCION_DIAS). El cursor lleva hasta dónde llegó; uno anterior a
+# la retención pudo perderse eliminaciones purgadas y se rechaza
+# (CursorVencidoError, 410): el cliente vuelve a empezar sin `since`.
+
+DEFAULT_MARGEN = 2  # segundos
+DEFAULT_MAX_ESPERA = 300  # segundos
+DEFAULT_RETENCION_DIAS = 90
+
+CLIENTES = 'clientes'
+VISITAS = 'visitas'
+ZONAS = 'zonas'
+
+# Clave del cursor con el límite `hasta` de la consulta que lo generó
+HASTA = 'hasta'
+
+
+class CursorVencidoError(Exception):
+    pass
+
+
+def cliente_to_dict(c):
+    return {
+        'id': c.id, 'nit': c.nit, 'nombre': c.nombre, 'administrador': c.administrador,
+        'correo': c.correo, 'tipo_codigo': c.tipo_codigo, 'logo_url': c.logo_url,
+        'updated_at': c.updated_at.isoformat(),
+    }
+
+
+def visita_to_dict(v):
+    return {
+        'id': v.id, 'fecha': v.fecha.strftime('%Y-%m-%d'), 'supervisor_id': v.supervisor_id,
+        'cliente_id': v.cliente_id, 'conclusiones': v.conclusiones or '',
+        'updated_at': v.updated_at.isoformat(),
+    }
+
+
+def zona_to_dict(z):
+    return {
+        'id': z.id, 'visita_id': z.visita_id, 'seccion': z.seccion,
+        'concepto_actividad': z.concepto_actividad, 'calificacion': z.calificacion,
+        'observaciones': z.observaciones, 'foto_url': z.foto_url,
+        'updated_at': z.updated_at.isoformat(),
+    }
+
+
+def eliminacion_to_dict(e):
+    return {'tabla': e.tabla, 'id': e.fila_id, 'eliminado_en': e.eliminado_en.isoformat()}
+
+
+# nombre -> (modelo, columna de tiempo, serializador)
+FUENTES = {
+    CLIENTES: (Cliente, Cliente.updated_at, cliente_to_dict),
+    VISITAS: (Visita, Visita.updated_at, visita_to_dict),
+    ZONAS: (Zona, Zona.updated_at, zona_to_dict),
+    'eliminados': (Eliminacion, Eliminacion.eliminado_en, eliminacion_to_dict),
+}
+
+
+# Registra la eliminación de filas de `tabla` (clientes, visitas o zonas).
+# Llamar en la misma transacción que el DELETE.
+def registrar_eliminaciones(tabla, ids):
+    rows = [{'tabla': tabla, 'fila_id': str(fila_id)} for fila_id in ids]
+    if rows:
+        db.session.execute(insert(Eliminacion), rows)
+
+
+# Inicio (UTC) de la transacción con escrituras de esta base abierta más
+# antigua, sin contar las de más de `max_espera` segundos; o None
+def _escritura_abierta_mas_antigua(max_espera=DEFAULT_MAX_ESPERA):
+    if db.engine.dialect.name != 'postgresql':
+        return None
+    return db.session.execute(text(
+        "SELECT min(xact_start) AT TIME ZONE 'UTC' FROM pg_stat_activity "
+        "WHERE datname = current_database() AND backend_xid IS NOT NULL AND pid <> pg_backend_pid() "
+        "AND state <> 'idle in transaction (aborted)' "
+        "AND xact_start > now() - make_interval(secs => :max_espera)"
+    ), {'max_espera': max_espera}).scalar()
+
+
+# El id de la última fila de cada fuente tiene que ser del tipo de su
+# columna (visitas tiene ids de texto, las demás enteros)
+def _tipo_id(fuente):
+    return FUENTES[fuente][0].id.type.python_type
+
+
+def _posiciones(since, retencion_dias):
+    if not since:
+        return {}
+    posiciones = decode_cursor(since)
+    if not isinstance(posiciones, dict) or any(f not in FUENTES and f != HASTA for f in posiciones):
+        raise InvalidPageError('Cursor inválido')
+    try:
+        hasta = posiciones.pop(HASTA, None)
+        if hasta is not None and datetime.fromisoformat(hasta) < datetime.utcnow() - timedelta(days=retencion_dias):
+            raise CursorVencidoError('El cursor es anterior a la retención de eliminaciones; pedir de nuevo sin since')
+        resultado = {}
+        for fuente, (ts, fila_id) in posiciones.items():
+            if type(fila_id) is not _tipo_id(fuente):
+                raise InvalidPageError('Cursor inválido')
+            resultado[fuente] = (datetime.fromisoformat(ts), fila_id)
+        return resultado
+    except (TypeError, ValueError):
+        raise InvalidPageError('Cursor inválido')
+
+
+# Borra las eliminaciones de más de `dias` días. Devuelve cuántas borró.
+def purgar_eliminaciones(dias=DEFAULT_RETENCION_DIAS):
+    borradas = Eliminacion.query.filter(Eliminacion.eliminado_en < datetime.utcnow() - timedelta(days=dias)) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return borradas
+
+
+# Devuelve hasta `limit` cambios por fuente después de `since`, el cursor
+# para la siguiente consulta y si quedaron cambios sin devolver.
+def cambios_desde(since, limit, margen=DEFAULT_MARGEN, max_espera=DEFAULT_MAX_ESPERA,
+                  retencion_dias=DEFAULT_RETENCION_DIAS):
+    posiciones = _posiciones(since, retencion_dias)
+    hasta = datetime.utcnow()
+    abierta = _escritura_abierta_mas_antigua(max_espera)
+    if abierta is not None:
+        hasta = min(hasta, abierta)
+    hasta -= timedelta(seconds=margen)
+    resultado = {}
+    hay_mas = False
+    for fuente, (model, columna, to_dict) in FUENTES.items():
+        query = model.query.filter(columna <= hasta).order_by(columna, model.id)
+        if fuente in posiciones:
+            query = query.filter(after_cursor_asc([columna, model.id], list(posiciones[fuente])))
+        filas = query.limit(limit + 1).all()
+        if len(filas) > limit:
+            filas = filas[:limit]
+            hay_mas = True
+        if filas:
+            ultima = filas[-1]
+            posiciones[fuente] = (getattr(ultima, columna.key), ultima.id)
+        resultado[fuente] = [to_dict(f) for f in filas]
+    cursor = dict({f: [ts.isoformat(), fila_id] for f, (ts, fila_id) in posiciones.items()}, **{HASTA: hasta.isoformat()})
+    cursor = encode_cursor(cursor)
+    return resultado, cursor, hay_mas
@@ -0,0 +1,38 @@
+from flask import request
+from sqlalchemy.orm import load_only
+
+# Proyección de campos para los endpoints de lectura: ?fields=id,fecha,cliente
+# devuelve solo esos campos y, sobre todo, solo consulta las columnas (y las
+# relaciones) que hacen falta para armarlos. Sin `fields` se devuelven todos.
+#
+# Cada endpoint declara sus campos como nombre -> (columnas, valor): las
+# columnas del modelo que hay que cargar y la función que arma el valor a
+# partir de la fila. Las relaciones (cliente, zonas...) las carga el endpoint
+# solo si el campo se pidió.
+
+
+# Lanza ValueError si se pide un campo que el endpoint no tiene
+def parse_fields(campos):
+    raw = request.args.get('fields')
+    if raw is None:
+        return list(campos)
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    if not fields:
+        raise ValueError('fields debe tener al menos un campo')
+    desconocidos = [f for f in fields if f not in campos]
+    if desconocidos:
+        raise ValueError(f'Campos desconocidos: {", ".join(desconocidos)} (disponibles: {", ".join(campos)})')
+    return fields
+
+
+# load_only con las columnas de los campos pedidos más las de `siempre`
+# (p. ej. las que usa el cursor de paginación)
+def load_fields(campos, fields, *siempre):
+    columnas = {c.key: c for c in siempre}
+    for field in fields:
+        columnas.update((c.key, c) for c in campos[field][0])
+    return load_only(*columnas.values())
+
+
+def project(campos, fields, fila):
+    return {field: campos[field][1](fila) for field in fields}
@@ -0,0 +1,258 @@
+from flask import current_app
+from werkzeug.utils import secure_filename
+from storage import CONTENT_ADDRESSED_RE, storage
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+# Subidas por partes, reanudables y direccionadas por contenido.
+#
+# 1. POST /upload/sesiones {filename, size, sha256?} abre una sesión. Si el
+#    cliente ya conoce el hash y el archivo existe, se responde de inmediato.
+# 2. PUT /upload/sesiones/<id> con la cabecera Upload-Offset envía cada parte.
+#    El offset debe coincidir con lo recibido hasta ahora; si no, se responde
+#    409 con el offset correcto para que el cliente reanude desde ahí.
+# 3. GET /upload/sesiones/<id> devuelve el offset actual (para reanudar).
+#
+# El archivo final se guarda como <sha256><ext>: la misma foto siempre tiene
+# la misma URL, volver a subirla no ocupa espacio y dos fotos con el mismo
+# nombre ya no se pisan.
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+SESSION_TTL = 24 * 3600
+HASH_BLOCK = 1024 * 1024
+SHA256_RE = re.compile(r'^[0-9a-fA-F]{64}$')
+
+# Hash en curso de cada sesión. Si el proceso se reinicia o la parte llega a
+# otro worker, el hash se recalcula leyendo lo ya recibido.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+# Para archivos direccionados por contenido devuelve un ETag fuerte derivado
+# del hash (su contenido nunca cambia); None para archivos con nombre libre.
+def content_etag(filename):
+    match = CONTENT_ADDRESSED_RE.match(filename)
+    if not match:
+        return None
+    digest, variant = match.groups()
+    return f'{digest}-{variant}' if variant else digest
+
+
+def _sessions_dir():
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], '.sesiones')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _meta_path(upload_id):
+    return os.path.join(_sessions_dir(), f'{upload_id}.json')
+
+
+def _part_path(upload_id):
+    return os.path.join(_sessions_dir(), f'{upload_id}.part')
+
+
+def _extension(filename):
+    ext = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    return ext or '.bin'
+
+
+def content_filename(digest, filename):
+    return f'{digest}{_extension(filename)}'
+
+
+def _load_session(upload_id):
+    # upload_id viene de la URL: solo se aceptan ids generados aquí
+    if not upload_id.isalnum():
+        raise UploadError('Sesión de subida no encontrada', 404)
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadError('Sesión de subida no encontrada', 404)
+
+
+def _save_session(session_data):
+    tmp = _meta_path(session_data['id']) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(session_data, f)
+    os.replace(tmp, _meta_path(session_data['id']))
+
+
+def _hasher_for(upload_id, offset):
+    with _hashers_lock:
+        entry = _hashers.get(upload_id)
+    if entry and entry[1] == offset:
+        return entry[0]
+    hasher = hashlib.sha256()
+    with open(_part_path(upload_id), 'rb') as f:
+        remaining = offset
+        while remaining:
+            block = f.read(min(HASH_BLOCK, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _purge_expired():
+    now = time.time()
+    folder = _sessions_dir()
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if now - os.path.getmtime(path) > SESSION_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+    # Hashes en curso de sesiones que ya no existen (vencidas o abandonadas)
+    with _hashers_lock:
+        for upload_id in [u for u in _hashers if not os.path.exists(_meta_path(u))]:
+            _hashers.pop(upload_id)
+
+
+# Mueve un archivo temporal a su nombre definitivo por contenido. Si ya
+# existía un archivo con el mismo hash, se descarta el temporal.
+# Devuelve (nombre, creado).
+def store_content_addressed(temp_path, digest, filename):
+    name = content_filename(digest, filename)
+    return name, storage().save_file(name, temp_path)
+
+
+def existing_upload(digest, filename):
+    name = content_filename(digest, filename)
+    if storage().exists(name):
+        return name
+    return None
+
+
+# Guarda un archivo recibido en una sola petición, calculando el hash mientras
+# se escribe. Devuelve (nombre, creado).
+def save_stream(stream, filename):
+    folder = current_app.config['UPLOAD_FOLDER']
+    temp_path = os.path.join(folder, f'.tmp-{uuid.uuid4().hex}')
+    hasher = hashlib.sha256()
+    try:
+        with open(temp_path, 'wb') as f:
+            for block in iter(lambda: stream.read(HASH_BLOCK), b''):
+                hasher.update(block)
+                f.write(block)
+        return store_content_addressed(temp_path, hasher.hexdigest(), filename)
+    finally:
+        # save_file mueve o descarta el temporal; si algo falló antes (el
+        # cliente cortó la conexión, disco lleno) se borra aquí
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def create_session(filename, size, sha256=None):
+    if not filename:
+        raise UploadError('El campo filename es requerido')
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError('El campo size debe ser un entero positivo')
+    max_size = current_app.config.get('MAX_UPLOAD_SIZE')
+    if max_size and size > max_size:
+        raise UploadError('El archivo es demasiado grande', 413)
+
+    if sha256 is not None and not (isinstance(sha256, str) and SHA256_RE.match(sha256)):
+        raise UploadError('El campo sha256 debe ser un hash SHA-256 en hexadecimal')
+
+    _purge_expired()
+    if sha256:
+        name = existing_upload(sha256.lower(), filename)
+        if name:
+            return {'complete': True, 'filename': name}
+
+    upload_id = uuid.uuid4().hex
+    session_data = {
+        'id': upload_id,
+        'filename': filename,
+        'size': size,
+        'sha256': sha256.lower() if sha256 else None,
+        'created_at': time.time(),
+    }
+    open(_part_path(upload_id), 'wb').close()
+    _save_session(session_data)
+    return {
+        'complete': False,
+        'upload_id': upload_id,
+        'offset': 0,
+        'chunk_size': current_app.config.get('UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+    }
+
+
+def session_status(upload_id):
+    session_data = _load_session(upload_id)
+    return {
+        'upload_id': upload_id,
+        'offset': os.path.getsize(_part_path(upload_id)),
+        'size': session_data['size'],
+    }
+
+
+# Agrega una parte en la posición `offset`. Devuelve el estado de la sesión
+# o, si con esta parte se completa el archivo, {'complete': True, 'filename'}.
+#
+# El archivo parcial se bloquea (flock, vale entre workers) mientras se
+# revisa el offset, se escribe y se actualiza el hash: dos PUT con el mismo
+# offset se atienden uno detrás del otro y el segundo recibe 409.
+def append_chunk(upload_id, offset, stream):
+    _load_session(upload_id)
+    part_path = _part_path(upload_id)
+    try:
+        f = open(part_path, 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Sesión de subida no encontrada', 404)
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        # Releer la sesión con el bloqueo: otra petición pudo completarla
+        session_data = _load_session(upload_id)
+        return _append_locked(upload_id, session_data, part_path, f, offset, stream)
+
+
+def _append_locked(upload_id, session_data, part_path, f, offset, stream):
+    current = f.seek(0, os.SEEK_END)
+    if offset != current:
+        raise UploadError('Offset incorrecto', 409, offset=current)
+
+    hasher = _hasher_for(upload_id, current)
+    written = current
+    for block in iter(lambda: stream.read(HASH_BLOCK), b''):
+        if written + len(block) > session_data['size']:
+            raise UploadError('La parte excede el tamaño declarado', 400, offset=written)
+        hasher.update(block)
+        f.write(block)
+        written += len(block)
+    f.flush()
+
+    if written < session_data['size']:
+        with _hashers_lock:
+            _hashers[upload_id] = (hasher, written)
+        os.utime(_meta_path(upload_id))
+        return {'complete': False, 'upload_id': upload_id, 'offset': written, 'size': session_data['size']}
+
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    digest = hasher.hexdigest()
+    if session_data['sha256'] and session_data['sha256'] != digest:
+        os.remove(part_path)
+        os.remove(_meta_path(upload_id))
+        raise UploadError('El hash del archivo no coincide, vuelve a subirlo', 422)
+
+    name, _ = store_content_addressed(part_path, digest, session_data['filename'])
+    os.remove(_meta_path(upload_id))
+    return {'complete': True, 'filename': name}
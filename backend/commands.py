@@ -0,0 +1,198 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from datetime import datetime
+import click
+
+# Comandos de línea de comandos: flask --app app <comando>
+
+
+def _parse_fecha(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+@click.command('exportar-informes')
+@click.option('--cliente-id', type=int, help='Exportar las visitas de este cliente')
+@click.option('--desde', help='Fecha inicial (YYYY-MM-DD)')
+@click.option('--hasta', help='Fecha final (YYYY-MM-DD)')
+@click.option('--visita-id', 'visita_ids', multiple=True, help='Visita a exportar (se puede repetir)')
+@click.option('--formato', type=click.Choice(['zip', 'pdf']), default='zip')
+@click.option('--salida', required=True, help='Archivo de salida')
+@with_appcontext
+def exportar_informes(cliente_id, desde, hasta, visita_ids, formato, salida):
+    from pdf_batch import select_visitas, export_batch
+    from pdf_jobs import pdf_jobs
+
+    visita_ids = select_visitas(cliente_id, _parse_fecha(desde), _parse_fecha(hasta), list(visita_ids))
+    if not visita_ids:
+        raise click.ClickException('No hay visitas que coincidan con el filtro')
+    click.echo(f'Generando {len(visita_ids)} informes...')
+    try:
+        path, errores = export_batch(visita_ids, formato, output_path=salida)
+    finally:
+        pdf_jobs.shutdown()
+    for visita_id, error in errores.items():
+        click.echo(f'  Error en visita {visita_id}: {error}', err=True)
+    if not path:
+        raise click.ClickException('No se pudo generar ningún informe')
+    click.echo(f'{len(visita_ids) - len(errores)} informes escritos en {path}')
+
+
+# Agrega a las tablas existentes las columnas nuevas de los modelos, que
+# db.create_all() no toca. Quedan aceptando NULL; las filas que ya había
+# reciben el valor por defecto de la columna.
+def _agregar_columnas(db):
+    from sqlalchemy import inspect, text
+    inspector = inspect(db.engine)
+    agregadas = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existentes = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existentes:
+                continue
+            tipo = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {tipo}'))
+            if column.default is not None and column.default.is_scalar:
+                db.session.execute(table.update().values({column.name: column.default.arg}))
+            elif column.default is not None and column.default.is_callable:
+                db.session.execute(table.update().values({column.name: column.default.arg(None)}))
+            agregadas.append(f'{table.name}.{column.name}')
+    db.session.commit()
+    return agregadas
+
+
+# Crea las tablas, columnas e índices que falten (también los de búsqueda).
+# La app no lo hace al arrancar: correrlo al instalar y después de cada
+# cambio de modelos.
+@click.command('crear-tablas')
+@with_appcontext
+def crear_tablas():
+    from models import db
+    import busqueda  # registra la creación de sus tablas junto con las demás
+    db.create_all()
+    for columna in _agregar_columnas(db):
+        click.echo(f'  columna {columna}')
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    click.echo('Tablas creadas')
+
+
+# db.create_all() no agrega índices a tablas que ya existen
+@click.command('crear-indices')
+@with_appcontext
+def crear_indices():
+    from models import db
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+            click.echo(f'  {index.name}')
+    click.echo('Índices creados')
+
+
+@click.command('reconstruir-estadisticas')
+@with_appcontext
+def reconstruir_estadisticas():
+    import estadisticas
+    filas = estadisticas.reconstruir()
+    click.echo(f'Resumen de calificaciones reconstruido ({filas} filas)')
+
+
+@click.command('enviar-informes')
+@click.option('--cliente-id', type=int, help='Enviar las visitas de este cliente')
+@click.option('--desde', help='Fecha inicial (YYYY-MM-DD)')
+@click.option('--hasta', help='Fecha final (YYYY-MM-DD)')
+@click.option('--visita-id', 'visita_ids', multiple=True, help='Visita a enviar (se puede repetir)')
+@click.option('--pendientes', is_flag=True, help='Reintentar también los envíos que quedaron pendientes')
+@with_appcontext
+def enviar_informes(cliente_id, desde, hasta, visita_ids, pendientes):
+    from pdf_batch import select_visitas
+    from email_delivery import email_queue, NoRecipientError, ENVIADO
+    from models import db, Visita, EnvioInforme
+
+    encolados = email_queue.resume() if pendientes else 0
+    envio_ids = []
+    if cliente_id or desde or hasta or visita_ids:
+        for visita_id in select_visitas(cliente_id, _parse_fecha(desde), _parse_fecha(hasta), list(visita_ids)):
+            try:
+                envio_ids.append(email_queue.enqueue(db.session.get(Visita, visita_id)).id)
+            except NoRecipientError as e:
+                click.echo(f'  {e}', err=True)
+    if not envio_ids and not encolados:
+        raise click.ClickException('No hay informes para enviar')
+    click.echo(f'Enviando {len(envio_ids) + encolados} informes...')
+    email_queue.wait()
+
+    db.session.expire_all()
+    enviados = 0
+    for envio in EnvioInforme.query.filter(EnvioInforme.id.in_(envio_ids)).all():
+        if envio.estado == ENVIADO:
+            enviados += 1
+        else:
+            click.echo(f'  Visita {envio.visita_id} a {envio.destinatario}: {envio.error}', err=True)
+    click.echo(f'{enviados} de {len(envio_ids)} informes enviados')
+
+
+@click.command('reconstruir-busqueda')
+@with_appcontext
+def reconstruir_busqueda():
+    import busqueda
+    total = busqueda.reconstruir()
+    click.echo(f'Índice de búsqueda reconstruido ({total} visitas)')
+
+
+@click.command('importar')
+@click.argument('tipo', type=click.Choice(['clientes', 'visitas']))
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', default=5000, help='Filas por transacción')
+@with_appcontext
+def importar(tipo, archivo, lote):
+    from importacion import IMPORTADORES, ImportacionError
+    with open(archivo, 'rb') as f:
+        try:
+            reporte = IMPORTADORES[tipo](f, archivo, batch_rows=lote)
+        except ImportacionError as e:
+            raise click.ClickException(str(e))
+    for error in reporte['errores']:
+        click.echo(f'  Fila {error["fila"]}: {error["error"]}', err=True)
+    if reporte['total_errores'] > len(reporte['errores']):
+        click.echo(f'  ... y {reporte["total_errores"] - len(reporte["errores"])} errores más', err=True)
+    insertados = ', '.join(f'{n} {tabla}' for tabla, n in reporte['insertados'].items()) or 'nada'
+    click.echo(f'{reporte["filas"]} filas leídas: se importó {insertados}')
+
+
+# Mueve los archivos de la raíz de UPLOAD_FOLDER a subdirectorios por hash
+@click.command('migrar-uploads')
+@click.option('--dry-run', is_flag=True, help='Solo contar los archivos que se moverían')
+@with_appcontext
+def migrar_uploads(dry_run):
+    from storage import storage
+    backend = storage()
+    if not hasattr(backend, 'migrate_flat'):
+        raise click.ClickException('El backend de almacenamiento configurado no necesita migración')
+    movidos = backend.migrate_flat(dry_run=dry_run)
+    click.echo(f'{movidos} archivos {"por mover" if dry_run else "movidos"}')
+
+
+@click.command('purgar-eliminaciones')
+@click.option('--dias', type=int, help='Borrar las de más de estos días (por defecto CAMBIOS_RETENCION_DIAS)')
+@with_appcontext
+def purgar_eliminaciones(dias):
+    import cambios
+    if dias is None:
+        dias = current_app.config.get('CAMBIOS_RETENCION_DIAS', cambios.DEFAULT_RETENCION_DIAS)
+    borradas = cambios.purgar_eliminaciones(dias)
+    click.echo(f'{borradas} eliminaciones de más de {dias} días borradas')
+
+
+def register_commands(app):
+    app.cli.add_command(crear_tablas)
+    app.cli.add_command(exportar_informes)
+    app.cli.add_command(enviar_informes)
+    app.cli.add_command(crear_indices)
+    app.cli.add_command(reconstruir_estadisticas)
+    app.cli.add_command(reconstruir_busqueda)
+    app.cli.add_command(migrar_uploads)
+    app.cli.add_command(importar)
+    app.cli.add_command(purgar_eliminaciones)
@@ -0,0 +1,32 @@
+# Opciones del pool de conexiones de SQLAlchemy, configurables desde Config.
+# Cada proceso de gunicorn tiene su propio pool: el máximo de conexiones
+# abiertas contra PostgreSQL es workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+#
+# - DB_POOL_SIZE:     conexiones que se mantienen abiertas por proceso
+# - DB_MAX_OVERFLOW:  conexiones extra en picos (se cierran al devolverlas)
+# - DB_POOL_PRE_PING: comprobar la conexión antes de usarla (sobrevive a
+#                     reinicios de la base o a conexiones cortadas por un proxy)
+# - DB_POOL_RECYCLE:  segundos tras los que una conexión se reemplaza
+#
+# Lo que ya venga en SQLALCHEMY_ENGINE_OPTIONS tiene prioridad.
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_PRE_PING = True
+DEFAULT_POOL_RECYCLE = 1800
+
+
+def pool_size(app):
+    return app.config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE)
+
+
+# Llamar antes de db.init_app(app)
+def init_pool(app):
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('pool_pre_ping', app.config.get('DB_POOL_PRE_PING', DEFAULT_POOL_PRE_PING))
+    options.setdefault('pool_recycle', app.config.get('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE))
+    # SQLite (desarrollo): en memoria usa una conexión por hilo y no acepta tamaños
+    if not (app.config.get('SQLALCHEMY_DATABASE_URI') or '').startswith('sqlite'):
+        options.setdefault('pool_size', pool_size(app))
+        options.setdefault('max_overflow', app.config.get('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
@@ -0,0 +1,246 @@
+from flask import current_app
+from flask_mail import Mail, Message
+from models import db, Visita, Empresa, EnvioInforme
+from pdf_generator import generate_pdf
+from sqlalchemy import or_, update
+from datetime import datetime, timedelta
+import logging
+import queue
+import threading
+
+# Envío de informes por correo en segundo plano.
+# Las peticiones solo registran el envío (EnvioInforme) y lo encolan; un hilo
+# aparte toma los envíos pendientes en lotes y los manda por una sola conexión
+# SMTP (mail.connect()). Si el envío falla se reintenta con espera exponencial
+# hasta MAIL_MAX_RETRIES veces; el estado queda guardado en la base. Si lo
+# que falla es la conexión, todo el lote espera lo mismo antes de reintentar.
+#
+# Al arrancar el hilo (primer envío del proceso) se retoman los envíos que
+# quedaron pendientes. Con varios workers de gunicorn cada envío se reclama
+# antes de mandarlo (reclamado_en, con un UPDATE condicionado): solo un
+# proceso lo envía. Un reclamo de un proceso que murió vence a los
+# MAIL_CLAIM_TTL segundos.
+#
+# Para probar en local basta con un servidor SMTP de prueba, por ejemplo:
+#   python -m aiosmtpd -n -l localhost:8025
+# con MAIL_SERVER='localhost', MAIL_PORT=8025 y MAIL_USE_TLS=False.
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 30  # segundos; se duplica en cada reintento
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CLAIM_TTL = 600
+
+PENDIENTE = 'pendiente'
+ENVIADO = 'enviado'
+FALLIDO = 'fallido'
+
+logger = logging.getLogger(__name__)
+
+
+class NoRecipientError(Exception):
+    pass
+
+
+def envio_to_dict(envio):
+    return {
+        'id': envio.id,
+        'visita_id': envio.visita_id,
+        'destinatario': envio.destinatario,
+        'estado': envio.estado,
+        'intentos': envio.intentos,
+        'error': envio.error,
+        'creado_en': envio.creado_en.isoformat(),
+        'enviado_en': envio.enviado_en.isoformat() if envio.enviado_en else None,
+    }
+
+
+# Flask-Mail se inicializa con el primer envío y no al crear la app
+def _mail():
+    app = current_app._get_current_object()
+    if 'mail' not in app.extensions:
+        Mail(app)
+    return app.extensions['mail']
+
+
+def _build_message(envio, pdf_path):
+    visita = db.session.get(Visita, envio.visita_id)
+    empresa = Empresa.query.filter_by(user_id=visita.supervisor_id).first()
+    empresa_nombre = empresa.nombre if empresa else 'Empresa'
+    sender = current_app.config.get('MAIL_DEFAULT_SENDER') or (empresa.correo if empresa else None)
+    msg = Message(
+        subject=f'Informe de visita técnica {visita.id}',
+        sender=sender,
+        recipients=[envio.destinatario],
+        body=(
+            f'Cordial saludo, {visita.cliente.administrador}.\n\n'
+            f'Adjuntamos el informe de la visita técnica {visita.id} del '
+            f'{visita.fecha.strftime("%d/%m/%Y")}.\n\n{empresa_nombre}'
+        ),
+    )
+    with open(pdf_path, 'rb') as f:
+        msg.attach(f'visita-{visita.id}.pdf', 'application/pdf', f.read())
+    return msg
+
+
+class EmailQueue:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._en_curso = set()  # encolados o con reintento programado
+        self._thread = None
+        self._app = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            self._app = current_app._get_current_object()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='email-delivery', daemon=True)
+            self._thread.start()
+        # Hilo nuevo (arranque o reinicio del proceso): retomar los pendientes
+        self.resume()
+
+    # Registra el envío del informe de la visita y lo encola. Por defecto se
+    # manda al correo del cliente. Lanza NoRecipientError si no hay a quién.
+    def enqueue(self, visita, destinatario=None):
+        destinatario = destinatario or visita.cliente.correo
+        if not destinatario:
+            raise NoRecipientError(f'El cliente de la visita {visita.id} no tiene correo')
+        envio = EnvioInforme(visita_id=visita.id, destinatario=destinatario, estado=PENDIENTE)
+        db.session.add(envio)
+        db.session.commit()
+        self._put(envio.id)
+        return envio
+
+    # Vuelve a encolar los envíos que quedaron pendientes (p. ej. tras un reinicio)
+    def resume(self):
+        ids = [e.id for e in EnvioInforme.query.filter_by(estado=PENDIENTE).all()]
+        for envio_id in ids:
+            self._put(envio_id)
+        return len(ids)
+
+    def _put(self, envio_id):
+        with self._lock:
+            if envio_id in self._en_curso:
+                return
+            self._en_curso.add(envio_id)
+        self._ensure_worker()
+        self._queue.put(envio_id)
+
+    def _done(self, envio_id):
+        with self._lock:
+            self._en_curso.discard(envio_id)
+            if not self._en_curso:
+                self._idle.notify_all()
+
+    # Espera a que no queden envíos en curso (incluidos los reintentos programados)
+    def wait(self, timeout=None):
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._en_curso, timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            with self._app.app_context():
+                max_batch = current_app.config.get('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+                while len(batch) < max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self._send_batch(batch)
+                except Exception:
+                    logger.exception('Error inesperado enviando informes')
+                finally:
+                    db.session.remove()
+
+    def _send_batch(self, ids):
+        pending = list(ids)
+        mail = _mail()
+        try:
+            with mail.connect() as conn:
+                while pending:
+                    self._deliver(conn, pending[0])
+                    pending.pop(0)
+        except Exception as e:
+            # Falló la conexión o el envío del primero pendiente: ese cuenta
+            # como intento; el resto del lote espera lo mismo sin penalizar,
+            # para no reconectar en seguida a un servidor caído.
+            if not pending:
+                logger.warning('Error cerrando la conexión SMTP: %s', e)
+                return
+            delay = self._retry_or_fail(pending[0], e)
+            for envio_id in pending[1:]:
+                self._schedule(envio_id, delay or self._backoff(1))
+
+    def _backoff(self, intentos):
+        backoff = current_app.config.get('MAIL_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)
+        return backoff * 2 ** (intentos - 1)
+
+    def _schedule(self, envio_id, delay):
+        timer = threading.Timer(delay, self._queue.put, args=(envio_id,))
+        timer.daemon = True
+        timer.start()
+
+    # Marca el envío como tomado por este proceso. False si ya no está
+    # pendiente o si otro proceso lo reclamó hace menos de MAIL_CLAIM_TTL.
+    def _claim(self, envio_id):
+        ahora = datetime.utcnow()
+        ttl = current_app.config.get('MAIL_CLAIM_TTL', DEFAULT_CLAIM_TTL)
+        result = db.session.execute(update(EnvioInforme).where(
+            EnvioInforme.id == envio_id,
+            EnvioInforme.estado == PENDIENTE,
+            or_(EnvioInforme.reclamado_en.is_(None), EnvioInforme.reclamado_en < ahora - timedelta(seconds=ttl)),
+        ).values(reclamado_en=ahora))
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _deliver(self, conn, envio_id):
+        if not self._claim(envio_id):
+            self._done(envio_id)
+            return
+        envio = db.session.get(EnvioInforme, envio_id)
+        pdf_path = generate_pdf(envio.visita_id)
+        if not pdf_path:
+            envio.estado = FALLIDO
+            envio.error = 'No se puede generar PDF: falta al menos una foto'
+            db.session.commit()
+            self._done(envio_id)
+            return
+        msg = _build_message(envio, pdf_path)
+        envio.intentos += 1
+        conn.send(msg)
+        envio.estado = ENVIADO
+        envio.error = None
+        envio.enviado_en = datetime.utcnow()
+        db.session.commit()
+        self._done(envio_id)
+
+    # Devuelve la espera hasta el reintento, o None si el envío se da por fallido
+    def _retry_or_fail(self, envio_id, error):
+        db.session.rollback()
+        envio = db.session.get(EnvioInforme, envio_id)
+        if envio is None:
+            self._done(envio_id)
+            return None
+        envio.intentos += 1
+        envio.reclamado_en = None
+        envio.error = str(error)
+        max_retries = current_app.config.get('MAIL_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+        if envio.intentos > max_retries:
+            envio.estado = FALLIDO
+            db.session.commit()
+            logger.warning('Envío %s a %s fallido tras %s intentos: %s',
+                           envio.id, envio.destinatario, envio.intentos, error)
+            self._done(envio_id)
+            return None
+        db.session.commit()
+        delay = self._backoff(envio.intentos)
+        logger.info('Reintentando envío %s en %ss: %s', envio.id, delay, error)
+        self._schedule(envio_id, delay)
+        return delay
+
+
+email_queue = EmailQueue()
@@ -0,0 +1,180 @@
+from models import db, Visita, Zona, EstadisticaCalificacion
+from sqlalchemy import bindparam, func
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Mantenimiento incremental del resumen de calificaciones.
+# Antes de modificar o eliminar una visita se restan sus zonas del resumen y
+# después de escribirla se vuelven a sumar, dentro de la misma transacción.
+
+CALIFICACIONES = ('Buena', 'Media', 'Mala')
+DIMENSIONES = {
+    'cliente': EstadisticaCalificacion.cliente_id,
+    'supervisor': EstadisticaCalificacion.supervisor_id,
+    'seccion': EstadisticaCalificacion.seccion,
+    'mes': EstadisticaCalificacion.mes,
+}
+
+
+def _conteos_visita(visita):
+    rows = db.session.query(Zona.seccion, Zona.calificacion, func.count(Zona.id)) \
+        .filter(Zona.visita_id == visita.id) \
+        .group_by(Zona.seccion, Zona.calificacion).all()
+    fecha = visita.fecha.date() if isinstance(visita.fecha, datetime) else visita.fecha
+    mes = fecha.replace(day=1)
+    return [{
+        'cliente_id': visita.cliente_id,
+        'supervisor_id': visita.supervisor_id,
+        'seccion': seccion,
+        'mes': mes,
+        'calificacion': calificacion,
+        'total': total,
+    } for seccion, calificacion, total in rows]
+
+
+KEYS = ('cliente_id', 'supervisor_id', 'seccion', 'mes', 'calificacion')
+
+
+def _sumar(rows):
+    if not rows:
+        return
+    dialect = db.engine.dialect.name
+    table = EstadisticaCalificacion.__table__
+    if dialect in ('postgresql', 'sqlite'):
+        module = postgresql if dialect == 'postgresql' else sqlite
+        stmt = module.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEYS),
+            set_={'total': table.c.total + stmt.excluded.total},
+        )
+        db.session.execute(stmt, rows)
+        return
+    # Otros motores: leer y escribir fila por fila
+    for row in rows:
+        existente = EstadisticaCalificacion.query.filter_by(**{k: row[k] for k in KEYS}).first()
+        if existente:
+            existente.total += row['total']
+        else:
+            db.session.add(EstadisticaCalificacion(**row))
+
+
+def _restar(rows):
+    if not rows:
+        return
+    # Si la fila no existe (resumen sin reconstruir) no hay nada que restar
+    table = EstadisticaCalificacion.__table__
+    stmt = table.update() \
+        .where(*[table.c[k] == bindparam(f'k_{k}') for k in KEYS]) \
+        .values(total=table.c.total - bindparam('delta'))
+    claves = [dict({f'k_{k}': row[k] for k in KEYS}, delta=row['total']) for row in rows]
+    db.session.execute(stmt, claves)
+    # Las filas que quedan en cero se borran: no se acumulan y no impiden
+    # eliminar el cliente o el supervisor
+    db.session.execute(table.delete()
+                       .where(*[table.c[k] == bindparam(f'k_{k}') for k in KEYS])
+                       .where(table.c.total <= 0), claves)
+
+
+# Llamar con la visita y sus zonas tal como están en la base antes de cambiarlas
+def restar_visita(visita):
+    db.session.flush()
+    _restar(_conteos_visita(visita))
+
+
+# Llamar después de escribir la visita y sus zonas
+def sumar_visita(visita):
+    db.session.flush()
+    _sumar(_conteos_visita(visita))
+
+
+# Suma zonas insertadas en bloque (importación) sin volver a consultarlas.
+# `zonas`: tuplas (cliente_id, supervisor_id, seccion, fecha, calificacion)
+def sumar_zonas(zonas):
+    totales = {}
+    for cliente_id, supervisor_id, seccion, fecha, calificacion in zonas:
+        key = (cliente_id, supervisor_id, seccion, fecha.replace(day=1), calificacion)
+        totales[key] = totales.get(key, 0) + 1
+    _sumar([dict(zip(KEYS, key), total=total) for key, total in totales.items()])
+
+
+# Resta zonas sueltas (p. ej. al eliminar o modificar una zona). Mismo
+# formato que sumar_zonas.
+def restar_zonas(zonas):
+    totales = {}
+    for cliente_id, supervisor_id, seccion, fecha, calificacion in zonas:
+        key = (cliente_id, supervisor_id, seccion, fecha.replace(day=1), calificacion)
+        totales[key] = totales.get(key, 0) + 1
+    _restar([dict(zip(KEYS, key), total=total) for key, total in totales.items()])
+
+
+# Al eliminar un cliente o un supervisor sus filas del resumen se van con él
+def quitar_cliente(cliente_id):
+    EstadisticaCalificacion.query.filter_by(cliente_id=cliente_id).delete()
+
+
+def quitar_supervisor(supervisor_id):
+    EstadisticaCalificacion.query.filter_by(supervisor_id=supervisor_id).delete()
+
+
+def clave_zona(zona):
+    visita = zona.visita
+    return (visita.cliente_id, visita.supervisor_id, zona.seccion, visita.fecha, zona.calificacion)
+
+
+# Recalcula todo el resumen desde zonas (backfill o corrección)
+def reconstruir():
+    EstadisticaCalificacion.query.delete()
+    rows = db.session.query(
+        Visita.cliente_id, Visita.supervisor_id, Zona.seccion, Visita.fecha,
+        Zona.calificacion, func.count(Zona.id),
+    ).join(Zona, Zona.visita_id == Visita.id) \
+        .group_by(Visita.cliente_id, Visita.supervisor_id, Zona.seccion, Visita.fecha, Zona.calificacion)
+
+    # La base agrupa por fecha; los meses se juntan aquí para no depender de
+    # funciones de fecha propias de cada motor
+    totales = {}
+    for cliente_id, supervisor_id, seccion, fecha, calificacion, total in rows.yield_per(1000):
+        key = (cliente_id, supervisor_id, seccion, fecha.replace(day=1), calificacion)
+        totales[key] = totales.get(key, 0) + total
+
+    if totales:
+        db.session.execute(EstadisticaCalificacion.__table__.insert(), [{
+            'cliente_id': k[0], 'supervisor_id': k[1], 'seccion': k[2],
+            'mes': k[3], 'calificacion': k[4], 'total': total,
+        } for k, total in totales.items()])
+    db.session.commit()
+    return len(totales)
+
+
+# Consulta agrupada por las dimensiones pedidas, con una columna por calificación
+def consultar(agrupar, cliente_id=None, supervisor_id=None, desde=None, hasta=None):
+    columnas = [DIMENSIONES[d] for d in agrupar]
+    query = db.session.query(
+        *columnas, EstadisticaCalificacion.calificacion, func.sum(EstadisticaCalificacion.total),
+    )
+    if cliente_id:
+        query = query.filter(EstadisticaCalificacion.cliente_id == cliente_id)
+    if supervisor_id:
+        query = query.filter(EstadisticaCalificacion.supervisor_id == supervisor_id)
+    if desde:
+        query = query.filter(EstadisticaCalificacion.mes >= desde)
+    if hasta:
+        query = query.filter(EstadisticaCalificacion.mes <= hasta)
+    query = query.group_by(*columnas, EstadisticaCalificacion.calificacion)
+
+    grupos = {}
+    for row in query.all():
+        key = tuple(row[:len(agrupar)])
+        calificacion, total = row[len(agrupar)], row[len(agrupar) + 1] or 0
+        if key not in grupos:
+            grupos[key] = dict(zip(agrupar, key))
+            grupos[key].update({c: 0 for c in CALIFICACIONES})
+            grupos[key]['total'] = 0
+        grupos[key][calificacion] += total
+        grupos[key]['total'] += total
+
+    resultado = [g for g in grupos.values() if g['total'] > 0]
+    for grupo in resultado:
+        if 'mes' in grupo:
+            grupo['mes'] = grupo['mes'].strftime('%Y-%m')
+    return sorted(resultado, key=lambda g: [str(g[d]) for d in agrupar])
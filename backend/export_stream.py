@@ -0,0 +1,73 @@
+from models import db, User, Cliente, Visita, Zona
+import csv
+import io
+import json
+
+# Exportación en streaming de visitas con sus zonas (NDJSON o CSV).
+# Se consultan solo columnas (sin objetos ORM ni identity map) y con
+# yield_per, que en PostgreSQL usa un cursor del lado del servidor: la memoria
+# se mantiene constante sin importar cuántas visitas haya en el rango.
+
+YIELD_PER = 1000
+# Filas de CSV que se agrupan en cada chunk enviado al cliente
+CSV_CHUNK_ROWS = 500
+
+VISITA_COLUMNS = ['visita_id', 'fecha', 'cliente_id', 'cliente', 'supervisor_id', 'supervisor', 'conclusiones']
+ZONA_COLUMNS = ['zona_id', 'seccion', 'concepto_actividad', 'calificacion', 'observaciones', 'foto_url']
+
+
+def export_query():
+    return db.session.query(
+        Visita.id, Visita.fecha, Visita.cliente_id, Cliente.nombre,
+        Visita.supervisor_id, User.nombre, Visita.conclusiones,
+        Zona.id, Zona.seccion, Zona.concepto_actividad, Zona.calificacion,
+        Zona.observaciones, Zona.foto_url,
+    ).select_from(Visita) \
+        .join(Cliente, Visita.cliente_id == Cliente.id) \
+        .join(User, Visita.supervisor_id == User.id) \
+        .outerjoin(Zona, Zona.visita_id == Visita.id)
+
+
+def _rows(query):
+    query = query.order_by(Visita.fecha, Visita.id, Zona.id)
+    for row in query.yield_per(YIELD_PER):
+        visita = dict(zip(VISITA_COLUMNS, row[:7]))
+        visita['fecha'] = visita['fecha'].strftime('%Y-%m-%d')
+        zona = dict(zip(ZONA_COLUMNS, row[7:])) if row[7] is not None else None
+        yield visita, zona
+
+
+# Una línea por visita con sus zonas anidadas. Las filas llegan ordenadas por
+# visita, así que solo se mantiene en memoria la visita actual.
+def ndjson_stream(query):
+    current = None
+    for visita, zona in _rows(query):
+        if current is None or current['visita_id'] != visita['visita_id']:
+            if current is not None:
+                yield json.dumps(current, ensure_ascii=False) + '\n'
+            current = dict(visita, zonas=[])
+        if zona:
+            current['zonas'].append(zona)
+    if current is not None:
+        yield json.dumps(current, ensure_ascii=False) + '\n'
+
+
+# Una fila por zona con los datos de la visita repetidos (las visitas sin
+# zonas salen con las columnas de zona vacías).
+def csv_stream(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel detecte UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(VISITA_COLUMNS + ZONA_COLUMNS)
+    pending = 0
+    for visita, zona in _rows(query):
+        zona = zona or {}
+        writer.writerow([visita[c] for c in VISITA_COLUMNS] + [zona.get(c, '') for c in ZONA_COLUMNS])
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
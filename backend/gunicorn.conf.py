@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+
+# Servidor de producción:
+#   cd backend
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Workers con hilos (gthread): cada proceso atiende GUNICORN_THREADS
+# peticiones a la vez, lo que conviene mientras se espera a la base o al
+# disco; más procesos reparten el trabajo de CPU (PDFs) entre núcleos.
+# DB_POOL_SIZE debería ser al menos GUNICORN_THREADS.
+#
+# No se usa preload_app: el hilo del logging y el pool de conexiones no
+# sobreviven al fork, así que cada worker importa la app por su cuenta.
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+# Un informe con muchas fotos puede tardar; el resto responde en milisegundos
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Reiniciar cada worker de vez en cuando acota la memoria que va acumulando
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+
+
+def post_worker_init(worker):
+    from warmup import warm_up
+    warm_up(worker.wsgi)
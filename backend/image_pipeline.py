@@ -0,0 +1,114 @@
+from PIL import Image as PILImage, ImageOps
+import logging
+import os
+import tempfile
+
+# Derivados que se generan al subir una imagen. Se guardan junto al original
+# con un sufijo: foto.jpg -> foto__print.jpg, foto__thumb.jpg, foto__web.jpg
+#
+# - print: tamaño justo para la celda del PDF (2x2 pulgadas a 300 dpi)
+# - thumb: miniatura para los listados del frontend
+# - web:   JPEG recomprimido y sin EXIF (ni GPS) para servir en la app; si la
+#          imagen tiene transparencia (logos) es un PNG, foto__web.png
+VARIANTS = {
+    'print': {'max_side': 600, 'quality': 85},
+    'thumb': {'max_side': 256, 'quality': 75},
+    'web': {'max_side': 2048, 'quality': 85},
+}
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+
+
+def is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_path(path, variant, ext='jpg'):
+    base, _ = os.path.splitext(path)
+    return f'{base}__{variant}.{ext}'
+
+
+def is_variant(filename):
+    base, _ = os.path.splitext(filename)
+    return any(base.endswith(f'__{v}') for v in VARIANTS)
+
+
+def _has_alpha(img):
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def _to_rgb(img):
+    if _has_alpha(img):
+        # Los logos con transparencia se componen sobre fondo blanco
+        img = img.convert('RGBA')
+        background = PILImage.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _save_variant(img, path, variant):
+    opts = VARIANTS[variant]
+    derived = img.copy()
+    derived.thumbnail((opts['max_side'], opts['max_side']), PILImage.LANCZOS)
+    # Se escribe en un temporal del mismo directorio y se mueve al final: si
+    # el proceso muere a mitad o dos peticiones generan el mismo derivado, nunca
+    # queda un archivo truncado en la ruta definitiva (ensure_variant lo daría por bueno)
+    ext = os.path.splitext(path)[1]
+    fd, tmp = tempfile.mkstemp(prefix='.variant-', suffix=ext, dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            # Guardar sin exif: solo se escriben los píxeles
+            if ext == '.png':
+                derived.save(f, 'PNG', optimize=True)
+            else:
+                derived.save(f, 'JPEG', quality=opts['quality'], optimize=True, progressive=True)
+        os.chmod(tmp, 0o644)  # mkstemp crea con 0600
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+# Genera todos los derivados de una imagen recién subida.
+# Devuelve un dict variante -> ruta, o {} si el archivo no es una imagen válida.
+def process_upload(path):
+    if not is_image(path):
+        return {}
+    try:
+        with PILImage.open(path) as img:
+            # Fotos de celular: aplicar la orientación del EXIF antes de descartarlo
+            img.draft('RGB', (VARIANTS['web']['max_side'], VARIANTS['web']['max_side']))
+            img = ImageOps.exif_transpose(img)
+            # El PDF no necesita la transparencia (su fondo es blanco), la app sí
+            transparente = img.convert('RGBA') if _has_alpha(img) else None
+            img = _to_rgb(img)
+            result = {}
+            for variant in VARIANTS:
+                if variant == 'web' and transparente is not None:
+                    target = variant_path(path, variant, 'png')
+                    _save_variant(transparente, target, variant)
+                else:
+                    target = variant_path(path, variant)
+                    _save_variant(img, target, variant)
+                result[variant] = target
+            return result
+    except Exception as e:
+        logger.warning("Error procesando imagen %s: %s", path, e)
+        return {}
+
+
+# Ruta del derivado pedido, generándolo si el original es anterior al pipeline.
+# Si no se puede generar, devuelve la ruta original.
+def ensure_variant(path, variant):
+    if not os.path.exists(path):
+        return path
+    for ext in ('jpg', 'png'):
+        target = variant_path(path, variant, ext)
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+            return target
+    return process_upload(path).get(variant, path)
@@ -0,0 +1,382 @@
+from models import db, User, Cliente, Visita, Zona
+from sqlalchemy import insert
+from datetime import date, datetime
+import busqueda
+import csv
+import estadisticas
+import io
+import itertools
+import os
+
+# Importación masiva de clientes y visitas históricas desde CSV o XLSX.
+#
+# El archivo se lee fila por fila (csv o openpyxl en modo read_only) y se
+# inserta en lotes: cada lote es una transacción con un INSERT por tabla
+# (COPY en PostgreSQL, executemany en los demás motores). Las filas con
+# errores se omiten y se informan con su número de fila.
+#
+# Clientes: nit, nombre, administrador, correo, tipo_codigo[, logo_url]
+# Visitas: una fila por zona, con las filas de cada visita seguidas (el mismo
+# formato que exporta /visitas/export?formato=csv):
+#   visita_id, fecha, cliente_id o cliente_nit, supervisor_id o supervisor_email,
+#   conclusiones, seccion, concepto_actividad, calificacion, observaciones, foto_url
+# Una fila sin sección ni concepto crea la visita sin zonas.
+
+DEFAULT_BATCH_ROWS = 5000
+MAX_ERRORES = 1000
+FORMATOS = ('.csv', '.xlsx')
+
+
+class ImportacionError(Exception):
+    pass
+
+
+def _texto(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value).strip()
+
+
+def _fecha(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = _texto(value)
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(value, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'fecha inválida: {value!r} (usa YYYY-MM-DD o DD/MM/YYYY)')
+
+
+def _filas_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    primera = text.readline()
+    # Excel en español suele guardar los CSV separados por punto y coma
+    delimitador = ';' if primera.count(';') > primera.count(',') else ','
+    return csv.reader(itertools.chain([primera], text), delimiter=delimitador)
+
+
+def _filas_xlsx(stream):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportacionError('Para importar archivos XLSX hay que instalar openpyxl')
+    libro = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    return libro.active.iter_rows(values_only=True)
+
+
+# Devuelve (columnas, iterador de (número de fila, dict)) sin cargar el archivo
+# completo en memoria. Las filas vacías se saltan.
+def leer_filas(stream, filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in FORMATOS:
+        raise ImportacionError('El archivo debe ser .csv o .xlsx')
+    filas = _filas_csv(stream) if extension == '.csv' else _filas_xlsx(stream)
+    try:
+        encabezado = next(iter(filas))
+    except StopIteration:
+        raise ImportacionError('El archivo está vacío')
+    columnas = [_texto(c).lower() for c in encabezado]
+
+    def generar():
+        for numero, valores in enumerate(filas, start=2):
+            if not any(_texto(v) for v in valores):
+                continue
+            yield numero, dict(zip(columnas, valores))
+    return columnas, generar()
+
+
+# En el CSV de COPY un campo vacío sin comillas es NULL y "" es un texto
+# vacío: None va sin comillas y todo lo demás entre comillas.
+def _copy_campo(valor):
+    if valor is None:
+        return ''
+    return '"' + str(valor).replace('"', '""') + '"'
+
+
+def _copy_csv(columnas, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_copy_campo(row[c]) for c in columnas))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def _copy(table, rows):
+    columnas = list(rows[0].keys())
+    buffer = _copy_csv(columnas, rows)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f'COPY {table.name} ({", ".join(columnas)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def _insertar(model, rows):
+    if not rows:
+        return
+    # COPY no aplica los default de los modelos: updated_at va explícito
+    if 'updated_at' in model.__table__.c:
+        ahora = datetime.utcnow()
+        rows = [dict(row, updated_at=ahora) for row in rows]
+    if db.engine.dialect.name == 'postgresql':
+        _copy(model.__table__, rows)
+    else:
+        db.session.execute(insert(model), rows)
+
+
+class _Reporte:
+    def __init__(self):
+        self.insertados = {}
+        self.errores = []
+        self.total_errores = 0
+        self.filas = 0
+
+    def error(self, fila, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({'fila': fila, 'error': mensaje})
+
+    def sumar(self, tabla, cantidad):
+        self.insertados[tabla] = self.insertados.get(tabla, 0) + cantidad
+
+    def to_dict(self):
+        return {
+            'filas': self.filas,
+            'insertados': self.insertados,
+            'total_errores': self.total_errores,
+            'errores': self.errores,
+        }
+
+
+def _requeridas(columnas, *grupos):
+    faltantes = [' o '.join(g) for g in grupos if not any(c in columnas for c in g)]
+    if faltantes:
+        raise ImportacionError(f'Faltan columnas: {", ".join(faltantes)}')
+
+
+# Clientes
+
+CLIENTE_CAMPOS = {'nit': 20, 'nombre': 100, 'administrador': 100, 'correo': 120, 'tipo_codigo': 10}
+
+
+def _validar_cliente(fila):
+    valores = {}
+    for campo, largo in CLIENTE_CAMPOS.items():
+        valor = _texto(fila.get(campo))
+        if not valor:
+            raise ValueError(f'{campo} es requerido')
+        if len(valor) > largo:
+            raise ValueError(f'{campo} supera {largo} caracteres')
+        valores[campo] = valor
+    if '@' not in valores['correo']:
+        raise ValueError('correo inválido')
+    valores['logo_url'] = _texto(fila.get('logo_url')) or None
+    return valores
+
+
+def importar_clientes(stream, filename, batch_rows=DEFAULT_BATCH_ROWS):
+    columnas, filas = leer_filas(stream, filename)
+    _requeridas(columnas, *[(c,) for c in CLIENTE_CAMPOS])
+    reporte = _Reporte()
+    nits = {nit for (nit,) in db.session.query(Cliente.nit)}
+    lote = []
+
+    def guardar():
+        try:
+            _insertar(Cliente, [valores for _, valores in lote])
+            db.session.commit()
+            reporte.sumar('clientes', len(lote))
+        except Exception as e:
+            db.session.rollback()
+            for numero, _ in lote:
+                reporte.error(numero, f'Error al guardar el lote: {e}')
+        lote.clear()
+
+    for numero, fila in filas:
+        reporte.filas += 1
+        try:
+            valores = _validar_cliente(fila)
+        except ValueError as e:
+            reporte.error(numero, str(e))
+            continue
+        if valores['nit'] in nits:
+            reporte.error(numero, f'Ya existe un cliente con NIT {valores["nit"]}')
+            continue
+        nits.add(valores['nit'])
+        lote.append((numero, valores))
+        if len(lote) >= batch_rows:
+            guardar()
+    if lote:
+        guardar()
+    return reporte.to_dict()
+
+
+# Visitas
+
+ZONA_CAMPOS = {'seccion': 50, 'concepto_actividad': 100}
+
+
+class _Referencias:
+    # Ids de clientes y supervisores, para validar sin una consulta por fila
+    def __init__(self):
+        self.clientes = {}
+        for cliente_id, nit in db.session.query(Cliente.id, Cliente.nit):
+            self.clientes[str(cliente_id)] = cliente_id
+            self.clientes[f'nit:{nit}'] = cliente_id
+        self.supervisores = {}
+        for user_id, email in db.session.query(User.id, User.email):
+            self.supervisores[str(user_id)] = user_id
+            self.supervisores[f'email:{email.lower()}'] = user_id
+
+    def cliente(self, fila):
+        if _texto(fila.get('cliente_id')):
+            return self.clientes.get(_texto(fila['cliente_id']))
+        return self.clientes.get(f'nit:{_texto(fila.get("cliente_nit"))}')
+
+    def supervisor(self, fila):
+        if _texto(fila.get('supervisor_id')):
+            return self.supervisores.get(_texto(fila['supervisor_id']))
+        return self.supervisores.get(f'email:{_texto(fila.get("supervisor_email")).lower()}')
+
+
+def _validar_visita(visita_id, fila, referencias):
+    if len(visita_id) > 20:
+        raise ValueError('visita_id supera 20 caracteres')
+    cliente_id = referencias.cliente(fila)
+    if cliente_id is None:
+        raise ValueError('cliente no encontrado')
+    supervisor_id = referencias.supervisor(fila)
+    if supervisor_id is None:
+        raise ValueError('supervisor no encontrado')
+    return {
+        'id': visita_id,
+        'fecha': _fecha(fila.get('fecha')),
+        'cliente_id': cliente_id,
+        'supervisor_id': supervisor_id,
+        'conclusiones': _texto(fila.get('conclusiones')),
+    }
+
+
+# Devuelve los valores de la zona, o None si la fila no trae zona
+def _validar_zona(fila):
+    valores = {campo: _texto(fila.get(campo)) for campo in ZONA_CAMPOS}
+    calificacion = _texto(fila.get('calificacion')).capitalize()
+    if not any(valores.values()) and not calificacion:
+        return None
+    for campo, largo in ZONA_CAMPOS.items():
+        if not valores[campo]:
+            raise ValueError(f'{campo} es requerido')
+        if len(valores[campo]) > largo:
+            raise ValueError(f'{campo} supera {largo} caracteres')
+    if calificacion not in estadisticas.CALIFICACIONES:
+        raise ValueError('calificacion debe ser Buena, Media o Mala')
+    valores['calificacion'] = calificacion
+    valores['observaciones'] = _texto(fila.get('observaciones'))
+    valores['foto_url'] = _texto(fila.get('foto_url'))
+    return valores
+
+
+def importar_visitas(stream, filename, batch_rows=DEFAULT_BATCH_ROWS):
+    columnas, filas = leer_filas(stream, filename)
+    _requeridas(columnas, ('visita_id',), ('fecha',), ('cliente_id', 'cliente_nit'),
+                ('supervisor_id', 'supervisor_email'))
+    reporte = _Reporte()
+    referencias = _Referencias()
+    vistas = set()
+    lote = []  # (filas, visita, zonas)
+
+    def guardar():
+        ids = [visita['id'] for _, visita, _ in lote]
+        existentes = {visita_id for (visita_id,) in db.session.query(Visita.id).filter(Visita.id.in_(ids))}
+        nuevas = []
+        for numeros, visita, zonas in lote:
+            if visita['id'] in existentes:
+                for numero in numeros:
+                    reporte.error(numero, f'La visita {visita["id"]} ya existe')
+            else:
+                nuevas.append((numeros, visita, zonas))
+        lote.clear()
+        if not nuevas:
+            return
+        try:
+            _insertar(Visita, [visita for _, visita, _ in nuevas])
+            _insertar(Zona, [dict(z, visita_id=visita['id']) for _, visita, zonas in nuevas for z in zonas])
+            estadisticas.sumar_zonas(
+                (visita['cliente_id'], visita['supervisor_id'], z['seccion'], visita['fecha'], z['calificacion'])
+                for _, visita, zonas in nuevas for z in zonas
+            )
+            busqueda.indexar_documentos([{
+                'visita_id': visita['id'],
+                'conclusiones': visita['conclusiones'],
+                'zonas': busqueda.texto_zonas((z['seccion'], z['concepto_actividad'], z['observaciones']) for z in zonas),
+            } for _, visita, zonas in nuevas])
+            db.session.commit()
+            reporte.sumar('visitas', len(nuevas))
+            reporte.sumar('zonas', sum(len(zonas) for _, _, zonas in nuevas))
+        except Exception as e:
+            db.session.rollback()
+            for numeros, _, _ in nuevas:
+                for numero in numeros:
+                    reporte.error(numero, f'Error al guardar el lote: {e}')
+
+    def procesar(visita_id, grupo):
+        numeros = [numero for numero, _ in grupo]
+        if not visita_id:
+            for numero in numeros:
+                reporte.error(numero, 'visita_id es requerido')
+            return 0
+        if visita_id in vistas:
+            for numero in numeros:
+                reporte.error(numero, f'Las filas de la visita {visita_id} deben ir seguidas')
+            return 0
+        vistas.add(visita_id)
+        try:
+            visita = _validar_visita(visita_id, grupo[0][1], referencias)
+        except ValueError as e:
+            for numero in numeros:
+                reporte.error(numero, str(e))
+            return 0
+        zonas = []
+        validas = []
+        for numero, fila in grupo:
+            try:
+                zona = _validar_zona(fila)
+            except ValueError as e:
+                reporte.error(numero, str(e))
+                continue
+            validas.append(numero)
+            if zona:
+                zonas.append(zona)
+        lote.append((validas, visita, zonas))
+        return 1 + len(zonas)
+
+    pendientes = 0
+    grupo_id, grupo = None, []
+    for numero, fila in filas:
+        reporte.filas += 1
+        visita_id = _texto(fila.get('visita_id'))
+        if grupo and visita_id != grupo_id:
+            pendientes += procesar(grupo_id, grupo)
+            grupo = []
+            if pendientes >= batch_rows:
+                guardar()
+                pendientes = 0
+        grupo_id = visita_id
+        grupo.append((numero, fila))
+    if grupo:
+        procesar(grupo_id, grupo)
+    if lote:
+        guardar()
+    return reporte.to_dict()
+
+
+IMPORTADORES = {
+    'clientes': importar_clientes,
+    'visitas': importar_visitas,
+}
@@ -0,0 +1,34 @@
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import logging
+import queue
+
+# Logging sin bloquear las peticiones: los handlers de la app solo encolan el
+# registro y un hilo aparte (QueueListener) lo formatea y lo escribe.
+# Nivel configurable con LOG_LEVEL (por defecto INFO).
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+_listener = None
+
+
+def init_logging(app):
+    global _listener
+    level = app.config.get('LOG_LEVEL', 'INFO')
+    root = logging.getLogger()
+    root.setLevel(level)
+    # Por cada app: el logger de Flask propaga a la raíz en lugar de escribir
+    # directo a stderr (si no, cada línea sale dos veces)
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root.addHandler(QueueHandler(log_queue))
@@ -0,0 +1,145 @@
+from flask import Response, g, request
+from query_stats import current_stats
+from contextlib import contextmanager
+import threading
+import time
+
+# Métricas del backend en formato de texto de Prometheus, expuestas en /metrics.
+# Se guardan en memoria del proceso: con varios workers cada uno expone las
+# suyas (Prometheus las suma por instancia).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+UPLOAD_ENDPOINTS = ('routes.upload_file', 'routes.upload_chunk')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.buckets = buckets
+        self._values = {}  # labels -> [conteo por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.label_names)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, data in sorted(self._values.items()):
+                for i, bound in enumerate(self.buckets):
+                    labels = _labels(self.label_names + ('le',), key + (bound,))
+                    lines.append(f'{self.name}_bucket{labels} {data[i]}')
+                labels = _labels(self.label_names + ('le',), key + ('+Inf',))
+                lines.append(f'{self.name}_bucket{labels} {data[-1]}')
+                lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {data[-2]}')
+                lines.append(f'{self.name}_count{_labels(self.label_names, key)} {data[-1]}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Latencia de las peticiones HTTP', ('endpoint', 'method'))
+REQUESTS = Counter('http_requests_total', 'Peticiones HTTP por código de estado', ('endpoint', 'method', 'status'))
+DB_QUERIES = Counter('db_queries_total', 'Consultas SQL ejecutadas', ('endpoint',))
+DB_QUERY_SECONDS = Counter('db_query_seconds_total', 'Tiempo total en consultas SQL', ('endpoint',))
+PDF_PHASES = Histogram('pdf_render_phase_seconds', 'Duración de cada fase del render de PDF', ('phase',))
+UPLOAD_BYTES = Counter('upload_bytes_total', 'Bytes recibidos en subidas de archivos', ('endpoint',))
+
+REGISTRY = [REQUEST_LATENCY, REQUESTS, DB_QUERIES, DB_QUERY_SECONDS, PDF_PHASES, UPLOAD_BYTES]
+
+
+# Acumula el tiempo de cada fase de un render de PDF (una fase puede medirse
+# varias veces, p. ej. una por foto) y al final registra un total por fase.
+class RenderTimer:
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, phase, seconds):
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def record(self):
+        for phase, seconds in self.totals.items():
+            PDF_PHASES.observe(seconds, phase=phase)
+
+
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    endpoint = request.endpoint or 'not_found'
+    if endpoint == 'metrics':
+        return response
+    REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    stats = current_stats()
+    DB_QUERIES.inc(stats['count'], endpoint=endpoint)
+    DB_QUERY_SECONDS.inc(stats['time'], endpoint=endpoint)
+    if endpoint in UPLOAD_ENDPOINTS and request.content_length:
+        UPLOAD_BYTES.inc(request.content_length, endpoint=endpoint)
+    return response
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app):
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics',
+                     lambda: Response(render_metrics(), mimetype='text/plain; version=0.0.4'))
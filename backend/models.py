@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Enum
 from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime
 
 db = SQLAlchemy()
 
@@ -33,6 +34,10 @@ class Empresa(db.Model):
 
 class Cliente(db.Model):
     __tablename__ = 'clientes'
+    __table_args__ = (
+        # Orden del feed /cambios
+        db.Index('ix_clientes_updated_at_id', 'updated_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     nit = db.Column(db.String(20), unique=True, nullable=False)
     nombre = db.Column(db.String(100), nullable=False)
@@ -40,14 +45,22 @@ class Cliente(db.Model):
     correo = db.Column(db.String(120), nullable=False)
     tipo_codigo = db.Column(db.String(10), nullable=False)  # e.g., 'AL'
     logo_url = db.Column(db.String(200))  # URL relativa al logo del cliente
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Visita(db.Model):
     __tablename__ = 'visitas'
+    __table_args__ = (
+        # Orden de la paginación por cursor de /visitas
+        db.Index('ix_visitas_fecha_id', 'fecha', 'id'),
+        # Orden del feed /cambios
+        db.Index('ix_visitas_updated_at_id', 'updated_at', 'id'),
+    )
     id = db.Column(db.String(20), primary_key=True)  # Autogenerado: NUM-TIPO-FECHA
     fecha = db.Column(db.Date, nullable=False)
-    supervisor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
+    supervisor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False, index=True)
     conclusiones = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     supervisor = db.relationship('User', foreign_keys=[supervisor_id])
     cliente = db.relationship('Cliente')
@@ -55,10 +68,80 @@ class Visita(db.Model):
 
 class Zona(db.Model):
     __tablename__ = 'zonas'
+    __table_args__ = (
+        # Orden del feed /cambios
+        db.Index('ix_zonas_updated_at_id', 'updated_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    visita_id = db.Column(db.String(20), db.ForeignKey('visitas.id'), nullable=False)
+    visita_id = db.Column(db.String(20), db.ForeignKey('visitas.id'), nullable=False, index=True)
     seccion = db.Column(db.String(50), nullable=False)  # 'Aseo y Limpieza', 'Seguridad y Salud', 'Colaborador'
     concepto_actividad = db.Column(db.String(100), nullable=False)
     calificacion = db.Column(Enum('Buena', 'Media', 'Mala', name='calif_enum'), nullable=False)
     observaciones = db.Column(db.Text)
-    foto_url = db.Column(db.String(200))  # URL relativa a la imagen subida (solo para Aseo y Seguridad)
\ No newline at end of file
+    foto_url = db.Column(db.String(200))  # URL relativa a la imagen subida (solo para Aseo y Seguridad)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Resumen de calificaciones por cliente, supervisor, sección y mes.
+# Se mantiene de forma incremental al crear, editar o eliminar visitas
+# (ver estadisticas.py) para que /estadisticas no tenga que recorrer zonas.
+class EstadisticaCalificacion(db.Model):
+    __tablename__ = 'estadisticas_calificacion'
+    __table_args__ = (
+        db.UniqueConstraint('cliente_id', 'supervisor_id', 'seccion', 'mes', 'calificacion',
+                            name='uq_estadisticas_calificacion'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False, index=True)
+    supervisor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    seccion = db.Column(db.String(50), nullable=False)
+    mes = db.Column(db.Date, nullable=False, index=True)  # Primer día del mes
+    calificacion = db.Column(Enum('Buena', 'Media', 'Mala', name='calif_enum'), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+# Cada envío de un informe por correo y su estado (ver email_delivery.py)
+class EnvioInforme(db.Model):
+    __tablename__ = 'envios_informe'
+    id = db.Column(db.Integer, primary_key=True)
+    visita_id = db.Column(db.String(20), db.ForeignKey('visitas.id'), nullable=False, index=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    estado = db.Column(db.String(10), nullable=False, default='pendiente', index=True)  # 'pendiente', 'enviado' o 'fallido'
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    creado_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    enviado_en = db.Column(db.DateTime)
+    reclamado_en = db.Column(db.DateTime)  # proceso que lo está enviando (ver email_delivery.py)
+
+# Trabajos de generación de PDF en segundo plano (ver pdf_jobs.py). Van en la
+# base para que cualquier worker pueda responder su estado. Sin FK a visitas:
+# eliminar la visita no debe fallar por un trabajo viejo.
+class TrabajoPDF(db.Model):
+    __tablename__ = 'trabajos_pdf'
+    id = db.Column(db.String(32), primary_key=True)
+    visita_id = db.Column(db.String(20), nullable=False)
+    estado = db.Column(db.String(12), nullable=False, default='pendiente', index=True)  # 'pendiente', 'procesando', 'completado' o 'fallido'
+    progreso = db.Column(db.Integer, nullable=False, default=0)  # porcentaje
+    ruta = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    creado_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    terminado_en = db.Column(db.DateTime)
+
+# Claves de idempotencia de POST /sync (ver sincronizacion.py). Sin FK a
+# visitas: la clave sigue marcando el envío como aplicado aunque la visita
+# se elimine después, así un reenvío no la vuelve a crear.
+class ClaveSincronizacion(db.Model):
+    __tablename__ = 'claves_sincronizacion'
+    clave = db.Column(db.String(64), primary_key=True)
+    visita_id = db.Column(db.String(20), nullable=False)
+    creado_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Registro de las filas eliminadas de clientes, visitas y zonas, para que el
+# feed /cambios pueda avisar de las eliminaciones (ver cambios.py)
+class Eliminacion(db.Model):
+    __tablename__ = 'eliminaciones'
+    __table_args__ = (
+        db.Index('ix_eliminaciones_eliminado_en_id', 'eliminado_en', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    tabla = db.Column(db.String(20), nullable=False)  # 'clientes', 'visitas' o 'zonas'
+    fila_id = db.Column(db.String(20), nullable=False)
+    eliminado_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
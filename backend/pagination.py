@@ -0,0 +1,91 @@
+from flask import current_app, jsonify, request
+from sqlalchemy import and_, or_
+from urllib.parse import urlencode
+import base64
+import json
+
+# Paginación por cursor (keyset) para los listados.
+# El cursor es opaco para el cliente: codifica los valores de la última fila
+# devuelta, así la siguiente página se pide con un WHERE sobre el índice en
+# lugar de un OFFSET que recorre todas las filas anteriores.
+#
+# El cuerpo de la respuesta sigue siendo una lista; la siguiente página se
+# anuncia en las cabeceras X-Next-Cursor y Link (expuestas por CORS en app.py).
+# El frontend pide una página a la vez con getPage (api/axiosConfig.js).
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidPageError(Exception):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+# `types` son los tipos esperados de cada valor del cursor (p. ej. int, str);
+# un cursor con otra forma es InvalidPageError (400), no un error más adelante.
+def decode_cursor(cursor, *types):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise InvalidPageError('Cursor inválido')
+    if types and not (isinstance(values, list) and len(values) == len(types)
+                      and all(isinstance(v, t) for v, t in zip(values, types))):
+        raise InvalidPageError('Cursor inválido')
+    return values
+
+
+def parse_limit():
+    default = current_app.config.get('PAGE_SIZE_DEFAULT', DEFAULT_PAGE_SIZE)
+    maximum = current_app.config.get('PAGE_SIZE_MAX', MAX_PAGE_SIZE)
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise InvalidPageError('limit debe ser un número')
+    if limit < 1:
+        raise InvalidPageError('limit debe ser mayor que cero')
+    return min(limit, maximum)
+
+
+# Condición "la fila va después del cursor" para un orden descendente por
+# varias columnas: (a, b) < (va, vb)  <=>  a < va OR (a = va AND b < vb)
+def after_cursor_desc(columns, values):
+    conditions = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        conditions.append(and_(*equal_prefix, column < values[i]))
+    return or_(*conditions)
+
+
+def after_cursor_asc(columns, values):
+    conditions = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        conditions.append(and_(*equal_prefix, column > values[i]))
+    return or_(*conditions)
+
+
+# Ejecuta la consulta ya ordenada pidiendo una fila extra para saber si hay
+# más páginas. key_func devuelve los valores del cursor de una fila.
+def fetch_page(query, limit, key_func):
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key_func(rows[-1]))
+    return rows, next_cursor
+
+
+def page_response(items, next_cursor):
+    response = jsonify(items)
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response, 200
@@ -0,0 +1,143 @@
+from models import Visita
+from pdf_cache import pdf_cache
+from pdf_generator import load_report_data
+from pdf_jobs import pdf_jobs
+from pypdf import PdfWriter
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+# Exportación masiva de informes: renderiza varias visitas en el pool de
+# procesos de pdf_jobs y las empaqueta en un ZIP o en un solo PDF con un
+# marcador por visita. Una visita que falla no aborta el lote.
+#
+# Cada PDF del lote queda en un directorio propio del lote (enlace o copia del
+# que se guarda en pdf_cache): la caché puede descartar archivos en cualquier
+# momento si el lote es más grande que PDF_CACHE_MAX_BYTES/MAX_ENTRIES.
+#
+# POST /generar-pdf/lote responde con el archivo en la misma petición, así que
+# acepta hasta PDF_LOTE_MAX_VISITAS visitas (más no alcanzan a renderizarse
+# antes del timeout de gunicorn); los lotes grandes van por
+# `flask exportar-informes`.
+
+DEFAULT_LOTE_MAX_VISITAS = 25
+
+
+def select_visitas(cliente_id=None, desde=None, hasta=None, visita_ids=None):
+    query = Visita.query
+    if visita_ids:
+        query = query.filter(Visita.id.in_(visita_ids))
+    if cliente_id:
+        query = query.filter(Visita.cliente_id == cliente_id)
+    if desde:
+        query = query.filter(Visita.fecha >= desde)
+    if hasta:
+        query = query.filter(Visita.fecha <= hasta)
+    return [v.id for v in query.order_by(Visita.fecha, Visita.id).all()]
+
+
+# Enlace duro si se puede (mismo disco), si no una copia
+def _pin(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        if not os.path.exists(src):
+            raise
+        shutil.copyfile(src, dst)
+    return dst
+
+
+# Renderiza las visitas en `workdir`. Devuelve (resultados, errores):
+# resultados es una lista ordenada de (visita_id, ruta_pdf) y errores un dict
+# visita_id -> mensaje. Los renders pasan por la cola de pdf_jobs, así que el
+# lote espera turno en lugar de saturar el pool.
+def render_batch(visita_ids, workdir):
+    resultados = {}
+    errores = {}
+    pendientes = {}
+
+    for n, visita_id in enumerate(visita_ids):
+        try:
+            report = load_report_data(visita_id)
+            if not report:
+                errores[visita_id] = 'Visita no encontrada o sin zonas'
+                continue
+            visita, zonas, empresa = report
+            output_path = os.path.join(workdir, f'{n}.pdf')
+            cache_key = pdf_cache.fingerprint(visita, zonas, empresa)
+            cached_path = pdf_cache.get(cache_key)
+            if cached_path:
+                try:
+                    resultados[visita_id] = _pin(cached_path, output_path)
+                    continue
+                except OSError:
+                    pass  # la caché lo descartó entre get() y el enlace: se renderiza
+            future = pdf_jobs.submit_render(visita_id, output_path)
+            pendientes[visita_id] = (future, cache_key, visita.cliente_id, visita.supervisor_id)
+        except Exception as e:
+            errores[visita_id] = str(e)
+
+    for visita_id, (future, cache_key, cliente_id, supervisor_id) in pendientes.items():
+        try:
+            path = future.result()
+            if not path:
+                raise RuntimeError('No se pudo generar el PDF')
+            resultados[visita_id] = path
+        except Exception as e:
+            errores[visita_id] = str(e)
+            continue
+        try:
+            cache_path = _pin(path, os.path.join(workdir, f'{os.path.basename(path)}.cache'))
+            pdf_cache.put(cache_key, cache_path, visita_id, cliente_id, supervisor_id)
+        except OSError:
+            pass  # la caché es opcional; el lote ya tiene su copia
+
+    ordenados = [(v, resultados[v]) for v in visita_ids if v in resultados]
+    return ordenados, errores
+
+
+def write_zip(resultados, errores, output_path):
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for visita_id, path in resultados:
+            try:
+                zf.write(path, f'visita-{visita_id}.pdf')
+            except OSError as e:
+                errores[visita_id] = str(e)
+        if errores:
+            zf.writestr('errores.json', json.dumps(errores, ensure_ascii=False, indent=2))
+    return output_path
+
+
+def write_merged_pdf(resultados, errores, output_path):
+    writer = PdfWriter()
+    for visita_id, path in resultados:
+        try:
+            writer.append(path, outline_item=f'Visita {visita_id}')
+        except Exception as e:
+            errores[visita_id] = str(e)
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    writer.close()
+    return output_path
+
+
+# Genera el archivo del lote en un temporal. formato: 'zip' o 'pdf'.
+# Devuelve (ruta, errores); ruta es None si no se pudo generar ninguna visita.
+def export_batch(visita_ids, formato='zip', output_path=None):
+    workdir = tempfile.mkdtemp(prefix='lote-', dir=pdf_cache.folder())
+    try:
+        resultados, errores = render_batch(visita_ids, workdir)
+        if not resultados:
+            return None, errores
+        if output_path is None:
+            fd, output_path = tempfile.mkstemp(suffix=f'.{formato}', prefix='informes-')
+            os.close(fd)
+        if formato == 'pdf':
+            write_merged_pdf(resultados, errores, output_path)
+        else:
+            write_zip(resultados, errores, output_path)
+        return output_path, errores
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
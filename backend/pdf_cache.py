@@ -0,0 +1,206 @@
+from datetime import date
+from flask import current_app
+from storage import path_for_url
+from urllib.parse import quote, unquote
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+# Caché de PDFs renderizados, direccionada por contenido.
+# La clave es un hash de todos los datos que aparecen en el informe (visita,
+# zonas, cliente, empresa del supervisor y el contenido de las imágenes), así
+# que si algo cambia la clave cambia y nunca se sirve un PDF desactualizado.
+#
+# El estado vive en la carpeta, no en memoria, para que todos los workers vean
+# la misma caché: cada PDF se llama <clave>_<cliente>_<supervisor>_<visita>.pdf
+# (así se puede invalidar por cualquiera de los tres), un acierto le actualiza
+# el mtime y al pasarse de PDF_CACHE_MAX_BYTES / PDF_CACHE_MAX_ENTRIES se
+# borran los de mtime más antiguo.
+
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 1000
+
+ENTRY_RE = re.compile(r'^([0-9a-f]{64})_(\d+)_(\d+)_(.+)\.pdf$')
+
+
+class PDFCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file_hashes = {}  # (ruta, mtime, tamaño) -> sha256
+        # Contadores de este proceso
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Configuración
+
+    def folder(self):
+        folder = os.path.abspath(current_app.config.get('PDF_CACHE_FOLDER', 'pdf_cache'))
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def _max_bytes(self):
+        return current_app.config.get('PDF_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    def _max_entries(self):
+        return current_app.config.get('PDF_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+    # Huella de la visita
+
+    def file_hash(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._file_hashes.get(key)
+        if cached:
+            return cached
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        value = digest.hexdigest()
+        with self._lock:
+            if len(self._file_hashes) >= 10000:
+                self._file_hashes.clear()
+            self._file_hashes[key] = value
+        return value
+
+    def fingerprint(self, visita, zonas, empresa):
+        cliente = visita.cliente
+        urls = [z.foto_url for z in zonas if z.foto_url]
+        if empresa and empresa.logo_url:
+            urls.append(empresa.logo_url)
+        if cliente.logo_url:
+            urls.append(cliente.logo_url)
+
+        payload = {
+            # El pie de página lleva la fecha de generación
+            'render_date': date.today().isoformat(),
+            'visita': [visita.id, visita.fecha.isoformat(), visita.supervisor_id,
+                       visita.supervisor.nombre, visita.cliente_id, visita.conclusiones],
+            'zonas': [[z.id, z.seccion, z.concepto_actividad, z.calificacion,
+                       z.observaciones, z.foto_url] for z in zonas],
+            'cliente': [cliente.nit, cliente.nombre, cliente.administrador,
+                        cliente.correo, cliente.tipo_codigo, cliente.logo_url],
+            'empresa': [empresa.nombre, empresa.nit, empresa.telefono, empresa.correo,
+                        empresa.direccion, empresa.logo_url] if empresa else None,
+            'files': {url: self.file_hash(path_for_url(url)) for url in sorted(set(urls))},
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()
+
+    # Entradas en la carpeta
+
+    # Recorre los PDFs de la caché (ignora los temporales de renders y lotes)
+    def _entries(self):
+        try:
+            with os.scandir(self.folder()) as it:
+                for item in it:
+                    match = ENTRY_RE.match(item.name)
+                    if not match or not item.is_file():
+                        continue
+                    try:
+                        st = item.stat()
+                    except OSError:
+                        continue
+                    key, cliente_id, supervisor_id, visita_id = match.groups()
+                    yield {
+                        'key': key,
+                        'path': item.path,
+                        'size': st.st_size,
+                        'mtime': st.st_mtime_ns,
+                        'visita_id': unquote(visita_id),
+                        'cliente_id': int(cliente_id),
+                        'supervisor_id': int(supervisor_id),
+                    }
+        except FileNotFoundError:
+            return
+
+    # Lectura / escritura
+
+    def get(self, key):
+        for entry in self._entries():
+            if entry['key'] == key:
+                try:
+                    os.utime(entry['path'])  # más reciente para el LRU
+                except OSError:
+                    break  # la expulsó otro proceso
+                with self._lock:
+                    self.hits += 1
+                return entry['path']
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, pdf_path, visita_id, cliente_id, supervisor_id):
+        name = f'{key}_{cliente_id}_{supervisor_id}_{quote(str(visita_id), safe="")}.pdf'
+        target = os.path.join(self.folder(), name)
+        shutil.move(pdf_path, target)
+        os.utime(target)
+        self._evict(keep=target)
+        return target
+
+    def _evict(self, keep):
+        max_bytes = self._max_bytes()
+        max_entries = self._max_entries()
+        entries = sorted(self._entries(), key=lambda e: e['mtime'])
+        total = sum(e['size'] for e in entries)
+        count = len(entries)
+        # Nunca se expulsa la entrada recién agregada
+        for entry in entries:
+            if total <= max_bytes and count <= max_entries:
+                break
+            if entry['path'] == keep:
+                continue
+            total -= entry['size']
+            count -= 1
+            if self._remove_file(entry['path']):
+                with self._lock:
+                    self.evictions += 1
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    # Invalidación
+
+    def invalidate(self, visita_id=None, cliente_id=None, supervisor_id=None):
+        removed = 0
+        for entry in self._entries():
+            if ((visita_id is not None and entry['visita_id'] == str(visita_id)) or
+                    (cliente_id is not None and entry['cliente_id'] == cliente_id) or
+                    (supervisor_id is not None and entry['supervisor_id'] == supervisor_id)):
+                if self._remove_file(entry['path']):
+                    removed += 1
+        return removed
+
+    def clear(self):
+        for entry in self._entries():
+            self._remove_file(entry['path'])
+        with self._lock:
+            self._file_hashes.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        entries = list(self._entries())
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(e['size'] for e in entries),
+            }
+
+
+pdf_cache = PDFCache()
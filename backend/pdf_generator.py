@@ -1,14 +1,51 @@
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.units import inch
 from models import Visita, Zona, Cliente, User, Empresa
+from sqlalchemy.orm import joinedload
+from pdf_cache import pdf_cache
+from image_pipeline import ensure_variant
+from render_context import render_context, LogoImage
+from storage import path_for_url
+from metrics import RenderTimer
+from reportlab.pdfgen.canvas import Canvas
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
 from datetime import datetime
+import logging
 import os
+import tempfile
+import time
 
-def generate_pdf(visita_id):
-    visita = Visita.query.get(visita_id)
+logger = logging.getLogger(__name__)
+
+# Hilos para validar las fotos y generar su derivado de impresión antes de
+# maquetar (PDF_PHOTO_WORKERS). PIL suelta el GIL mientras decodifica.
+DEFAULT_PHOTO_WORKERS = 4
+FOTO_SECCIONES = ('Aseo y Limpieza', 'Seguridad y Salud')
+# Porcentaje del render al terminar de preparar las fotos y de maquetar (el
+# resto es escribir el archivo)
+PROGRESO_FOTOS = 30
+PROGRESO_MAQUETADO = 90
+
+
+# La escritura del archivo ocurre en save(); el resto de doc.build es maquetación
+class _TimedCanvas(Canvas):
+    write_seconds = 0.0
+
+    def save(self):
+        start = time.perf_counter()
+        super().save()
+        self.write_seconds = time.perf_counter() - start
+
+
+def load_report_data(visita_id):
+    # Cliente y supervisor en la misma consulta que la visita
+    visita = Visita.query.options(
+        joinedload(Visita.cliente),
+        joinedload(Visita.supervisor),
+    ).filter_by(id=visita_id).first()
     if not visita:
         return None
 
@@ -19,6 +56,57 @@ def generate_pdf(visita_id):
 
     # Obtener datos de la empresa del usuario
     empresa = Empresa.query.filter_by(user_id=visita.supervisor_id).first()
+    return visita, zonas, empresa
+
+# Archivo temporal propio de cada render, en la misma carpeta que la caché para
+# que pdf_cache.put lo mueva con un rename. Dos renders simultáneos de la misma
+# visita ya no escriben sobre el mismo informe_<id>.pdf del directorio actual.
+def _spool_path(visita_id):
+    fd, path = tempfile.mkstemp(prefix=f'render-{visita_id}-', suffix='.pdf', dir=pdf_cache.folder())
+    os.close(fd)
+    return path
+
+def _preparar_foto(foto_path):
+    if not os.path.exists(foto_path):
+        return None
+    try:
+        render_context.validate_image(foto_path)
+        # Usar el derivado de impresión en lugar del original de 12 MP
+        return ensure_variant(foto_path, 'print'), None
+    except Exception as e:
+        return None, e
+
+
+# Prepara todas las fotos del informe a la vez. Devuelve un dict
+# ruta -> None (no existe) o (ruta a dibujar, None) o (None, error).
+def prefetch_fotos(foto_paths):
+    foto_paths = list(dict.fromkeys(foto_paths))
+    workers = current_app.config.get('PDF_PHOTO_WORKERS', DEFAULT_PHOTO_WORKERS)
+    workers = max(1, min(workers, len(foto_paths)))
+    if workers == 1:
+        return {path: _preparar_foto(path) for path in foto_paths}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-fotos') as pool:
+        return dict(zip(foto_paths, pool.map(_preparar_foto, foto_paths)))
+
+# Con use_cache=False se renderiza siempre en `filename` sin pasar por la caché
+# (lo usan los workers de pdf_jobs, que no comparten la caché del proceso web).
+# Sin `filename` se usa un temporal que debe borrar quien llama.
+# `progreso(porcentaje)`, si se pasa, se llama a medida que avanza el render.
+def generate_pdf(visita_id, filename=None, use_cache=True, progreso=None):
+    progreso = progreso or (lambda porcentaje: None)
+    timer = RenderTimer()
+    with timer.phase('data_load'):
+        report = load_report_data(visita_id)
+    if not report:
+        return None
+    visita, zonas, empresa = report
+
+    # Reutilizar el PDF si nada de lo que aparece en el informe cambió
+    if use_cache:
+        cache_key = pdf_cache.fingerprint(visita, zonas, empresa)
+        cached_path = pdf_cache.get(cache_key)
+        if cached_path:
+            return cached_path
     
     # Usar datos de la empresa o valores por defecto
     empresa_nombre = empresa.nombre if empresa else "Empresa"
@@ -26,10 +114,15 @@ def generate_pdf(visita_id):
     empresa_direccion = empresa.direccion if empresa else "N/A"
     empresa_correo = empresa.correo if empresa else "N/A"
 
-    filename = f"informe_{visita_id}.pdf"
+    with timer.phase('image_decode'):
+        fotos = prefetch_fotos(path_for_url(z.foto_url) for z in zonas
+                               if z.foto_url and z.seccion in FOTO_SECCIONES)
+    progreso(PROGRESO_FOTOS)
+
+    filename = filename or _spool_path(visita.id)
     doc = SimpleDocTemplate(filename, pagesize=letter)
     elements = []
-    styles = getSampleStyleSheet()
+    styles = render_context.styles
 
     # Header con logos (empresa y cliente)
     header_elements = []
@@ -37,18 +130,18 @@ def generate_pdf(visita_id):
     # Logo de la empresa
     if empresa and empresa.logo_url:
         # Usar el logo de la empresa si existe
-        logo_path = os.path.join('uploads', empresa.logo_url.split('/')[-1])
+        logo_path = path_for_url(empresa.logo_url)
         if os.path.exists(logo_path):
             try:
                 # Verificar que el archivo sea una imagen válida
-                from PIL import Image as PILImage
-                with PILImage.open(logo_path) as img:
-                    img.verify()  # Verificar que sea una imagen válida
+                with timer.phase('image_decode'):
+                    render_context.validate_image(logo_path)
+                    logo_data = render_context.logo(ensure_variant(logo_path, 'print'))
                 
-                empresa_logo = Image(logo_path, 1*inch, 1*inch)
+                empresa_logo = LogoImage(logo_data, 1*inch, 1*inch)
                 header_elements.append(empresa_logo)
             except Exception as e:
-                print(f"Error cargando logo de empresa {logo_path}: {str(e)}")
+                logger.warning("Error cargando logo de empresa %s: %s", logo_path, e)
                 empresa_texto = Paragraph(f"<b>{empresa_nombre[:3].upper()}</b>", styles['Heading3'])
                 header_elements.append(empresa_texto)
     else:
@@ -58,18 +151,18 @@ def generate_pdf(visita_id):
     
     # Logo del cliente
     if visita.cliente.logo_url:
-        cliente_logo_path = os.path.join('uploads', visita.cliente.logo_url.split('/')[-1])
+        cliente_logo_path = path_for_url(visita.cliente.logo_url)
         if os.path.exists(cliente_logo_path):
             try:
                 # Verificar que el archivo sea una imagen válida
-                from PIL import Image as PILImage
-                with PILImage.open(cliente_logo_path) as img:
-                    img.verify()  # Verificar que sea una imagen válida
+                with timer.phase('image_decode'):
+                    render_context.validate_image(cliente_logo_path)
+                    logo_data = render_context.logo(ensure_variant(cliente_logo_path, 'print'))
                 
-                cliente_logo = Image(cliente_logo_path, 1*inch, 1*inch)
+                cliente_logo = LogoImage(logo_data, 1*inch, 1*inch)
                 header_elements.append(cliente_logo)
             except Exception as e:
-                print(f"Error cargando logo de cliente {cliente_logo_path}: {str(e)}")
+                logger.warning("Error cargando logo de cliente %s: %s", cliente_logo_path, e)
                 # No agregar nada si falla el logo del cliente
     
     # Agregar logos al documento
@@ -82,15 +175,7 @@ def generate_pdf(visita_id):
         elements.append(logo_table)
 
     # Título principal con estilo profesional
-    title_style = ParagraphStyle(
-        'Title', 
-        parent=styles['Heading1'], 
-        fontSize=16, 
-        textColor=colors.darkblue, 
-        alignment=1,
-        spaceAfter=12,
-        fontName='Helvetica-Bold'
-    )
+    title_style = render_context.style('Title')
     elements.append(Paragraph("INFORME PRESTACIÓN DEL SERVICIO", title_style))
     elements.append(Spacer(1, 0.3*inch))
 
@@ -126,22 +211,7 @@ def generate_pdf(visita_id):
     for seccion_nombre, zonas_seccion in secciones.items():
         elements.append(Spacer(1, 0.3*inch))
         # Títulos de sección con colores profesionales
-        seccion_colors = {
-            'Aseo y Limpieza': colors.darkgreen,
-            'Seguridad y Salud': colors.darkred,
-            'Colaborador': colors.darkorange
-        }
-        color = seccion_colors.get(seccion_nombre, colors.darkblue)
-        
-        seccion_style = ParagraphStyle(
-            'Seccion',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=color,
-            fontName='Helvetica-Bold',
-            spaceAfter=6,
-            spaceBefore=12
-        )
+        seccion_style = render_context.seccion_style(seccion_nombre)
         elements.append(Paragraph(f"SECCIÓN: {seccion_nombre.upper()}", seccion_style))
         
         # Crear tabla de dos columnas para las actividades
@@ -176,23 +246,22 @@ def generate_pdf(visita_id):
             elements.append(actividades_table)
         
         # Agregar fotos de evidencia (solo para Aseo y Seguridad)
-        if seccion_nombre in ['Aseo y Limpieza', 'Seguridad y Salud']:
+        if seccion_nombre in FOTO_SECCIONES:
             fotos_data = []
             for zona in zonas_seccion:
                 if zona.foto_url:
-                    foto_path = os.path.join('uploads', zona.foto_url.split('/')[-1])
-                    if os.path.exists(foto_path):
-                        try:
-                            # Verificar que el archivo sea una imagen válida
-                            from PIL import Image as PILImage
-                            with PILImage.open(foto_path) as img:
-                                img.verify()  # Verificar que sea una imagen válida
-                            
-                            foto = Image(foto_path, 2*inch, 2*inch)
-                            fotos_data.append(foto)
-                        except Exception as e:
-                            print(f"Error cargando imagen {foto_path}: {str(e)}")
-                            fotos_data.append(Paragraph(f"Error cargando imagen: {os.path.basename(foto_path)}", styles['Normal']))
+                    foto_path = path_for_url(zona.foto_url)
+                    foto = fotos.get(foto_path)
+                    if foto is None:
+                        continue
+                    print_path, error = foto
+                    if error is None:
+                        # lazy=2: la imagen se lee al dibujarla y se suelta
+                        # enseguida, así solo hay una foto en memoria a la vez
+                        fotos_data.append(Image(print_path, 2*inch, 2*inch, lazy=2))
+                    else:
+                        logger.warning("Error cargando imagen %s: %s", foto_path, error)
+                        fotos_data.append(Paragraph(f"Error cargando imagen: {os.path.basename(foto_path)}", styles['Normal']))
             
             if fotos_data:
                 elements.append(Spacer(1, 0.2*inch))
@@ -221,53 +290,46 @@ def generate_pdf(visita_id):
         elements.append(Spacer(1, 0.4*inch))
         
         # Título de conclusiones con fondo
-        conclusiones_style = ParagraphStyle(
-            'Conclusiones',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.white,
-            fontName='Helvetica-Bold',
-            backColor=colors.darkblue,
-            spaceAfter=8,
-            spaceBefore=8,
-            alignment=1,
-            borderPadding=8
-        )
+        conclusiones_style = render_context.style('Conclusiones')
         elements.append(Paragraph("CONCLUSIONES", conclusiones_style))
         
         # Texto de conclusiones con estilo
-        conclusiones_text_style = ParagraphStyle(
-            'ConclusionesText',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.black,
-            fontName='Helvetica',
-            spaceAfter=6,
-            leftIndent=20,
-            rightIndent=20,
-            borderWidth=1,
-            borderColor=colors.lightblue,
-            borderPadding=10,
-            backColor=colors.lightgrey
-        )
+        conclusiones_text_style = render_context.style('ConclusionesText')
         elements.append(Paragraph(visita.conclusiones, conclusiones_text_style))
 
     # Footer profesional
     elements.append(Spacer(1, 1*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        alignment=1,
-        fontSize=9,
-        textColor=colors.darkgrey,
-        fontName='Helvetica',
-        backColor=colors.lightgrey,
-        borderWidth=1,
-        borderColor=colors.grey,
-        borderPadding=6,
-        spaceBefore=12
-    )
+    footer_style = render_context.style('Footer')
     footer_text = f"{empresa_nombre} | {empresa_direccion} | Tel: {empresa_telefono} | Email: {empresa_correo} | Fecha: {datetime.now().strftime('%d/%m/%Y')}"
     elements.append(Paragraph(footer_text, footer_style))
 
-    doc.build(elements)
-    return filename
\ No newline at end of file
+    canvases = []
+
+    # Maquetación: de PROGRESO_FOTOS a PROGRESO_MAQUETADO según los elementos ya ubicados
+    total = max(len(elements), 1)
+
+    def on_progress(tipo, valor):
+        if tipo == 'PROGRESS':
+            # Un elemento que se parte entre páginas agrega elementos a la lista
+            valor = min(max(valor, 0), total)
+            progreso(PROGRESO_FOTOS + (PROGRESO_MAQUETADO - PROGRESO_FOTOS) * valor // total)
+    doc.setProgressCallBack(on_progress)
+
+    def canvasmaker(*args, **kwargs):
+        canvases.append(_TimedCanvas(*args, **kwargs))
+        return canvases[-1]
+
+    start = time.perf_counter()
+    try:
+        doc.build(elements, canvasmaker=canvasmaker)
+    except Exception:
+        if os.path.exists(filename):
+            os.remove(filename)
+        raise
+    write_seconds = sum(c.write_seconds for c in canvases)
+    timer.add('layout', time.perf_counter() - start - write_seconds)
+    timer.add('write', write_seconds)
+    timer.record()
+    if not use_cache:
+        return filename
+    return pdf_cache.put(cache_key, filename, visita.id, visita.cliente_id, visita.supervisor_id)
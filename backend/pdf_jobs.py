@@ -0,0 +1,295 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, TrabajoPDF
+from pdf_cache import pdf_cache
+import multiprocessing
+import os
+import pickle
+import threading
+import uuid
+
+# Cola de trabajos de renderizado de PDF.
+# Los PDFs se generan en un pool acotado de procesos para no ocupar los
+# threads de Flask. El estado de cada trabajo (y su progreso, que escribe el
+# proceso que lo renderiza) vive en la tabla trabajos_pdf: con varios workers
+# de gunicorn cualquiera responde el estado o la descarga, y
+# PDF_JOB_QUEUE_SIZE cuenta los trabajos pendientes de toda la app. Cada
+# worker web tiene su propio pool de PDF_WORKERS procesos.
+#
+# Si un proceso del pool muere (p. ej. sin memoria) el pool queda roto: se
+# descarta y el siguiente trabajo crea uno nuevo. Un trabajo cuyo worker web
+# murió no termina nunca; pasado PDF_JOB_TIMEOUT se informa como fallido.
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 20
+DEFAULT_JOB_TTL = 3600
+DEFAULT_JOB_TIMEOUT = 600
+
+PENDIENTE = 'pendiente'
+PROCESANDO = 'procesando'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+ACTIVOS = (PENDIENTE, PROCESANDO)
+
+# El progreso se guarda cada tantos puntos, no en cada elemento maquetado
+PASO_PROGRESO = 5
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def trabajo_to_dict(trabajo, posicion=None):
+    data = {
+        'id': trabajo.id,
+        'visita_id': trabajo.visita_id,
+        'status': trabajo.estado,
+        'progress': trabajo.progreso,
+        'error': trabajo.error,
+    }
+    if trabajo.estado == PENDIENTE and posicion is not None:
+        data['posicion'] = posicion
+    if trabajo.estado == COMPLETADO:
+        data['download_url'] = f'/generar-pdf/jobs/{trabajo.id}/descarga'
+    return data
+
+
+# Lado del worker: cada proceso crea su propia app una sola vez, con la
+# configuración de la app que creó el pool (no la de config.Config: las
+# pruebas y los benchmarks cambian la base de datos, por ejemplo)
+
+_worker_app = None
+
+
+def _init_worker(config):
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(None, **config)
+
+
+# Los valores que no se pueden pasar a otro proceso (p. ej. funciones en las
+# opciones del engine) se quedan fuera
+def _worker_config(app):
+    config = {}
+    for key, value in app.config.items():
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue
+        config[key] = value
+    return config
+
+
+def _guardar_progreso(trabajo_id):
+    ultimo = [-PASO_PROGRESO]
+
+    def guardar(porcentaje):
+        if porcentaje - ultimo[0] < PASO_PROGRESO:
+            return
+        ultimo[0] = porcentaje
+        TrabajoPDF.query.filter(TrabajoPDF.id == trabajo_id, TrabajoPDF.estado.in_(ACTIVOS)) \
+            .update({'estado': PROCESANDO, 'progreso': porcentaje}, synchronize_session=False)
+        db.session.commit()
+    return guardar
+
+
+def render_in_worker(visita_id, output_path, trabajo_id=None):
+    from pdf_generator import generate_pdf
+    with _worker_app.app_context():
+        progreso = _guardar_progreso(trabajo_id) if trabajo_id else None
+        try:
+            return generate_pdf(visita_id, filename=output_path, use_cache=False, progreso=progreso)
+        finally:
+            db.session.remove()
+
+
+# Lado del proceso web
+
+class PDFJobQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._batch_active = 0  # renders de exportaciones masivas en curso en este proceso
+        self._executor = None
+        self._app = None
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = current_app.config.get('PDF_WORKERS', DEFAULT_WORKERS)
+                # spawn: los workers no heredan conexiones abiertas de SQLAlchemy
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(_worker_config(current_app),),
+                )
+            return self._executor
+
+    # Descarta el pool si sigue siendo `executor` (otro hilo pudo haberlo cambiado ya)
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False)
+
+    # Envía al pool; si está roto lo recrea y lo intenta una vez más.
+    # Devuelve (executor, future).
+    def _submit(self, fn, *args):
+        executor = self.executor()
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            executor = self.executor()
+            return executor, executor.submit(fn, *args)
+
+    def _timeout(self):
+        return timedelta(seconds=current_app.config.get('PDF_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT))
+
+    # Trabajos en curso de toda la app (los que superan PDF_JOB_TIMEOUT ya no
+    # cuentan) más las exportaciones masivas de este proceso
+    def _active_count(self):
+        desde = datetime.utcnow() - self._timeout()
+        activos = TrabajoPDF.query.filter(TrabajoPDF.estado.in_(ACTIVOS), TrabajoPDF.creado_en > desde).count()
+        return activos + self._batch_active
+
+    def _purge(self):
+        ttl = current_app.config.get('PDF_JOB_TTL', DEFAULT_JOB_TTL)
+        TrabajoPDF.query.filter(TrabajoPDF.terminado_en < datetime.utcnow() - timedelta(seconds=ttl)) \
+            .delete(synchronize_session=False)
+
+    # Devuelve el trabajo creado, None si la visita no tiene datos para el
+    # informe, o lanza QueueFullError si la cola está llena.
+    def submit(self, visita_id):
+        from pdf_generator import load_report_data
+        report = load_report_data(visita_id)
+        if not report:
+            return None
+        visita, zonas, empresa = report
+        cache_key = pdf_cache.fingerprint(visita, zonas, empresa)
+        trabajo = TrabajoPDF(id=uuid.uuid4().hex, visita_id=visita.id, estado=PENDIENTE, progreso=0)
+        self._purge()
+
+        # Si ya está en caché no hace falta pasar por el pool
+        cached_path = pdf_cache.get(cache_key)
+        if cached_path:
+            trabajo.estado = COMPLETADO
+            trabajo.progreso = 100
+            trabajo.ruta = cached_path
+            trabajo.terminado_en = datetime.utcnow()
+            db.session.add(trabajo)
+            db.session.commit()
+            return trabajo
+
+        # El conteo y el INSERT no son atómicos entre workers: con muchos
+        # envíos simultáneos la cola puede pasarse por unos pocos trabajos
+        max_queue = current_app.config.get('PDF_JOB_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        if self._active_count() >= max_queue:
+            db.session.commit()
+            raise QueueFullError()
+        db.session.add(trabajo)
+        db.session.commit()
+
+        self._app = current_app._get_current_object()
+        output_path = os.path.join(pdf_cache.folder(), f'job-{trabajo.id}.pdf')
+        try:
+            executor, future = self._submit(render_in_worker, visita.id, output_path, trabajo.id)
+        except Exception as e:
+            self._terminar(trabajo.id, error=str(e))
+            raise
+        datos = (trabajo.id, cache_key, visita.id, visita.cliente_id, visita.supervisor_id)
+        future.add_done_callback(lambda future: self._finish(datos, executor, future))
+        return trabajo
+
+    def _finish(self, datos, executor, future):
+        trabajo_id, cache_key, visita_id, cliente_id, supervisor_id = datos
+        with self._app.app_context():
+            try:
+                path = future.result()
+                if not path:
+                    raise RuntimeError('No se pudo generar el PDF')
+                path = pdf_cache.put(cache_key, path, visita_id, cliente_id, supervisor_id)
+            except BrokenProcessPool as e:
+                self._reset_executor(executor)
+                self._terminar(trabajo_id, error=f'El proceso de renderizado se detuvo: {e}')
+            except Exception as e:
+                self._terminar(trabajo_id, error=str(e))
+            else:
+                self._terminar(trabajo_id, path=path)
+            finally:
+                db.session.remove()
+
+    def _terminar(self, trabajo_id, path=None, error=None):
+        trabajo = db.session.get(TrabajoPDF, trabajo_id)
+        if trabajo is not None:
+            trabajo.estado = FALLIDO if error else COMPLETADO
+            trabajo.ruta = path
+            trabajo.error = error
+            if not error:
+                trabajo.progreso = 100
+            trabajo.terminado_en = datetime.utcnow()
+            db.session.commit()
+        with self._lock:
+            self._slot_free.notify_all()
+
+    # Para las exportaciones masivas: ocupa un lugar de la misma cola que los
+    # trabajos (PDF_JOB_QUEUE_SIZE), esperando a que se libere uno en lugar de
+    # lanzar QueueFullError. Devuelve el future del render.
+    def submit_render(self, visita_id, output_path):
+        max_queue = current_app.config.get('PDF_JOB_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        while True:
+            with self._lock:
+                # Los trabajos de otros workers no avisan al terminar: se vuelve a contar cada tanto
+                if self._active_count() < max_queue:
+                    self._batch_active += 1
+                    break
+                self._slot_free.wait(timeout=1)
+            db.session.commit()  # ver los trabajos que terminaron mientras tanto
+        try:
+            executor, future = self._submit(render_in_worker, visita_id, output_path)
+        except Exception:
+            self._release_batch_slot()
+            raise
+
+        def liberar(future):
+            if isinstance(future.exception(), BrokenProcessPool):
+                self._reset_executor(executor)
+            self._release_batch_slot()
+        future.add_done_callback(liberar)
+        return future
+
+    def _release_batch_slot(self):
+        with self._lock:
+            self._batch_active -= 1
+            self._slot_free.notify_all()
+
+    def get(self, trabajo_id):
+        return db.session.get(TrabajoPDF, trabajo_id)
+
+    def status(self, trabajo_id):
+        trabajo = db.session.get(TrabajoPDF, trabajo_id)
+        if not trabajo:
+            return None
+        if trabajo.estado in ACTIVOS and trabajo.creado_en < datetime.utcnow() - self._timeout():
+            trabajo.estado = FALLIDO
+            trabajo.error = 'El trabajo no terminó a tiempo'
+            trabajo.terminado_en = datetime.utcnow()
+            db.session.commit()
+        posicion = None
+        if trabajo.estado == PENDIENTE:
+            posicion = TrabajoPDF.query.filter(TrabajoPDF.estado == PENDIENTE,
+                                               TrabajoPDF.creado_en < trabajo.creado_en).count()
+        return trabajo_to_dict(trabajo, posicion)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+pdf_jobs = PDFJobQueue()
@@ -0,0 +1,92 @@
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import functools
+import time
+
+# Contador de consultas SQL por request.
+# Cada request expone X-Query-Count y X-Query-Time-Ms. Las vistas pueden
+# declarar un presupuesto con @query_budget(n): si se pasa, se registra una
+# advertencia, o se lanza QueryBudgetExceeded si QUERY_BUDGET_STRICT está
+# activo (pensado para las pruebas, así una regresión N+1 las hace fallar).
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def _stats():
+    if not has_app_context():
+        return None
+    if 'query_stats' not in g:
+        g.query_stats = {'count': 0, 'time': 0.0}
+    return g.query_stats
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start'].pop()
+    stats = _stats()
+    if stats is not None:
+        stats['count'] += 1
+        stats['time'] += time.perf_counter() - start
+
+
+def current_stats():
+    stats = _stats()
+    return dict(stats) if stats else {'count': 0, 'time': 0.0}
+
+
+# Para pruebas: with count_queries() as stats: ...; stats['count']
+class count_queries:
+    def __enter__(self):
+        self._start = current_stats()
+        self.stats = {'count': 0, 'time': 0.0}
+        return self.stats
+
+    def __exit__(self, *exc):
+        end = current_stats()
+        self.stats['count'] = end['count'] - self._start['count']
+        self.stats['time'] = end['time'] - self._start['time']
+        return False
+
+
+def _check_budget(response):
+    stats = current_stats()
+    response.headers['X-Query-Count'] = str(stats['count'])
+    response.headers['X-Query-Time-Ms'] = f"{stats['time'] * 1000:.1f}"
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and stats['count'] > budget:
+        message = f'{request.endpoint} ejecutó {stats["count"]} consultas (presupuesto: {budget})'
+        if current_app.config.get('QUERY_BUDGET_STRICT'):
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+
+# El contador vive en g, que es del contexto de la app: se reinicia en cada
+# request por si el contexto se reutiliza (el cliente de pruebas lo hace)
+def _reset_stats():
+    g.query_stats = {'count': 0, 'time': 0.0}
+
+
+def init_query_stats(app):
+    app.before_request(_reset_stats)
+    app.after_request(_check_budget)
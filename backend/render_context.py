@@ -0,0 +1,217 @@
+from collections import OrderedDict
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Image
+import io
+import os
+import threading
+
+# Recursos del render de PDFs que se reutilizan entre informes del mismo
+# proceso: hojas de estilo, logos ya decodificados y el resultado de validar
+# cada imagen. Los estilos se construyen una sola vez; las imágenes se guardan por
+# (ruta, mtime, tamaño), así que un archivo reemplazado se vuelve a leer.
+
+SECCION_COLORS = {
+    'Aseo y Limpieza': colors.darkgreen,
+    'Seguridad y Salud': colors.darkred,
+    'Colaborador': colors.darkorange,
+}
+
+DEFAULT_MAX_VALIDATIONS = 4096
+DEFAULT_MAX_LOGOS = 64  # ~1 MB de píxeles por logo (derivado print, 600 px)
+
+
+class _LRU:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return True, self._data[key]
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ImageReader de un logo, decodificado una sola vez y compartido entre renders.
+# ReportLab pide los píxeles (getRGBData) en cada drawImage para identificar la
+# imagen; aquí quedan calculados de antemano. Para los JPEG cada uso recibe su
+# propia copia del archivo, así dos renders en hilos distintos no comparten el
+# puntero de lectura.
+class _LogoReader(ImageReader):
+    def __init__(self, path):
+        super().__init__(path)
+        self._raw = self.fp.getvalue()
+        self.getRGBData()
+
+    def _jpeg_fh(self):
+        return io.BytesIO(self._raw)
+
+
+# Image de ReportLab a partir de un ImageReader ya leído (Image solo acepta
+# rutas o archivos y volvería a abrirlo)
+class LogoImage(Image):
+    def __init__(self, reader, width, height):
+        self._img = reader
+        super().__init__(reader.fp, width, height)
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _build_styles():
+    styles = getSampleStyleSheet()
+    custom = {
+        'Title': ParagraphStyle(
+            'Title',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor=colors.darkblue,
+            alignment=1,
+            spaceAfter=12,
+            fontName='Helvetica-Bold'
+        ),
+        'Conclusiones': ParagraphStyle(
+            'Conclusiones',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.white,
+            fontName='Helvetica-Bold',
+            backColor=colors.darkblue,
+            spaceAfter=8,
+            spaceBefore=8,
+            alignment=1,
+            borderPadding=8
+        ),
+        'ConclusionesText': ParagraphStyle(
+            'ConclusionesText',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.black,
+            fontName='Helvetica',
+            spaceAfter=6,
+            leftIndent=20,
+            rightIndent=20,
+            borderWidth=1,
+            borderColor=colors.lightblue,
+            borderPadding=10,
+            backColor=colors.lightgrey
+        ),
+        'Footer': ParagraphStyle(
+            'Footer',
+            alignment=1,
+            fontSize=9,
+            textColor=colors.darkgrey,
+            fontName='Helvetica',
+            backColor=colors.lightgrey,
+            borderWidth=1,
+            borderColor=colors.grey,
+            borderPadding=6,
+            spaceBefore=12
+        ),
+    }
+    return styles, custom
+
+
+def _seccion_style(styles, color):
+    return ParagraphStyle(
+        'Seccion',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=color,
+        fontName='Helvetica-Bold',
+        spaceAfter=6,
+        spaceBefore=12
+    )
+
+
+class RenderContext:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._styles = None
+        self._custom = None
+        self._seccion_styles = {}
+        self._validations = _LRU(DEFAULT_MAX_VALIDATIONS)
+        self._logos = _LRU(DEFAULT_MAX_LOGOS)
+
+    def _ensure_styles(self):
+        if self._styles is None:
+            with self._lock:
+                if self._styles is None:
+                    styles, custom = _build_styles()
+                    self._custom = custom
+                    self._styles = styles
+
+    @property
+    def styles(self):
+        self._ensure_styles()
+        return self._styles
+
+    def style(self, name):
+        self._ensure_styles()
+        return self._custom[name]
+
+    def seccion_style(self, seccion):
+        self._ensure_styles()
+        color = SECCION_COLORS.get(seccion, colors.darkblue)
+        style = self._seccion_styles.get(color)
+        if style is None:
+            style = _seccion_style(self._styles, color)
+            self._seccion_styles[color] = style
+        return style
+
+    # Lanza OSError con el mensaje de PIL si el archivo no es una imagen válida;
+    # el resultado (válida o el error) queda guardado para esa versión del archivo.
+    def validate_image(self, path):
+        key = _file_key(path)
+        found, error = self._validations.get(key)
+        if not found:
+            error = None
+            try:
+                with PILImage.open(path) as img:
+                    img.verify()
+            except Exception as e:
+                error = str(e)
+            self._validations.put(key, error)
+        if error is not None:
+            raise OSError(error)
+
+    # ImageReader del logo, decodificado una vez por versión del archivo.
+    # Usarlo con LogoImage.
+    def logo(self, path):
+        key = _file_key(path)
+        found, reader = self._logos.get(key)
+        if not found:
+            reader = _LogoReader(path)
+            self._logos.put(key, reader)
+        return reader
+
+    def clear(self):
+        self._validations.clear()
+        self._logos.clear()
+
+    def stats(self):
+        return {'validaciones': len(self._validations), 'logos': len(self._logos)}
+
+
+render_context = RenderContext()
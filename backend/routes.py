@@ -1,19 +1,39 @@
-from pdf_generator import generate_pdf
-from flask_mail import Mail, Message
-from flask import Blueprint, request, jsonify, session, send_from_directory, current_app, send_file
+from pdf_cache import pdf_cache
+from pdf_jobs import pdf_jobs, QueueFullError, COMPLETADO
+from pagination import InvalidPageError, encode_cursor, decode_cursor, parse_limit, fetch_page, page_response, after_cursor_asc, after_cursor_desc
+from export_stream import export_query, ndjson_stream, csv_stream
+from storage import storage
+from chunked_upload import content_etag, UploadError, save_stream, create_session, session_status, append_chunk
+from image_pipeline import ensure_variant, is_image, is_variant, VARIANTS
+from flask import Blueprint, request, jsonify, session, send_from_directory, current_app, send_file, Response, stream_with_context
 import os
 from werkzeug.utils import secure_filename
-from models import db, User, Empresa, Cliente, Visita, Zona
+from models import db, User, Empresa, Cliente, Visita, Zona, EnvioInforme
+from query_stats import query_budget
+from zona_sync import bulk_insert_zonas, sync_zonas, ZonaInvalidaError
+from cambios import cambios_desde, registrar_eliminaciones, CursorVencidoError, DEFAULT_MARGEN, DEFAULT_MAX_ESPERA, DEFAULT_RETENCION_DIAS, CLIENTES, VISITAS, ZONAS
+import estadisticas
+import busqueda
+from importacion import IMPORTADORES, ImportacionError
+from sincronizacion import sincronizar, agregar_visita, SyncError, DEFAULT_MAX_VISITAS
+from campos import parse_fields, load_fields, project
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from werkzeug.security import check_password_hash
-from datetime import datetime
-import traceback
+from datetime import datetime, date
+import json
+import logging
+
+# pdf_generator (ReportLab), pdf_batch (pypdf) y email_delivery (Flask-Mail)
+# se importan dentro de las rutas que los usan: así el arranque en frío no
+# paga su carga en las peticiones que nunca generan PDFs ni envían correos.
 
 routes = Blueprint('routes', __name__)
+logger = logging.getLogger(__name__)
 
 @routes.errorhandler(Exception)
 def handle_exception(e):
-    print(f"ERROR: {str(e)}")
-    print(f"TRACEBACK: {traceback.format_exc()}")
+    logger.exception('Error no controlado en %s %s', request.method, request.path)
     return jsonify({'message': f'Error interno: {str(e)}'}), 500
 
 # @routes.before_request
@@ -43,18 +63,79 @@ def logout():
     session.clear()
     return jsonify({'message': 'Logout exitoso'}), 200
 
+# Campos de los listados y del detalle, para ?fields= (ver campos.py)
+USUARIO_CAMPOS = {
+    'id': ((User.id,), lambda u: u.id),
+    'nombre': ((User.nombre,), lambda u: u.nombre),
+    'email': ((User.email,), lambda u: u.email),
+    'rol': ((User.rol,), lambda u: u.rol),
+}
+
+CLIENTE_CAMPOS = {
+    'id': ((Cliente.id,), lambda c: c.id),
+    'nit': ((Cliente.nit,), lambda c: c.nit),
+    'nombre': ((Cliente.nombre,), lambda c: c.nombre),
+    'administrador': ((Cliente.administrador,), lambda c: c.administrador),
+    'correo': ((Cliente.correo,), lambda c: c.correo),
+    'tipo_codigo': ((Cliente.tipo_codigo,), lambda c: c.tipo_codigo),
+}
+
+# cliente y supervisor se cargan con un join solo si se piden
+VISITAS_CAMPOS = {
+    'id': ((Visita.id,), lambda v: v.id),
+    'fecha': ((Visita.fecha,), lambda v: v.fecha.strftime('%Y-%m-%d')),
+    'cliente': ((Visita.cliente_id,), lambda v: v.cliente.nombre),
+    'supervisor': ((Visita.supervisor_id,), lambda v: v.supervisor.nombre),
+    'conclusiones': ((Visita.conclusiones,), lambda v: v.conclusiones or ''),
+}
+
+def zona_to_dict(zona):
+    return {
+        'id': zona.id,
+        'seccion': zona.seccion,
+        'concepto_actividad': zona.concepto_actividad,
+        'calificacion': zona.calificacion,
+        'observaciones': zona.observaciones,
+        'foto_url': zona.foto_url
+    }
+
+VISITA_CAMPOS = {
+    'id': ((Visita.id,), lambda v: v.id),
+    'fecha': ((Visita.fecha,), lambda v: v.fecha.strftime('%Y-%m-%d')),
+    'supervisor_id': ((Visita.supervisor_id,), lambda v: v.supervisor_id),
+    'cliente_id': ((Visita.cliente_id,), lambda v: v.cliente_id),
+    'conclusiones': ((Visita.conclusiones,), lambda v: v.conclusiones),
+    'supervisor': ((Visita.supervisor_id,), lambda v: {'nombre': v.supervisor.nombre}),
+    'cliente': ((Visita.cliente_id,), lambda v: {'nombre': v.cliente.nombre}),
+    'zonas': ((), lambda v: [zona_to_dict(zona) for zona in v.zonas]),
+}
+
 # CRUD Usuarios (solo admin)
 @routes.route('/usuarios', methods=['GET'])
+@query_budget(1)
 def get_usuarios():
     # Temporalmente permitir acceso sin autenticación para desarrollo
     # if session.get('rol') != 'admin':
     #     return jsonify({'message': 'Acceso denegado'}), 403
-    usuarios = User.query.all()
-    return jsonify([{'id': u.id, 'nombre': u.nombre, 'email': u.email, 'rol': u.rol} for u in usuarios]), 200
+    try:
+        limit = parse_limit()
+        fields = parse_fields(USUARIO_CAMPOS)
+        query = User.query.options(load_fields(USUARIO_CAMPOS, fields, User.id)).order_by(User.id)
+        if request.args.get('email'):
+            query = query.filter(User.email == request.args['email'])
+        if request.args.get('rol'):
+            query = query.filter(User.rol == request.args['rol'])
+        if request.args.get('cursor'):
+            (last_id,) = decode_cursor(request.args['cursor'], int)
+            query = query.filter(after_cursor_asc([User.id], [last_id]))
+    except (InvalidPageError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    usuarios, next_cursor = fetch_page(query, limit, lambda u: [u.id])
+    return page_response([project(USUARIO_CAMPOS, fields, u) for u in usuarios], next_cursor)
 
 @routes.route('/test', methods=['GET', 'POST'])
 def test_endpoint():
-    print("=== TEST ENDPOINT CALLED ===")
+    logger.debug("Endpoint de prueba llamado")
     return jsonify({'message': 'Test endpoint working', 'method': request.method}), 200
 
 @routes.route('/usuarios', methods=['POST'])
@@ -110,6 +191,7 @@ def manage_usuario(id):
         db.session.commit()
         return jsonify({'message': 'Usuario actualizado'}), 200
     elif request.method == 'DELETE':
+        estadisticas.quitar_supervisor(id)
         db.session.delete(user)
         db.session.commit()
         return jsonify({'message': 'Usuario eliminado'}), 200
@@ -181,13 +263,24 @@ def update_empresa():
         empresa.logo_url = data['logo_url']
     
     db.session.commit()
+    pdf_cache.invalidate(supervisor_id=user_id)
     return jsonify({'message': 'Empresa actualizada exitosamente'}), 200
 
 # CRUD Clientes
 @routes.route('/clientes', methods=['GET'])
+@query_budget(1)
 def get_clientes():
-    clientes = Cliente.query.all()
-    return jsonify([{'id': c.id, 'nit': c.nit, 'nombre': c.nombre, 'administrador': c.administrador, 'correo': c.correo, 'tipo_codigo': c.tipo_codigo} for c in clientes]), 200
+    try:
+        limit = parse_limit()
+        fields = parse_fields(CLIENTE_CAMPOS)
+        query = Cliente.query.options(load_fields(CLIENTE_CAMPOS, fields, Cliente.id)).order_by(Cliente.id)
+        if request.args.get('cursor'):
+            (last_id,) = decode_cursor(request.args['cursor'], int)
+            query = query.filter(after_cursor_asc([Cliente.id], [last_id]))
+    except (InvalidPageError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    clientes, next_cursor = fetch_page(query, limit, lambda c: [c.id])
+    return page_response([project(CLIENTE_CAMPOS, fields, c) for c in clientes], next_cursor)
 
 @routes.route('/clientes', methods=['POST'])
 def create_cliente():
@@ -208,10 +301,14 @@ def manage_cliente(id):
         cliente.correo = data['correo']
         cliente.tipo_codigo = data['tipo_codigo']
         db.session.commit()
+        pdf_cache.invalidate(cliente_id=id)
         return jsonify({'message': 'Cliente actualizado'}), 200
     elif request.method == 'DELETE':
+        estadisticas.quitar_cliente(id)
         db.session.delete(cliente)
+        registrar_eliminaciones(CLIENTES, [id])
         db.session.commit()
+        pdf_cache.invalidate(cliente_id=id)
         return jsonify({'message': 'Cliente eliminado'}), 200
 
 # CRUD Visitas
@@ -227,75 +324,132 @@ def upload_file():
     if file.filename == '':
         return jsonify({'message': 'No selected file'}), 400
     if file:
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        return jsonify({'url': f'/uploads/{filename}'}), 200
+        # El archivo se guarda con el nombre de su SHA-256
+        filename, _ = save_stream(file.stream, file.filename)
+        return jsonify(_upload_response(filename)), 200
+
+def _upload_response(filename):
+    file_path = storage().local_path(filename)
+    response = {'url': f'/uploads/{filename}'}
+    # Generar derivados (impresión, miniatura y versión web sin EXIF)
+    if is_image(filename) and ensure_variant(file_path, 'thumb') != file_path:
+        response['thumb_url'] = f'/uploads/{filename}?variant=thumb'
+    return response
+
+def _upload_error(e):
+    body = {'message': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
+# Subida por partes reanudable (ver chunked_upload.py)
+@routes.route('/upload/sesiones', methods=['POST'])
+def create_upload_session():
+    data = request.json or {}
+    try:
+        result = create_session(data.get('filename'), data.get('size'), data.get('sha256'))
+    except UploadError as e:
+        return _upload_error(e)
+    if result['complete']:
+        return jsonify(_upload_response(result['filename'])), 200
+    return jsonify(result), 201
+
+@routes.route('/upload/sesiones/<string:upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    try:
+        return jsonify(session_status(upload_id)), 200
+    except UploadError as e:
+        return _upload_error(e)
+
+@routes.route('/upload/sesiones/<string:upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'message': 'Falta la cabecera Upload-Offset'}), 400
+    try:
+        result = append_chunk(upload_id, offset, request.stream)
+    except UploadError as e:
+        return _upload_error(e)
+    if result['complete']:
+        return jsonify(_upload_response(result['filename'])), 200
+    return jsonify(result), 202
 
 @routes.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    # Los archivos que empiezan con punto son temporales o sesiones de subida
+    if filename.startswith('.'):
+        return jsonify({'message': 'Archivo no encontrado'}), 404
+    # Por defecto se sirve la versión web (recomprimida y sin EXIF);
+    # ?variant=original devuelve el archivo tal como se subió
+    variant = request.args.get('variant', 'web')
+    if variant != 'original' and variant not in VARIANTS:
+        return jsonify({'message': f'Variante inválida: {variant}'}), 400
+    if variant != 'original' and is_image(filename) and not is_variant(filename):
+        original = storage().local_path(secure_filename(filename))
+        derived = ensure_variant(original, variant)
+        filename = os.path.basename(derived)
+
+    # send_file ya responde 304 a If-None-Match/If-Modified-Since y atiende
+    # peticiones Range; aquí se define el ETag y la política de caché
+    etag = content_etag(filename)
+    if etag:
+        # Mismo nombre = mismo contenido: el navegador no necesita revalidar
+        response = storage().send(filename, etag=etag, max_age=31536000)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # Nombres antiguos pueden reemplazarse: se revalidan siempre con el ETag
+        response = storage().send(filename)
+        response.cache_control.no_cache = True
+    response.accept_ranges = 'bytes'
+    return response
 
 # CRUD Visitas
 @routes.route('/visita', methods=['POST'])
 def create_visita():
     try:
         data = request.json
-        # Generar ID automático
-        fecha = datetime.strptime(data['fecha'], '%Y-%m-%d')
-        visita_id = f"{fecha.strftime('%d%m%Y')}-{data.get('tipo_codigo', 'AL')}-{datetime.now().strftime('%H%M')}"
-        
         visita = Visita(
-            id=visita_id,
-            fecha=fecha,
+            fecha=datetime.strptime(data['fecha'], '%Y-%m-%d'),
             supervisor_id=data['supervisor_id'],
             cliente_id=data['cliente_id'],
             conclusiones=data.get('conclusiones', '')
         )
+        # Generar ID automático (reintenta si otra petición tomó el mismo)
+        agregar_visita(visita, data.get('tipo_codigo', 'AL'))
         
-        db.session.add(visita)
-        db.session.flush()  # Para obtener el ID
-        
-        # Agregar zonas
-        for zona_data in data.get('zonas', []):
-            zona = Zona(
-                visita_id=visita.id,
-                seccion=zona_data['seccion'],
-                concepto_actividad=zona_data['concepto_actividad'],
-                calificacion=zona_data['calificacion'],
-                observaciones=zona_data.get('observaciones', ''),
-                foto_url=zona_data.get('foto_url', '')
-            )
-            db.session.add(zona)
+        # Agregar zonas en un solo INSERT
+        bulk_insert_zonas(visita.id, data.get('zonas', []))
+        estadisticas.sumar_visita(visita)
+        busqueda.indexar_visita(visita.id)
         
         db.session.commit()
         return jsonify({'message': 'Visita creada exitosamente', 'id': visita.id}), 201
         
+    except IntegrityError as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error al crear visita: {str(e.orig)}'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error al crear visita: {str(e)}'}), 500
 
 @routes.route('/visita/<string:visita_id>', methods=['GET'])
+@query_budget(2)
 def get_visita(visita_id):
     try:
-        visita = Visita.query.get_or_404(visita_id)
-        return jsonify({
-            'id': visita.id,
-            'fecha': visita.fecha.strftime('%Y-%m-%d'),
-            'supervisor_id': visita.supervisor_id,
-            'cliente_id': visita.cliente_id,
-            'conclusiones': visita.conclusiones,
-            'supervisor': {'nombre': visita.supervisor.nombre},
-            'cliente': {'nombre': visita.cliente.nombre},
-            'zonas': [{
-                'id': zona.id,
-                'seccion': zona.seccion,
-                'concepto_actividad': zona.concepto_actividad,
-                'calificacion': zona.calificacion,
-                'observaciones': zona.observaciones,
-                'foto_url': zona.foto_url
-            } for zona in visita.zonas]
-        }), 200
+        fields = parse_fields(VISITA_CAMPOS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    try:
+        opciones = [load_fields(VISITA_CAMPOS, fields, Visita.id)]
+        if 'cliente' in fields:
+            opciones.append(joinedload(Visita.cliente).load_only(Cliente.nombre))
+        if 'supervisor' in fields:
+            opciones.append(joinedload(Visita.supervisor).load_only(User.nombre))
+        if 'zonas' in fields:
+            opciones.append(selectinload(Visita.zonas))
+        visita = Visita.query.options(*opciones).filter_by(id=visita_id).first_or_404()
+        return jsonify(project(VISITA_CAMPOS, fields, visita)), 200
     except Exception as e:
         return jsonify({'message': f'Error al obtener visita: {str(e)}'}), 500
 
@@ -304,30 +458,25 @@ def update_visita(visita_id):
     try:
         visita = Visita.query.get_or_404(visita_id)
         data = request.json
+        estadisticas.restar_visita(visita)
         
         visita.fecha = datetime.strptime(data['fecha'], '%Y-%m-%d')
         visita.supervisor_id = data['supervisor_id']
         visita.cliente_id = data['cliente_id']
         visita.conclusiones = data.get('conclusiones', '')
         
-        # Eliminar zonas existentes
-        Zona.query.filter_by(visita_id=visita_id).delete()
-        
-        # Agregar nuevas zonas
-        for zona_data in data.get('zonas', []):
-            zona = Zona(
-                visita_id=visita.id,
-                seccion=zona_data['seccion'],
-                concepto_actividad=zona_data['concepto_actividad'],
-                calificacion=zona_data['calificacion'],
-                observaciones=zona_data.get('observaciones', ''),
-                foto_url=zona_data.get('foto_url', '')
-            )
-            db.session.add(zona)
+        # Solo tocar las zonas que cambiaron (las zonas conservan su id)
+        cambios = sync_zonas(visita.id, data.get('zonas', []))
+        estadisticas.sumar_visita(visita)
+        busqueda.indexar_visita(visita.id)
         
         db.session.commit()
-        return jsonify({'message': 'Visita actualizada exitosamente'}), 200
+        pdf_cache.invalidate(visita_id=visita_id)
+        return jsonify({'message': 'Visita actualizada exitosamente', 'zonas': cambios}), 200
         
+    except ZonaInvalidaError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error al actualizar visita: {str(e)}'}), 500
@@ -336,13 +485,21 @@ def update_visita(visita_id):
 def delete_visita(visita_id):
     try:
         visita = Visita.query.get_or_404(visita_id)
+        estadisticas.restar_visita(visita)
+        busqueda.quitar_visita(visita_id)
         
         # Eliminar zonas asociadas primero
+        zona_ids = [zona_id for (zona_id,) in db.session.query(Zona.id).filter_by(visita_id=visita_id)]
         Zona.query.filter_by(visita_id=visita_id).delete()
+        registrar_eliminaciones(ZONAS, zona_ids)
+        registrar_eliminaciones(VISITAS, [visita_id])
+        # Los envíos del informe también referencian a la visita
+        EnvioInforme.query.filter_by(visita_id=visita_id).delete()
         
         # Eliminar la visita
         db.session.delete(visita)
         db.session.commit()
+        pdf_cache.invalidate(visita_id=visita_id)
         
         return jsonify({'message': 'Visita eliminada exitosamente'}), 200
         
@@ -350,55 +507,302 @@ def delete_visita(visita_id):
         db.session.rollback()
         return jsonify({'message': f'Error al eliminar visita: {str(e)}'}), 500
 
+# Filtros comunes de los listados de visitas: cliente_id, supervisor_id,
+# desde/hasta (YYYY-MM-DD) y calificacion (visitas con al menos una zona así)
+def filtrar_visitas(query):
+    args = request.args
+    if args.get('cliente_id'):
+        query = query.filter(Visita.cliente_id == int(args['cliente_id']))
+    if args.get('supervisor_id'):
+        query = query.filter(Visita.supervisor_id == int(args['supervisor_id']))
+    if args.get('desde'):
+        query = query.filter(Visita.fecha >= datetime.strptime(args['desde'], '%Y-%m-%d').date())
+    if args.get('hasta'):
+        query = query.filter(Visita.fecha <= datetime.strptime(args['hasta'], '%Y-%m-%d').date())
+    if args.get('calificacion'):
+        if args['calificacion'] not in ('Buena', 'Media', 'Mala'):
+            raise ValueError('calificacion debe ser Buena, Media o Mala')
+        query = query.filter(Visita.zonas.any(Zona.calificacion == args['calificacion']))
+    return query
+
 @routes.route('/visitas', methods=['GET'])
+@query_budget(1)
 def get_visitas():
     try:
-        visitas = Visita.query.all()
-        return jsonify([{
-            'id': v.id,
-            'fecha': v.fecha.strftime('%Y-%m-%d'),
-            'cliente': v.cliente.nombre,
-            'supervisor': v.supervisor.nombre,
-            'conclusiones': v.conclusiones or ''
-        } for v in visitas]), 200
+        # Más recientes primero, paginadas por (fecha, id)
+        try:
+            limit = parse_limit()
+            fields = parse_fields(VISITAS_CAMPOS)
+            # fecha e id siempre, para el cursor
+            opciones = [load_fields(VISITAS_CAMPOS, fields, Visita.id, Visita.fecha)]
+            if 'cliente' in fields:
+                opciones.append(joinedload(Visita.cliente).load_only(Cliente.nombre))
+            if 'supervisor' in fields:
+                opciones.append(joinedload(Visita.supervisor).load_only(User.nombre))
+            query = filtrar_visitas(Visita.query.options(*opciones)).order_by(Visita.fecha.desc(), Visita.id.desc())
+            if request.args.get('cursor'):
+                last_fecha, last_id = decode_cursor(request.args['cursor'], str, str)
+                query = query.filter(after_cursor_desc([Visita.fecha, Visita.id], [date.fromisoformat(last_fecha), last_id]))
+        except (InvalidPageError, ValueError) as e:
+            return jsonify({'message': str(e)}), 400
+        visitas, next_cursor = fetch_page(query, limit, lambda v: [v.fecha.isoformat(), v.id])
+        return page_response([project(VISITAS_CAMPOS, fields, v) for v in visitas], next_cursor)
     except Exception as e:
         return jsonify({'message': f'Error al obtener visitas: {str(e)}'}), 500
 
+# Búsqueda de texto en conclusiones y zonas, ordenada por relevancia.
+# Acepta los mismos filtros del listado; el cursor es la posición en el ranking.
+@routes.route('/visitas/search', methods=['GET'])
+@query_budget(1)
+def search_visitas():
+    try:
+        limit = parse_limit()
+        offset = 0
+        if request.args.get('cursor'):
+            (offset,) = decode_cursor(request.args['cursor'], int)
+            if offset < 0:
+                raise InvalidPageError('Cursor inválido')
+        query = busqueda.buscar(request.args.get('q'), filtrar_visitas(db.session.query(Visita).options(
+            joinedload(Visita.cliente),
+            joinedload(Visita.supervisor),
+        )))
+    except (InvalidPageError, ValueError, TypeError, IndexError) as e:
+        return jsonify({'message': str(e)}), 400
+    rows = query.offset(offset).limit(limit + 1).all()
+    next_cursor = encode_cursor([offset + limit]) if len(rows) > limit else None
+    return page_response([{
+        'id': v.id,
+        'fecha': v.fecha.strftime('%Y-%m-%d'),
+        'cliente': v.cliente.nombre,
+        'supervisor': v.supervisor.nombre,
+        'conclusiones': v.conclusiones or '',
+        'relevancia': round(rank, 4),
+    } for v, rank in rows[:limit]], next_cursor)
+
+# Importación masiva desde CSV o XLSX (ver importacion.py)
+@routes.route('/importar/<string:tipo>', methods=['POST'])
+def importar(tipo):
+    if tipo not in IMPORTADORES:
+        return jsonify({'message': 'Se puede importar clientes o visitas'}), 404
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'message': 'No file part'}), 400
+    file = request.files['file']
+    try:
+        reporte = IMPORTADORES[tipo](file.stream, file.filename)
+    except ImportacionError as e:
+        return jsonify({'message': str(e)}), 400
+    status = 422 if reporte['total_errores'] and not reporte['insertados'] else 200
+    return jsonify(reporte), status
+
+# Cambios desde el último cursor (ver cambios.py). Sin `since` empieza desde el principio.
+@routes.route('/cambios', methods=['GET'])
+def get_cambios():
+    try:
+        limit = parse_limit()
+        cambios, cursor, hay_mas = cambios_desde(
+            request.args.get('since'), limit,
+            margen=current_app.config.get('CAMBIOS_MARGEN', DEFAULT_MARGEN),
+            max_espera=current_app.config.get('CAMBIOS_MAX_ESPERA', DEFAULT_MAX_ESPERA),
+            retencion_dias=current_app.config.get('CAMBIOS_RETENCION_DIAS', DEFAULT_RETENCION_DIAS),
+        )
+    except InvalidPageError as e:
+        return jsonify({'message': str(e)}), 400
+    except CursorVencidoError as e:
+        return jsonify({'message': str(e)}), 410
+    return jsonify(dict(cambios, cursor=cursor, hay_mas=hay_mas)), 200
+
+# Sincronización por lotes desde dispositivos sin conexión (ver sincronizacion.py)
+@routes.route('/sync', methods=['POST'])
+def sync():
+    data = request.get_json(silent=True) or {}
+    visitas = data.get('visitas')
+    if not isinstance(visitas, list) or not visitas:
+        return jsonify({'message': 'El campo visitas debe ser una lista con al menos una visita'}), 400
+    max_visitas = current_app.config.get('SYNC_MAX_VISITAS', DEFAULT_MAX_VISITAS)
+    if len(visitas) > max_visitas:
+        return jsonify({'message': f'Se pueden sincronizar hasta {max_visitas} visitas por lote'}), 413
+    try:
+        resultado = sincronizar(visitas)
+    except SyncError as e:
+        db.session.rollback()
+        return jsonify({'message': 'Hay visitas inválidas; no se guardó ninguna', 'errores': e.errores}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Otra sincronización guardó las mismas visitas al mismo tiempo, reintenta'}), 409
+    return jsonify(resultado), 200
+
+# Exportación de visitas con sus zonas, con los mismos filtros del listado
+@routes.route('/visitas/export', methods=['GET'])
+def export_visitas():
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'message': 'El formato debe ser ndjson o csv'}), 400
+    try:
+        query = filtrar_visitas(export_query())
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if formato == 'csv':
+        response = Response(stream_with_context(csv_stream(query)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=visitas.csv'
+    else:
+        response = Response(stream_with_context(ndjson_stream(query)), mimetype='application/x-ndjson')
+    return response
+
+# Estadísticas de calificaciones (Buena/Media/Mala) desde la tabla resumen
+@routes.route('/estadisticas', methods=['GET'])
+@query_budget(1)
+def get_estadisticas():
+    agrupar = [d for d in request.args.get('agrupar', 'cliente').split(',') if d]
+    invalidas = [d for d in agrupar if d not in estadisticas.DIMENSIONES]
+    if invalidas or not agrupar:
+        return jsonify({'message': f'agrupar admite: {", ".join(estadisticas.DIMENSIONES)}'}), 400
+    try:
+        desde = datetime.strptime(request.args['desde'], '%Y-%m').date() if request.args.get('desde') else None
+        hasta = datetime.strptime(request.args['hasta'], '%Y-%m').date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'message': 'Los meses deben tener formato YYYY-MM'}), 400
+    return jsonify(estadisticas.consultar(
+        agrupar,
+        cliente_id=request.args.get('cliente_id', type=int),
+        supervisor_id=request.args.get('supervisor_id', type=int),
+        desde=desde,
+        hasta=hasta,
+    )), 200
+
 # CRUD Zonas
 # Generar PDF
 @routes.route('/generar-pdf/<string:visita_id>', methods=['POST'])
+@query_budget(4)
 def generar_pdf(visita_id):
+    from pdf_generator import generate_pdf
     try:
-        print(f"DEBUG: Generando PDF para visita {visita_id}")
+        logger.debug('Generando PDF para visita %s', visita_id)
         
         # Verificar que la visita existe
         visita = Visita.query.get(visita_id)
         if not visita:
-            print(f"DEBUG: Visita {visita_id} no encontrada")
+            logger.debug('Visita %s no encontrada', visita_id)
             return jsonify({'message': f'Visita {visita_id} no encontrada'}), 404
         
-        print(f"DEBUG: Visita encontrada: {visita.id}")
-        
         pdf_path = generate_pdf(visita_id)
-        print(f"DEBUG: PDF generado en: {pdf_path}")
+        logger.debug('PDF de visita %s generado en %s', visita_id, pdf_path)
         
         if not pdf_path:
-            print("DEBUG: No se pudo generar PDF - falta al menos una foto")
+            logger.info('No se pudo generar PDF de visita %s: falta al menos una foto', visita_id)
             return jsonify({'message': 'No se puede generar PDF: falta al menos una foto'}), 400
         
         # Verificar que el archivo existe
         if not os.path.exists(pdf_path):
-            print(f"DEBUG: Archivo PDF no existe en {pdf_path}")
+            logger.error('Archivo PDF no existe en %s', pdf_path)
             return jsonify({'message': 'Archivo PDF no encontrado'}), 500
         
-        print(f"DEBUG: Enviando archivo PDF: {pdf_path}")
         # Enviar el archivo PDF como respuesta
         return send_file(pdf_path, as_attachment=True, download_name=f'visita-{visita_id}.pdf')
     except Exception as e:
-        print(f"DEBUG: Error al generar PDF: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error al generar PDF de visita %s', visita_id)
         return jsonify({'message': f'Error al generar PDF: {str(e)}'}), 500
+
+# Generación asíncrona: se encola el trabajo y se consulta su estado
+@routes.route('/generar-pdf/jobs', methods=['POST'])
+def create_pdf_job():
+    data = request.json or {}
+    visita_id = data.get('visita_id')
+    if not visita_id:
+        return jsonify({'message': 'El campo visita_id es requerido'}), 400
+    if not Visita.query.get(visita_id):
+        return jsonify({'message': f'Visita {visita_id} no encontrada'}), 404
+    try:
+        job = pdf_jobs.submit(visita_id)
+    except QueueFullError:
+        response = jsonify({'message': 'Hay demasiados PDFs en cola, intenta más tarde'})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+    if not job:
+        return jsonify({'message': 'No se puede generar PDF: falta al menos una foto'}), 400
+    response = jsonify(pdf_jobs.status(job.id))
+    response.headers['Location'] = f'/generar-pdf/jobs/{job.id}'
+    return response, 202
+
+@routes.route('/generar-pdf/jobs/<string:job_id>', methods=['GET'])
+def get_pdf_job(job_id):
+    status = pdf_jobs.status(job_id)
+    if not status:
+        return jsonify({'message': 'Trabajo no encontrado'}), 404
+    return jsonify(status), 200
+
+@routes.route('/generar-pdf/jobs/<string:job_id>/descarga', methods=['GET'])
+def download_pdf_job(job_id):
+    trabajo = pdf_jobs.get(job_id)
+    if not trabajo:
+        return jsonify({'message': 'Trabajo no encontrado'}), 404
+    if trabajo.estado != COMPLETADO:
+        return jsonify({'message': 'El PDF todavía no está listo'}), 409
+    if not os.path.exists(trabajo.ruta):
+        return jsonify({'message': 'El PDF expiró, genera uno nuevo'}), 410
+    return send_file(trabajo.ruta, as_attachment=True, download_name=f'visita-{trabajo.visita_id}.pdf')
+
+# Exportación masiva: por cliente, rango de fechas o lista de visitas
+@routes.route('/generar-pdf/lote', methods=['POST'])
+def generar_pdf_lote():
+    from pdf_batch import select_visitas, export_batch, DEFAULT_LOTE_MAX_VISITAS
+    data = request.json or {}
+    formato = data.get('formato', 'zip')
+    if formato not in ('zip', 'pdf'):
+        return jsonify({'message': 'El formato debe ser zip o pdf'}), 400
+    if not (data.get('cliente_id') or data.get('visita_ids') or data.get('desde') or data.get('hasta')):
+        return jsonify({'message': 'Indica cliente_id, visita_ids o un rango de fechas'}), 400
+    try:
+        desde = datetime.strptime(data['desde'], '%Y-%m-%d').date() if data.get('desde') else None
+        hasta = datetime.strptime(data['hasta'], '%Y-%m-%d').date() if data.get('hasta') else None
+    except ValueError:
+        return jsonify({'message': 'Las fechas deben tener formato YYYY-MM-DD'}), 400
+
+    visita_ids = select_visitas(data.get('cliente_id'), desde, hasta, data.get('visita_ids'))
+    if not visita_ids:
+        return jsonify({'message': 'No hay visitas que coincidan con el filtro'}), 404
+    max_visitas = current_app.config.get('PDF_LOTE_MAX_VISITAS', DEFAULT_LOTE_MAX_VISITAS)
+    if len(visita_ids) > max_visitas:
+        return jsonify({'message': f'El lote tiene {len(visita_ids)} visitas; el máximo es {max_visitas}. '
+                                   'Acota el filtro o usa flask exportar-informes'}), 413
+
+    path, errores = export_batch(visita_ids, formato)
+    if not path:
+        return jsonify({'message': 'No se pudo generar ningún informe', 'errores': errores}), 422
+
+    response = send_file(path, as_attachment=True, download_name=f'informes.{formato}')
+    response.headers['X-Errores-Exportacion'] = json.dumps(errores)
+    response.call_on_close(lambda: os.path.exists(path) and os.remove(path))
+    return response
+
+# Envío del informe por correo al cliente (en segundo plano)
+@routes.route('/visita/<string:visita_id>/enviar', methods=['POST'])
+def enviar_informe(visita_id):
+    from email_delivery import email_queue, envio_to_dict, NoRecipientError
+    visita = Visita.query.get(visita_id)
+    if not visita:
+        return jsonify({'message': f'Visita {visita_id} no encontrada'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        envio = email_queue.enqueue(visita, data.get('destinatario'))
+    except NoRecipientError as e:
+        return jsonify({'message': str(e)}), 400
+    response = jsonify(envio_to_dict(envio))
+    response.headers['Location'] = f'/envios/{envio.id}'
+    return response, 202
+
+@routes.route('/envios/<int:envio_id>', methods=['GET'])
+def get_envio(envio_id):
+    from email_delivery import envio_to_dict
+    envio = db.session.get(EnvioInforme, envio_id)
+    if not envio:
+        return jsonify({'message': 'Envío no encontrado'}), 404
+    return jsonify(envio_to_dict(envio)), 200
+
+@routes.route('/generar-pdf/cache', methods=['GET'])
+def pdf_cache_stats():
+    return jsonify(pdf_cache.stats()), 200
+
 @routes.route('/zonas/<string:visita_id>', methods=['GET'])
 def get_zonas(visita_id):
     zonas = Zona.query.filter_by(visita_id=visita_id).all()
@@ -423,14 +827,20 @@ def manage_zona(id):
     zona = Zona.query.get_or_404(id)
     if request.method == 'PUT':
         data = request.json
-        zona.nombre = data['nombre']
-        zona.observaciones = data['observaciones']
-        zona.actividades = data['actividades']
-        zona.calificacion = data['calificacion']
-        zona.foto_url = data.get('foto_url')
+        estadisticas.restar_zonas([estadisticas.clave_zona(zona)])
+        zona.seccion = data.get('seccion', zona.seccion)
+        zona.concepto_actividad = data.get('concepto_actividad', zona.concepto_actividad)
+        zona.observaciones = data.get('observaciones', zona.observaciones)
+        zona.calificacion = data.get('calificacion', zona.calificacion)
+        zona.foto_url = data.get('foto_url', zona.foto_url)
+        estadisticas.sumar_zonas([estadisticas.clave_zona(zona)])
+        busqueda.indexar_visita(zona.visita_id)
         db.session.commit()
         return jsonify({'message': 'Zona actualizada'}), 200
     elif request.method == 'DELETE':
+        estadisticas.restar_zonas([estadisticas.clave_zona(zona)])
         db.session.delete(zona)
+        registrar_eliminaciones(ZONAS, [zona.id])
+        busqueda.indexar_visita(zona.visita_id)
         db.session.commit()
         return jsonify({'message': 'Zona eliminada'}), 200
\ No newline at end of file
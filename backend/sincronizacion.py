@@ -0,0 +1,220 @@
+from models import db, User, Cliente, Visita, Zona, ClaveSincronizacion
+from storage import storage
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import busqueda
+import estadisticas
+
+# Sincronización por lotes desde dispositivos sin conexión (POST /sync).
+# El supervisor registra las visitas del día sin señal y el dispositivo las
+# manda todas juntas, cada una con una clave única generada por él (p. ej. un
+# UUID). El lote se valida completo y se guarda en una sola transacción con
+# INSERTs en bloque; las claves que ya se aplicaron se saltan y devuelven el
+# id asignado la primera vez, así que reenviar un lote (porque se cortó la
+# respuesta) no duplica nada.
+#
+# Las fotos se suben aparte (/upload o /upload/chunked, direccionadas por
+# contenido) cuando haya señal; la respuesta dice cuáles de las referenciadas
+# todavía no están en el servidor.
+
+DEFAULT_MAX_VISITAS = 500
+DEFAULT_ID_REINTENTOS = 5
+MAX_CLAVE = 64
+ZONA_CAMPOS = {'seccion': 50, 'concepto_actividad': 100}
+
+CREADA = 'creada'
+DUPLICADA = 'duplicada'
+
+
+class SyncError(Exception):
+    def __init__(self, errores):
+        super().__init__(f'{len(errores)} visitas inválidas')
+        self.errores = errores
+
+
+def _prefijo(base):
+    # El tipo_codigo viene del cliente: sus % y _ no son comodines
+    return base.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+# Ids con el formato de siempre, fecha-tipo-HHMM. Si ya existe (otra visita
+# con la misma fecha y tipo creada en el mismo minuto) se agrega -2, -3... `claves` es una
+# lista de (fecha, tipo_codigo); se resuelven todas con una sola consulta.
+def nuevos_ids_visita(claves, ahora=None):
+    ahora = ahora or datetime.now()
+    bases = [f"{fecha.strftime('%d%m%Y')}-{tipo_codigo}-{ahora.strftime('%H%M')}" for fecha, tipo_codigo in claves]
+    if not bases:
+        return []
+    usados = {visita_id for (visita_id,) in db.session.query(Visita.id).filter(
+        or_(*[Visita.id.like(_prefijo(base), escape='\\') for base in set(bases)]))}
+    ids = []
+    for base in bases:
+        visita_id, n = base, 1
+        while visita_id in usados:
+            n += 1
+            visita_id = f'{base}-{n}'
+        usados.add(visita_id)
+        ids.append(visita_id)
+    return ids
+
+
+# Inserta `visita` (sin id) con un id nuevo. Entre la consulta de
+# nuevos_ids_visita y el INSERT otra petición puede tomar el mismo id: en ese
+# caso se deshace la transacción y se prueba con el siguiente sufijo. Por eso
+# debe ser lo primero que se escribe en la transacción.
+def agregar_visita(visita, tipo_codigo, reintentos=DEFAULT_ID_REINTENTOS):
+    for intento in range(reintentos):
+        visita.id = nuevos_ids_visita([(visita.fecha, tipo_codigo)])[0]
+        db.session.add(visita)
+        try:
+            db.session.flush()
+            return visita
+        except IntegrityError:
+            db.session.rollback()
+            # Otro error de integridad (p. ej. una FK) no se arregla cambiando el id
+            if intento == reintentos - 1 or not db.session.query(Visita.id).filter_by(id=visita.id).first():
+                raise
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _validar_zona(zona):
+    if not isinstance(zona, dict):
+        raise ValueError('cada zona debe ser un objeto')
+    valores = {}
+    for campo, largo in ZONA_CAMPOS.items():
+        valor = _texto(zona.get(campo))
+        if not valor:
+            raise ValueError(f'{campo} es requerido en cada zona')
+        if len(valor) > largo:
+            raise ValueError(f'{campo} supera {largo} caracteres')
+        valores[campo] = valor
+    if zona.get('calificacion') not in estadisticas.CALIFICACIONES:
+        raise ValueError('calificacion debe ser Buena, Media o Mala')
+    valores['calificacion'] = zona['calificacion']
+    valores['observaciones'] = _texto(zona.get('observaciones'))
+    valores['foto_url'] = _texto(zona.get('foto_url'))
+    return valores
+
+
+def _validar_visita(item, clientes, supervisores):
+    try:
+        fecha = datetime.strptime(_texto(item.get('fecha')), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('fecha debe tener formato YYYY-MM-DD')
+    cliente_id = _entero(item.get('cliente_id'))
+    if cliente_id not in clientes:
+        raise ValueError('cliente no encontrado')
+    supervisor_id = _entero(item.get('supervisor_id'))
+    if supervisor_id not in supervisores:
+        raise ValueError('supervisor no encontrado')
+    zonas = item.get('zonas') or []
+    if not isinstance(zonas, list):
+        raise ValueError('zonas debe ser una lista')
+    return {
+        'fecha': fecha,
+        'cliente_id': cliente_id,
+        'supervisor_id': supervisor_id,
+        'conclusiones': _texto(item.get('conclusiones')),
+        'tipo_codigo': _texto(item.get('tipo_codigo')) or clientes[cliente_id],
+    }, [_validar_zona(z) for z in zonas]
+
+
+def _fotos_pendientes(zonas):
+    backend = storage()
+    pendientes = []
+    for url in dict.fromkeys(z['foto_url'] for z in zonas if z['foto_url']):
+        try:
+            if not backend.exists(url.split('/')[-1]):
+                pendientes.append(url)
+        except ValueError:
+            pendientes.append(url)
+    return pendientes
+
+
+# Guarda las visitas del lote que no se hayan aplicado antes. Lanza SyncError
+# (sin guardar nada) si alguna es inválida. El commit puede lanzar
+# IntegrityError si otra sincronización con las mismas claves o ids terminó
+# primero: reintentar el lote es seguro.
+def sincronizar(items):
+    errores = []
+    claves = []
+    for indice, item in enumerate(items):
+        clave = _texto(item.get('clave')) if isinstance(item, dict) else ''
+        if not clave or len(clave) > MAX_CLAVE:
+            errores.append({'indice': indice, 'clave': clave, 'error': f'clave es requerida (máximo {MAX_CLAVE} caracteres)'})
+        claves.append(clave)
+    if errores:
+        raise SyncError(errores)
+
+    aplicadas = dict(db.session.query(ClaveSincronizacion.clave, ClaveSincronizacion.visita_id)
+                     .filter(ClaveSincronizacion.clave.in_(set(claves))))
+    pendientes = [(i, item) for i, item in enumerate(items) if claves[i] not in aplicadas]
+
+    cliente_ids = {_entero(item.get('cliente_id')) for _, item in pendientes}
+    supervisor_ids = {_entero(item.get('supervisor_id')) for _, item in pendientes}
+    clientes = dict(db.session.query(Cliente.id, Cliente.tipo_codigo).filter(Cliente.id.in_(cliente_ids)))
+    supervisores = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(supervisor_ids))}
+
+    nuevas = {}  # clave -> (visita, zonas)
+    for indice, item in pendientes:
+        clave = claves[indice]
+        if clave in nuevas:
+            continue  # la misma clave repetida en el lote cuenta una vez
+        try:
+            nuevas[clave] = _validar_visita(item, clientes, supervisores)
+        except ValueError as e:
+            errores.append({'indice': indice, 'clave': clave, 'error': str(e)})
+    if errores:
+        raise SyncError(errores)
+
+    ids = nuevos_ids_visita([(v['fecha'], v.pop('tipo_codigo')) for v, _ in nuevas.values()])
+    for visita_id, (visita, _) in zip(ids, nuevas.values()):
+        visita['id'] = visita_id
+
+    todas_zonas = [z for _, zonas in nuevas.values() for z in zonas]
+    if nuevas:
+        db.session.execute(insert(Visita), [visita for visita, _ in nuevas.values()])
+        if todas_zonas:
+            db.session.execute(insert(Zona), [dict(z, visita_id=visita['id'])
+                                              for visita, zonas in nuevas.values() for z in zonas])
+        db.session.execute(insert(ClaveSincronizacion), [
+            {'clave': clave, 'visita_id': visita['id']} for clave, (visita, _) in nuevas.items()
+        ])
+        estadisticas.sumar_zonas(
+            (visita['cliente_id'], visita['supervisor_id'], z['seccion'], visita['fecha'], z['calificacion'])
+            for visita, zonas in nuevas.values() for z in zonas
+        )
+        busqueda.indexar_documentos([{
+            'visita_id': visita['id'],
+            'conclusiones': visita['conclusiones'],
+            'zonas': busqueda.texto_zonas((z['seccion'], z['concepto_actividad'], z['observaciones']) for z in zonas),
+        } for visita, zonas in nuevas.values()])
+    db.session.commit()
+
+    resultados = []
+    creadas = set()
+    for clave in claves:
+        if clave in aplicadas:
+            resultados.append({'clave': clave, 'id': aplicadas[clave], 'estado': DUPLICADA})
+        elif clave in creadas:
+            resultados.append({'clave': clave, 'id': nuevas[clave][0]['id'], 'estado': DUPLICADA})
+        else:
+            creadas.add(clave)
+            resultados.append({'clave': clave, 'id': nuevas[clave][0]['id'], 'estado': CREADA})
+    return {
+        'resultados': resultados,
+        'creadas': len(nuevas),
+        'duplicadas': len(claves) - len(nuevas),
+        'fotos_pendientes': _fotos_pendientes(todas_zonas),
+    }
@@ -0,0 +1,149 @@
+from flask import current_app, send_from_directory
+import hashlib
+import os
+import re
+import shutil
+
+# Almacenamiento de los archivos subidos (fotos y logos).
+#
+# Las URLs siguen siendo /uploads/<nombre>; lo que cambia es dónde vive cada
+# archivo. En lugar de un único directorio con cientos de miles de archivos,
+# se reparten en subdirectorios según un hash del nombre:
+#
+#   uploads/3f/a2/3fa2...c9.jpg
+#   uploads/3f/a2/3fa2...c9__print.jpg   (los derivados quedan junto al original)
+#
+# Para los archivos direccionados por contenido el prefijo es su propio
+# sha256; para nombres antiguos, el sha256 del nombre sin extensión.
+# Los archivos que todavía estén en la raíz de UPLOAD_FOLDER se siguen
+# encontrando; `flask migrar-uploads` los mueve a su subdirectorio.
+#
+# STORAGE_BACKEND elige la implementación (por ahora solo 'local'). Otro
+# backend (p. ej. uno compatible con S3) debe implementar StorageBackend.
+
+FAN_OUT_LEVELS = 2
+FAN_OUT_WIDTH = 2
+
+# <sha256><ext> o un derivado suyo: <sha256>__<variante>.jpg
+CONTENT_ADDRESSED_RE = re.compile(r'^([0-9a-f]{64})(?:__([a-z]+))?\.[A-Za-z0-9]+$')
+_VARIANT_SUFFIX_RE = re.compile(r'__[a-z]+$')
+
+
+def shard_key(name):
+    match = CONTENT_ADDRESSED_RE.match(name)
+    if match:
+        return match.group(1)
+    stem = _VARIANT_SUFFIX_RE.sub('', os.path.splitext(name)[0])
+    return hashlib.sha256(stem.encode('utf-8')).hexdigest()
+
+
+def shard_dirs(name):
+    key = shard_key(name)
+    return [key[i * FAN_OUT_WIDTH:(i + 1) * FAN_OUT_WIDTH] for i in range(FAN_OUT_LEVELS)]
+
+
+def _safe_name(name):
+    name = os.path.basename(name or '')
+    if not name or name.startswith('.'):
+        raise ValueError(f'Nombre de archivo inválido: {name!r}')
+    return name
+
+
+class StorageBackend:
+    # Ruta local legible del archivo. Un backend remoto la descargaría a una
+    # caché local; ReportLab y PIL necesitan un archivo en disco.
+    def local_path(self, name):
+        raise NotImplementedError
+
+    def exists(self, name):
+        raise NotImplementedError
+
+    # Guarda `temp_path` (un archivo local) como `name`. Si ya existía, se
+    # descarta el temporal. Devuelve True si el archivo es nuevo.
+    def save_file(self, name, temp_path):
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    # Respuesta de Flask que entrega el archivo (un backend remoto podría
+    # redirigir a una URL firmada)
+    def send(self, name, **kwargs):
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _sharded_path(self, name):
+        return os.path.join(self.root, *shard_dirs(name), name)
+
+    def _flat_path(self, name):
+        return os.path.join(self.root, name)
+
+    def local_path(self, name):
+        name = _safe_name(name)
+        path = self._sharded_path(name)
+        if not os.path.exists(path) and os.path.exists(self._flat_path(name)):
+            return self._flat_path(name)
+        return path
+
+    def exists(self, name):
+        return os.path.exists(self.local_path(name))
+
+    def save_file(self, name, temp_path):
+        name = _safe_name(name)
+        if self.exists(name):
+            os.remove(temp_path)
+            return False
+        target = self._sharded_path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+        return True
+
+    def delete(self, name):
+        try:
+            os.remove(self.local_path(name))
+        except FileNotFoundError:
+            pass
+
+    def send(self, name, **kwargs):
+        path = self.local_path(name)
+        return send_from_directory(os.path.dirname(path), os.path.basename(path), **kwargs)
+
+    # Mueve los archivos de la raíz a su subdirectorio. Devuelve cuántos movió.
+    def migrate_flat(self, dry_run=False):
+        moved = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_file() or entry.name.startswith('.'):
+                continue
+            target = self._sharded_path(entry.name)
+            if os.path.exists(target):
+                continue
+            if not dry_run:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(entry.path, target)
+            moved += 1
+        return moved
+
+
+BACKENDS = {
+    'local': lambda app: LocalStorage(app.config['UPLOAD_FOLDER']),
+}
+
+
+def storage():
+    app = current_app._get_current_object()
+    backend = app.extensions.get('storage')
+    if backend is None:
+        name = app.config.get('STORAGE_BACKEND', 'local')
+        if name not in BACKENDS:
+            raise RuntimeError(f'STORAGE_BACKEND desconocido: {name}')
+        backend = app.extensions['storage'] = BACKENDS[name](app)
+    return backend
+
+
+# Ruta local de un archivo a partir de su URL (/uploads/<nombre>)
+def path_for_url(url):
+    return storage().local_path(url.split('/')[-1])
@@ -0,0 +1,78 @@
+from app import create_app
+from models import db, User, Empresa, Cliente
+from PIL import Image as PILImage
+import os
+import pytest
+
+# Cada prueba usa una app nueva sobre un SQLite temporal, sin config.py.
+# QUERY_BUDGET_STRICT hace fallar la petición que se pase de su @query_budget.
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        None,
+        TESTING=True,
+        SECRET_KEY='pruebas',
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "pruebas.db"}',
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        PDF_CACHE_FOLDER=str(tmp_path / 'pdf_cache'),
+        QUERY_BUDGET_STRICT=True,
+    )
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Supervisor con empresa, un cliente y fotos para las zonas.
+# Devuelve un dict con supervisor_id, cliente_id y fotos (URLs /uploads/...).
+@pytest.fixture
+def datos(app):
+    user = User(nombre='Supervisor', email='supervisor@pruebas.local', rol='supervisor')
+    user.set_password('clave')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Empresa(user_id=user.id, nombre='Empresa', nit='900', telefono='300',
+                           correo='empresa@pruebas.local'))
+    cliente = Cliente(nit='800', nombre='Conjunto', administrador='Admin',
+                      correo='cliente@pruebas.local', tipo_codigo='AL')
+    db.session.add(cliente)
+    db.session.commit()
+    fotos = []
+    for i in range(3):
+        PILImage.new('RGB', (400, 300), (60 * i, 120, 80)).save(os.path.join(app.config['UPLOAD_FOLDER'], f'foto{i}.jpg'))
+        fotos.append(f'/uploads/foto{i}.jpg')
+    return {'supervisor_id': user.id, 'cliente_id': cliente.id, 'fotos': fotos}
+
+
+# crear_visita(fecha=..., zonas=...) crea una visita por la API (así se
+# mantienen el resumen de estadísticas y el índice de búsqueda) y devuelve su id
+@pytest.fixture
+def crear_visita(client, datos):
+    def crear(fecha='2024-03-01', zonas=None):
+        if zonas is None:
+            zonas = [{
+                'seccion': 'Aseo y Limpieza',
+                'concepto_actividad': f'Actividad {i}',
+                'calificacion': ('Buena', 'Media', 'Mala')[i % 3],
+                'observaciones': 'Sin novedad',
+                'foto_url': foto,
+            } for i, foto in enumerate(datos['fotos'])]
+        response = client.post('/visita', json={
+            'fecha': fecha,
+            'supervisor_id': datos['supervisor_id'],
+            'cliente_id': datos['cliente_id'],
+            'conclusiones': 'Visita de prueba',
+            'zonas': zonas,
+        })
+        assert response.status_code == 201, response.json
+        return response.json['id']
+    return crear
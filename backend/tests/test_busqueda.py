@@ -0,0 +1,22 @@
+from models import db
+from query_stats import count_queries
+from sqlalchemy import text
+import busqueda
+
+
+def _documentos():
+    return db.session.execute(text(
+        'SELECT visita_id, conclusiones, zonas FROM visitas_fts_docs ORDER BY visita_id')).all()
+
+
+def test_reconstruir_por_lotes(client, crear_visita):
+    ids = [crear_visita(fecha=f'2024-03-0{dia}') for dia in range(1, 6)]
+    incremental = _documentos()
+    assert [d.visita_id for d in incremental] == sorted(ids)
+
+    # 5 visitas en lotes de 2: borrar, recorrer y por lote zonas + escritura
+    with count_queries() as stats:
+        assert busqueda.reconstruir(lote=2) == 5
+    assert stats['count'] <= 2 + 3 * 2 + 1
+    assert _documentos() == incremental
+    assert len(client.get('/visitas/search?q=actividad').json) == 5
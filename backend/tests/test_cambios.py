@@ -0,0 +1,55 @@
+from cambios import purgar_eliminaciones, VISITAS
+from datetime import datetime, timedelta
+from models import db, Eliminacion
+from pagination import encode_cursor
+import cambios
+import pytest
+
+# Mientras otra transacción de escritura sigue abierta, el feed no avanza más
+# allá de su inicio: sus filas pueden aparecer después con un updated_at anterior.
+
+
+def test_no_pasa_una_transaccion_abierta(app, client, crear_visita, monkeypatch):
+    app.config['CAMBIOS_MARGEN'] = 0
+    abierta = datetime.utcnow() - timedelta(seconds=10)
+    monkeypatch.setattr(cambios, '_escritura_abierta_mas_antigua', lambda max_espera: abierta)
+    visita_id = crear_visita()
+
+    primera = client.get('/cambios').json
+    assert primera['visitas'] == [] and primera['zonas'] == []
+
+    # Terminó la transacción: con el mismo cursor llegan los cambios
+    monkeypatch.setattr(cambios, '_escritura_abierta_mas_antigua', lambda max_espera: None)
+    segunda = client.get('/cambios', query_string={'since': primera['cursor']}).json
+    assert [v['id'] for v in segunda['visitas']] == [visita_id]
+    assert len(segunda['zonas']) == 3
+
+
+@pytest.mark.parametrize('posiciones', [
+    {'visitas': ['2024-03-01T00:00:00', 5]},
+    {'zonas': ['2024-03-01T00:00:00', '5']},
+    {'clientes': ['2024-03-01T00:00:00', [1]]},
+    {'clientes': [20240301, 1]},
+    {'clientes': 'texto'},
+])
+def test_cursor_con_otro_tipo_de_id(client, posiciones):
+    response = client.get('/cambios', query_string={'since': encode_cursor(posiciones)})
+    assert response.status_code == 400
+
+
+def test_eliminaciones_purgadas(app, client, crear_visita):
+    app.config['CAMBIOS_MARGEN'] = 0
+    visita_id = crear_visita()
+    assert client.delete(f'/visita/{visita_id}').status_code == 200
+    # Una eliminación vieja y la recién registrada
+    db.session.add(Eliminacion(tabla=VISITAS, fila_id='AL-0', eliminado_en=datetime.utcnow() - timedelta(days=100)))
+    db.session.commit()
+    cursor = client.get('/cambios').json['cursor']
+
+    assert purgar_eliminaciones(90) == 1
+    assert [e.fila_id for e in Eliminacion.query.filter_by(tabla=VISITAS)] == [visita_id]
+    # El cursor reciente sigue sirviendo; uno anterior a la retención no
+    assert client.get('/cambios', query_string={'since': cursor}).status_code == 200
+    app.config['CAMBIOS_RETENCION_DIAS'] = 0
+    response = client.get('/cambios', query_string={'since': cursor})
+    assert response.status_code == 410
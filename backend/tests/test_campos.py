@@ -0,0 +1,36 @@
+import pytest
+
+# ?fields= elige los campos de la respuesta; un campo que el endpoint no
+# tiene es un 400 con la lista de los disponibles.
+
+
+def test_visitas_solo_los_campos_pedidos(client, crear_visita):
+    visita_id = crear_visita()
+    response = client.get('/visitas', query_string={'fields': 'id,cliente'})
+    assert response.status_code == 200
+    assert response.json == [{'id': visita_id, 'cliente': 'Conjunto'}]
+
+
+def test_visita_con_zonas(client, crear_visita):
+    visita_id = crear_visita()
+    response = client.get(f'/visita/{visita_id}', query_string={'fields': 'fecha,zonas,fecha'})
+    assert list(response.json) == ['fecha', 'zonas']
+    assert len(response.json['zonas']) == 3
+
+
+def test_sin_fields_devuelve_todo(client, datos):
+    cliente = client.get('/clientes').json[0]
+    assert set(cliente) == {'id', 'nit', 'nombre', 'administrador', 'correo', 'tipo_codigo'}
+    assert client.get('/usuarios', query_string={'fields': 'email'}).json == [{'email': 'supervisor@pruebas.local'}]
+
+
+@pytest.mark.parametrize('url', ['/visitas', '/clientes', '/usuarios', '/visita/AL-1'])
+def test_campo_desconocido(client, datos, url):
+    response = client.get(url, query_string={'fields': 'id,clave'})
+    assert response.status_code == 400
+    assert 'clave' in response.json['message']
+    assert 'disponibles' in response.json['message']
+
+
+def test_fields_vacio(client, datos):
+    assert client.get('/visitas', query_string={'fields': ' , '}).status_code == 400
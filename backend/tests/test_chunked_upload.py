@@ -0,0 +1,61 @@
+from chunked_upload import UploadError, append_chunk, create_session, _hashers, _meta_path, _part_path
+import hashlib
+import io
+import os
+import threading
+import time
+import pytest
+
+
+# Stream que entrega los datos en bloques pequeños y lentos, para que dos
+# peticiones se crucen
+class StreamLento(io.RawIOBase):
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        time.sleep(0.01)
+        return self._data.read(min(size, 1024) if size and size > 0 else 1024)
+
+
+def test_partes_concurrentes_mismo_offset(app):
+    data = os.urandom(20 * 1024)
+    upload_id = create_session('foto.jpg', len(data))['upload_id']
+    resultados = []
+
+    def enviar():
+        with app.app_context():
+            try:
+                resultados.append(append_chunk(upload_id, 0, StreamLento(data)))
+            except UploadError as e:
+                resultados.append(e)
+
+    hilos = [threading.Thread(target=enviar) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    completos = [r for r in resultados if isinstance(r, dict)]
+    errores = [r for r in resultados if isinstance(r, UploadError)]
+    assert len(completos) == 1 and completos[0]['complete']
+    assert len(errores) == 1 and errores[0].status in (404, 409)
+    assert completos[0]['filename'] == f'{hashlib.sha256(data).hexdigest()}.jpg'
+
+
+def test_sesiones_vencidas_liberan_el_hash(app):
+    upload_id = create_session('foto.jpg', 10)['upload_id']
+    append_chunk(upload_id, 0, io.BytesIO(b'12345'))
+    assert upload_id in _hashers
+
+    viejo = time.time() - 2 * 24 * 3600
+    for path in (_meta_path(upload_id), _part_path(upload_id)):
+        os.utime(path, (viejo, viejo))
+    create_session('otra.jpg', 10)
+    assert upload_id not in _hashers
+
+
+@pytest.mark.parametrize('sha256', [123, ['a'], 'no-es-un-hash'])
+def test_sha256_invalido(client, sha256):
+    response = client.post('/upload/sesiones', json={'filename': 'foto.jpg', 'size': 10, 'sha256': sha256})
+    assert response.status_code == 400
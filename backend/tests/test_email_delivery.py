@@ -0,0 +1,114 @@
+from aiosmtpd.controller import Controller
+from datetime import datetime
+from email_delivery import EmailQueue, ENVIADO, FALLIDO, PENDIENTE
+from models import db, Visita, EnvioInforme
+import flask_mail
+import socket
+import time
+import pytest
+
+# Envío de informes contra un servidor SMTP local (aiosmtpd). Cada prueba usa
+# una EmailQueue propia para no compartir el hilo entre apps.
+
+
+class Buzon:
+    def __init__(self):
+        self.mensajes = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.mensajes.append(envelope)
+        return '250 OK'
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(app):
+    buzon = Buzon()
+    controller = Controller(buzon, hostname='127.0.0.1', port=_puerto_libre())
+    controller.start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=controller.port, MAIL_USE_TLS=False,
+                      MAIL_SUPPRESS_SEND=False, MAIL_DEFAULT_SENDER='informes@pruebas.local')
+    yield buzon
+    controller.stop()
+
+
+# Registra cada intento de conexión SMTP
+@pytest.fixture
+def conexiones(monkeypatch):
+    intentos = []
+    original = flask_mail.Connection.configure_host
+
+    def configure_host(self):
+        intentos.append(time.monotonic())
+        return original(self)
+    monkeypatch.setattr(flask_mail.Connection, 'configure_host', configure_host)
+    return intentos
+
+
+def _pendiente(visita_id, **kwargs):
+    envio = EnvioInforme(visita_id=visita_id, destinatario='cliente@pruebas.local', estado=PENDIENTE, **kwargs)
+    db.session.add(envio)
+    db.session.commit()
+    return envio.id
+
+
+def test_envia_el_informe(smtp, crear_visita):
+    cola = EmailQueue()
+    envio = cola.enqueue(db.session.get(Visita, crear_visita()))
+    assert cola.wait(timeout=30)
+    db.session.expire_all()
+    assert db.session.get(EnvioInforme, envio.id).estado == ENVIADO
+    assert len(smtp.mensajes) == 1
+    assert smtp.mensajes[0].rcpt_tos == ['cliente@pruebas.local']
+
+
+def test_smtp_caido_espera_todo_el_lote(app, crear_visita, conexiones):
+    # Nadie escucha en el puerto: cada conexión falla al instante
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=_puerto_libre(), MAIL_USE_TLS=False,
+                      MAIL_SUPPRESS_SEND=False, MAIL_RETRY_BACKOFF=0.5, MAIL_MAX_RETRIES=1)
+    visita_id = crear_visita()
+    ids = [_pendiente(visita_id) for _ in range(3)]
+    cola = EmailQueue()
+    cola.resume()
+    assert cola.wait(timeout=30)
+    # Un intento por lote (el hilo puede tomar el primero solo) y después
+    # todos esperan el backoff en lugar de reconectar en seguida
+    inicio = conexiones[0]
+    assert len([t for t in conexiones if t - inicio < 0.4]) <= 2
+    db.session.expire_all()
+    for envio_id in ids:
+        envio = db.session.get(EnvioInforme, envio_id)
+        assert envio.estado == FALLIDO
+        assert envio.intentos <= 2
+
+
+def test_retoma_pendientes_al_arrancar(smtp, crear_visita):
+    visita_id = crear_visita()
+    # Pendientes de una ejecución anterior; el segundo lo tiene otro proceso
+    anterior = _pendiente(visita_id)
+    reclamado = _pendiente(visita_id, reclamado_en=datetime.utcnow())
+    cola = EmailQueue()
+    nuevo = cola.enqueue(db.session.get(Visita, visita_id))
+    assert cola.wait(timeout=30)
+    db.session.expire_all()
+    assert db.session.get(EnvioInforme, anterior).estado == ENVIADO
+    assert db.session.get(EnvioInforme, nuevo.id).estado == ENVIADO
+    assert db.session.get(EnvioInforme, reclamado).estado == PENDIENTE
+    assert len(smtp.mensajes) == 2
+
+
+def test_eliminar_visita_enviada(client, smtp, crear_visita):
+    visita_id = crear_visita()
+    cola = EmailQueue()
+    cola.enqueue(db.session.get(Visita, visita_id))
+    assert cola.wait(timeout=30)
+    response = client.delete(f'/visita/{visita_id}')
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Visita, visita_id) is None
+    assert EnvioInforme.query.filter_by(visita_id=visita_id).count() == 0
@@ -0,0 +1,64 @@
+from datetime import date
+from models import db, User, Zona, EstadisticaCalificacion
+import estadisticas
+
+# El resumen incremental debe coincidir con uno recalculado desde las zonas
+# después de cada escritura.
+
+AGRUPAR = '/estadisticas?agrupar=cliente,supervisor,seccion,mes'
+
+
+def _recalculado(client):
+    estadisticas.reconstruir()
+    return client.get(AGRUPAR).json
+
+
+def test_eliminar_zona(client, crear_visita):
+    visita_id = crear_visita()
+    crear_visita(fecha='2024-04-01')
+    zona = Zona.query.filter_by(visita_id=visita_id, calificacion='Mala').first()
+
+    assert client.delete(f'/zonas/{zona.id}').status_code == 200
+    incremental = client.get(AGRUPAR).json
+    assert sum(g['total'] for g in incremental) == 5
+    assert incremental == _recalculado(client)
+
+
+def test_modificar_zona(client, crear_visita):
+    visita_id = crear_visita()
+    zona = Zona.query.filter_by(visita_id=visita_id, calificacion='Buena').first()
+
+    response = client.put(f'/zonas/{zona.id}', json={
+        'seccion': zona.seccion, 'concepto_actividad': zona.concepto_actividad,
+        'observaciones': 'Cambió', 'calificacion': 'Mala', 'foto_url': zona.foto_url,
+    })
+    assert response.status_code == 200
+    incremental = client.get(AGRUPAR).json
+    assert [(g['Buena'], g['Mala']) for g in incremental] == [(0, 2)]
+    assert incremental == _recalculado(client)
+
+
+def test_no_quedan_filas_en_cero(client, crear_visita):
+    visita_id = crear_visita()
+    assert client.delete(f'/visita/{visita_id}').status_code == 200
+    assert EstadisticaCalificacion.query.count() == 0
+
+
+def test_eliminar_cliente_y_supervisor(client, datos):
+    # Filas de un resumen sin reconstruir, sin visitas detrás
+    otro = User(nombre='Otro', email='otro@pruebas.local', rol='supervisor')
+    otro.set_password('clave')
+    db.session.add(otro)
+    db.session.flush()
+    for supervisor_id in (datos['supervisor_id'], otro.id):
+        db.session.add(EstadisticaCalificacion(cliente_id=datos['cliente_id'], supervisor_id=supervisor_id,
+                                               seccion='Aseo y Limpieza', mes=date(2024, 3, 1),
+                                               calificacion='Buena', total=1))
+    db.session.commit()
+
+    with client.session_transaction() as sesion:
+        sesion['rol'] = 'admin'
+    assert client.delete(f'/usuarios/{otro.id}').status_code == 200
+    assert EstadisticaCalificacion.query.count() == 1
+    assert client.delete(f"/clientes/{datos['cliente_id']}").status_code == 200
+    assert EstadisticaCalificacion.query.count() == 0
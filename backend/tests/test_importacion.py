@@ -0,0 +1,17 @@
+from datetime import date
+import importacion
+
+# El CSV que se manda a COPY (PostgreSQL) distingue NULL de texto vacío:
+# NULL va como campo vacío sin comillas.
+
+
+def test_copy_csv_null_y_vacio():
+    rows = [
+        {'nit': '800', 'correo': None, 'telefono': '', 'fecha': date(2024, 3, 1)},
+        {'nit': 'a "b", c', 'correo': 'x@y.z', 'telefono': None, 'fecha': None},
+    ]
+    buffer = importacion._copy_csv(['nit', 'correo', 'telefono', 'fecha'], rows)
+    assert buffer.read().splitlines() == [
+        '"800",,"","2024-03-01"',
+        '"a ""b"", c","x@y.z",,',
+    ]
@@ -0,0 +1,62 @@
+from app import create_app
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from json_provider import OrjsonProvider
+import json
+import uuid
+import pytest
+
+pytest.importorskip('orjson')
+
+# OrjsonProvider debe dar el mismo JSON que el provider de Flask (salvo los
+# acentos, que van en UTF-8).
+
+DATOS = {
+    'fecha': date(2024, 3, 1),
+    'creado': datetime(2024, 3, 1, 14, 30, 5),
+    'con_zona': datetime(2024, 3, 1, 14, 30, 5, tzinfo=timezone.utc),
+    'total': Decimal('12.50'),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'observaciones': 'Señalización en buen estado',
+    'lista': [1, 2.5, None, True],
+}
+
+
+def test_igual_que_flask(app):
+    assert isinstance(app.json, OrjsonProvider)
+    esperado = DefaultJSONProvider(app).dumps(DATOS)
+    obtenido = app.json.dumps(DATOS)
+    assert json.loads(obtenido) == json.loads(esperado)
+    assert list(json.loads(obtenido)) == sorted(json.loads(esperado))
+    assert 'Señalización' in obtenido
+
+
+def test_claves_no_str(app):
+    # Mismo contenido; orjson ordena las claves ya convertidas a texto ("10" antes que "2")
+    datos = {2: 'b', 10: 'c', 1: 'a'}
+    assert json.loads(app.json.dumps(datos)) == json.loads(DefaultJSONProvider(app).dumps(datos))
+    assert app.json.dumps(datos) == '{"1":"a","10":"c","2":"b"}'
+
+
+def test_fechas_y_decimal(app):
+    datos = json.loads(app.json.dumps(DATOS))
+    # Mismo formato HTTP que Flask para las fechas; Decimal como texto
+    assert datos['fecha'] == 'Fri, 01 Mar 2024 00:00:00 GMT'
+    assert datos['creado'] == 'Fri, 01 Mar 2024 14:30:05 GMT'
+    assert datos['con_zona'] == 'Fri, 01 Mar 2024 14:30:05 GMT'
+    assert datos['total'] == '12.50'
+    assert datos['id'] == '12345678-1234-5678-1234-567812345678'
+
+
+def test_respuesta(app):
+    response = app.json.response(DATOS)
+    assert response.mimetype == 'application/json'
+    assert response.get_data().endswith(b'\n')
+    assert json.loads(response.get_data())['total'] == '12.50'
+
+
+def test_se_puede_desactivar(tmp_path):
+    app = create_app(None, TESTING=True, JSON_ORJSON=False,
+                     SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "pruebas.db"}')
+    assert not isinstance(app.json, OrjsonProvider)
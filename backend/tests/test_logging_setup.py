@@ -0,0 +1,10 @@
+from flask.logging import default_handler
+from logging_setup import init_logging
+
+
+# Las apps creadas después de la primera (pruebas, workers de pdf_jobs)
+# tampoco deben conservar el handler propio de Flask
+def test_sin_handler_de_flask_en_apps_posteriores(app):
+    app.logger.addHandler(default_handler)
+    init_logging(app)
+    assert default_handler not in app.logger.handlers
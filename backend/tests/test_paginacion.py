@@ -0,0 +1,64 @@
+from pagination import encode_cursor
+import pytest
+
+# Listados paginados por cursor: el cuerpo es la lista y la siguiente página
+# se anuncia en X-Next-Cursor.
+
+
+@pytest.fixture
+def visitas(crear_visita):
+    return [crear_visita(fecha=f'2024-03-{dia:02d}') for dia in (1, 2, 2, 3, 5)]
+
+
+def test_limit(client, visitas):
+    response = client.get('/visitas?limit=2')
+    assert response.status_code == 200
+    assert len(response.json) == 2
+    assert response.headers['X-Next-Cursor']
+    assert 'rel="next"' in response.headers['Link']
+
+    ultima = client.get('/visitas?limit=10')
+    assert len(ultima.json) == 5
+    assert 'X-Next-Cursor' not in ultima.headers
+
+    for limit in ('0', '-1', 'diez'):
+        assert client.get(f'/visitas?limit={limit}').status_code == 400
+
+
+def test_recorrer_con_el_cursor(client, visitas):
+    vistos = []
+    cursor = None
+    while True:
+        response = client.get('/visitas', query_string=dict(limit=2, cursor=cursor) if cursor else {'limit': 2})
+        assert response.status_code == 200
+        vistos += [(v['fecha'], v['id']) for v in response.json]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    # Todas, sin repetir, de la más reciente a la más antigua
+    assert sorted(v for _, v in vistos) == sorted(visitas)
+    assert vistos == sorted(vistos, reverse=True)
+
+
+@pytest.mark.parametrize('cursor', [
+    'no-es-base64!',
+    encode_cursor('texto'),
+    encode_cursor([1, 2, 3]),
+    encode_cursor([20240301, 'AL-1']),
+    encode_cursor(['no-es-fecha', 'AL-1']),
+])
+def test_cursor_invalido(client, visitas, cursor):
+    response = client.get('/visitas', query_string={'cursor': cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('cursor', [encode_cursor([-1]), encode_cursor(['5']), encode_cursor([1, 2])])
+def test_cursor_invalido_en_busqueda(client, visitas, cursor):
+    response = client.get('/visitas/search', query_string={'q': 'prueba', 'cursor': cursor})
+    assert response.status_code == 400
+
+
+def test_usuarios_por_rol(client, datos):
+    response = client.get('/usuarios?rol=supervisor&fields=id,nombre')
+    assert response.json == [{'id': datos['supervisor_id'], 'nombre': 'Supervisor'}]
+    assert client.get('/usuarios?rol=admin').json == []
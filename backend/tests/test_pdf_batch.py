@@ -0,0 +1,10 @@
+# La exportación por HTTP se hace en la misma petición: un lote más grande
+# que PDF_LOTE_MAX_VISITAS se rechaza antes de renderizar nada.
+
+
+def test_lote_demasiado_grande(app, client, crear_visita):
+    app.config['PDF_LOTE_MAX_VISITAS'] = 2
+    ids = [crear_visita(fecha=f'2024-03-0{dia}') for dia in (1, 2, 3)]
+    response = client.post('/generar-pdf/lote', json={'visita_ids': ids})
+    assert response.status_code == 413
+    assert 'exportar-informes' in response.json['message']
@@ -0,0 +1,76 @@
+from pdf_cache import PDFCache, pdf_cache
+from pdf_generator import generate_pdf
+import os
+import time
+
+# La caché vive en PDF_CACHE_FOLDER: una instancia nueva (otro worker) ve lo
+# mismo que la que escribió.
+
+
+def _pdf(tmp_path, nombre, size):
+    path = tmp_path / nombre
+    path.write_bytes(b'%PDF' + b'0' * (size - 4))
+    return str(path)
+
+
+def _clave(n):
+    return f'{n:064x}'
+
+
+def test_acierto_y_fallo(app, tmp_path):
+    cache = PDFCache()
+    assert cache.get(_clave(1)) is None
+    path = cache.put(_clave(1), _pdf(tmp_path, 'a.pdf', 100), 'AL-1', 1, 2)
+    assert cache.get(_clave(1)) == path
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    otro_worker = PDFCache()
+    assert otro_worker.get(_clave(1)) == path
+    assert otro_worker.stats()['entries'] == 1
+
+
+def test_expulsa_el_menos_usado(app, tmp_path):
+    app.config['PDF_CACHE_MAX_BYTES'] = 250
+    cache = PDFCache()
+    primero = cache.put(_clave(1), _pdf(tmp_path, 'a.pdf', 100), 'AL-1', 1, 2)
+    time.sleep(0.01)
+    segundo = cache.put(_clave(2), _pdf(tmp_path, 'b.pdf', 100), 'AL-2', 1, 2)
+    time.sleep(0.01)
+    assert PDFCache().get(_clave(1)) == primero  # el acierto lo vuelve reciente
+    time.sleep(0.01)
+    tercero = cache.put(_clave(3), _pdf(tmp_path, 'c.pdf', 100), 'AL-3', 1, 2)
+
+    assert not os.path.exists(segundo)
+    assert os.path.exists(primero) and os.path.exists(tercero)
+    assert cache.stats()['bytes'] == 200
+    assert cache.evictions == 1
+
+
+def test_invalidar_borra_los_archivos(app, tmp_path):
+    cache = PDFCache()
+    a = cache.put(_clave(1), _pdf(tmp_path, 'a.pdf', 10), 'AL-1', 1, 2)
+    b = cache.put(_clave(2), _pdf(tmp_path, 'b.pdf', 10), 'AL-2', 3, 2)
+    c = cache.put(_clave(3), _pdf(tmp_path, 'c.pdf', 10), 'AL-3', 3, 4)
+    assert PDFCache().invalidate(visita_id='AL-1') == 1
+    assert not os.path.exists(a)
+    assert PDFCache().invalidate(supervisor_id=2) == 1
+    assert not os.path.exists(b)
+    assert PDFCache().invalidate(cliente_id=3) == 1
+    assert not os.path.exists(c)
+
+
+def test_editar_y_eliminar_invalidan(client, crear_visita):
+    visita_id = crear_visita()
+    path = generate_pdf(visita_id)
+    assert generate_pdf(visita_id) == path
+
+    visita = client.get(f'/visita/{visita_id}').json
+    response = client.put(f'/visita/{visita_id}', json=dict(visita, conclusiones='Otra conclusión'))
+    assert response.status_code == 200
+    assert not os.path.exists(path)
+
+    nuevo = generate_pdf(visita_id)
+    assert nuevo != path
+    assert client.delete(f'/visita/{visita_id}').status_code == 200
+    assert not os.path.exists(nuevo)
+    assert pdf_cache.stats()['entries'] == 0
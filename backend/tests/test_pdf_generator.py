@@ -0,0 +1,50 @@
+from PIL import Image as PILImage
+from image_pipeline import VARIANTS, variant_path
+from pdf_generator import generate_pdf
+from pypdf import PdfReader
+import os
+import tracemalloc
+
+# El informe incrusta el derivado de impresión de cada foto (lado máximo
+# 600 px), nunca el original: la memoria del render depende del tamaño de
+# esos derivados y no del de las fotos subidas.
+
+LADO_PRINT = VARIANTS['print']['max_side']
+# ReportLab arma el PDF en memoria antes de escribirlo: ~4 veces lo incrustado
+FACTOR = 5
+BASE = 2 * 1024 * 1024
+
+
+def _visita_con_fotos(app, crear_visita, n):
+    zonas, originales = [], []
+    for i in range(n):
+        path = os.path.join(app.config['UPLOAD_FOLDER'], f'ruido{n}-{i}.jpg')
+        # Ruido ampliado: cada foto distinta y más grande que el derivado
+        PILImage.frombytes('RGB', (40, 30), os.urandom(40 * 30 * 3)) \
+            .resize((1000, 750), PILImage.BICUBIC).save(path, quality=85)
+        originales.append(path)
+        zonas.append({'seccion': 'Aseo y Limpieza', 'concepto_actividad': f'Zona {i}',
+                      'calificacion': 'Buena', 'foto_url': f'/uploads/{os.path.basename(path)}'})
+    return crear_visita(zonas=zonas), originales
+
+
+def _pico(visita_id, path):
+    tracemalloc.start()
+    try:
+        assert generate_pdf(visita_id, path, use_cache=False) == path
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_memoria_acotada_por_los_derivados(app, crear_visita, tmp_path):
+    for n in (5, 20):
+        visita_id, originales = _visita_con_fotos(app, crear_visita, n)
+        path = str(tmp_path / f'{n}.pdf')
+        pico = _pico(visita_id, path)
+        derivados = sum(os.path.getsize(variant_path(o, 'print')) for o in originales)
+        assert pico < FACTOR * derivados + BASE
+
+        imagenes = [img for page in PdfReader(path).pages for img in page.images]
+        assert len(imagenes) == n
+        assert all(max(img.image.size) <= LADO_PRINT for img in imagenes)
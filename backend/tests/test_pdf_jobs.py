@@ -0,0 +1,107 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from models import db, TrabajoPDF
+from pdf_jobs import pdf_jobs, PDFJobQueue, _guardar_progreso, PENDIENTE, PROCESANDO, COMPLETADO, FALLIDO
+import time
+import pytest
+
+# Trabajos de PDF: el estado está en la base, así que otro worker (aquí otra
+# PDFJobQueue) responde lo mismo que el que encoló el trabajo.
+
+
+@pytest.fixture
+def cola(app):
+    yield pdf_jobs
+    pdf_jobs.shutdown()
+
+
+def _esperar(client, trabajo_id, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        db.session.expire_all()
+        status = client.get(f'/generar-pdf/jobs/{trabajo_id}').json
+        if status['status'] in (COMPLETADO, FALLIDO):
+            return status
+        time.sleep(0.2)
+    raise AssertionError('El trabajo no terminó')
+
+
+def test_encolar_consultar_y_descargar(client, crear_visita, cola):
+    response = client.post('/generar-pdf/jobs', json={'visita_id': crear_visita()})
+    assert response.status_code == 202
+    assert response.json['status'] in (PENDIENTE, PROCESANDO)
+    assert 'progress' in response.json
+    trabajo_id = response.json['id']
+    assert response.headers['Location'] == f'/generar-pdf/jobs/{trabajo_id}'
+
+    status = _esperar(client, trabajo_id)
+    assert status['status'] == COMPLETADO
+    assert status['progress'] == 100
+    assert PDFJobQueue().status(trabajo_id) == status
+
+    descarga = client.get(status['download_url'])
+    assert descarga.status_code == 200
+    assert descarga.data.startswith(b'%PDF')
+
+
+def test_cola_llena(app, client, crear_visita):
+    app.config['PDF_JOB_QUEUE_SIZE'] = 1
+    visita_id = crear_visita()
+    # Un trabajo en curso encolado por otro worker
+    db.session.add(TrabajoPDF(id='otro', visita_id=visita_id, estado=PROCESANDO))
+    db.session.commit()
+    response = client.post('/generar-pdf/jobs', json={'visita_id': visita_id})
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+
+
+def test_progreso_lo_escribe_el_worker(app, crear_visita):
+    db.session.add(TrabajoPDF(id='t1', visita_id=crear_visita(), estado=PENDIENTE))
+    db.session.commit()
+    guardar = _guardar_progreso('t1')
+    guardar(30)
+    guardar(32)  # menos de PASO_PROGRESO: no se escribe
+    db.session.expire_all()
+    trabajo = db.session.get(TrabajoPDF, 't1')
+    assert (trabajo.estado, trabajo.progreso) == (PROCESANDO, 30)
+
+
+class _Pool:
+    cerrado = False
+
+    def shutdown(self, wait=True):
+        self.cerrado = True
+
+
+def _fallar(app, crear_visita, error):
+    db.session.add(TrabajoPDF(id='t1', visita_id=crear_visita(), estado=PROCESANDO))
+    db.session.commit()
+    cola = PDFJobQueue()
+    cola._app = app
+    cola._executor = pool = _Pool()
+    future = Future()
+    future.set_exception(error)
+    cola._finish(('t1', 'clave', 'v', 1, 1), pool, future)
+    db.session.expire_all()
+    return cola, pool, cola.status('t1')
+
+
+def test_error_del_render(app, crear_visita):
+    cola, pool, status = _fallar(app, crear_visita, RuntimeError('sin fotos'))
+    assert (status['status'], status['error']) == (FALLIDO, 'sin fotos')
+    assert cola._executor is pool
+
+
+def test_pool_roto_se_recrea(app, crear_visita):
+    cola, pool, status = _fallar(app, crear_visita, BrokenProcessPool('murió un proceso'))
+    assert status['status'] == FALLIDO
+    assert cola._executor is None and pool.cerrado
+
+
+def test_trabajo_abandonado_vence(app, crear_visita):
+    app.config['PDF_JOB_TIMEOUT'] = 60
+    db.session.add(TrabajoPDF(id='t1', visita_id=crear_visita(), estado=PENDIENTE,
+                              creado_en=datetime.utcnow() - timedelta(seconds=120)))
+    db.session.commit()
+    assert PDFJobQueue().status('t1')['status'] == FALLIDO
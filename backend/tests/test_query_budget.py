@@ -0,0 +1,50 @@
+from query_stats import QueryBudgetExceeded
+import pytest
+
+# Presupuestos de consultas de las rutas de lectura: el número de consultas
+# no debe crecer con la cantidad de visitas ni de zonas (N+1).
+
+
+def _consultas(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return int(response.headers['X-Query-Count'])
+
+
+@pytest.mark.parametrize('n_visitas', [1, 5])
+def test_visitas(client, crear_visita, n_visitas):
+    for i in range(n_visitas):
+        crear_visita(fecha=f'2024-03-{i + 1:02d}')
+    response = client.get('/visitas')
+    assert len(response.json) == n_visitas
+    assert _consultas(response) == 1
+
+
+def test_visita(client, crear_visita):
+    visita_id = crear_visita()
+    response = client.get(f'/visita/{visita_id}')
+    assert len(response.json['zonas']) == 3
+    assert _consultas(response) == 2
+
+
+def test_generar_pdf(client, crear_visita):
+    visita_id = crear_visita()
+    assert _consultas(client.post(f'/generar-pdf/{visita_id}')) <= 4
+
+
+@pytest.mark.parametrize('agrupar', ['cliente', 'supervisor,seccion,mes'])
+def test_estadisticas(client, crear_visita, agrupar):
+    for i in range(3):
+        crear_visita(fecha=f'2024-0{i + 1}-10')
+    response = client.get(f'/estadisticas?agrupar={agrupar}')
+    assert sum(g['total'] for g in response.json) == 9
+    assert _consultas(response) == 1
+
+
+def test_presupuesto_excedido(app, client, crear_visita):
+    visita_id = crear_visita()
+    app.view_functions['routes.get_visita'].query_budget = 1
+    try:
+        with pytest.raises(QueryBudgetExceeded):
+            client.get(f'/visita/{visita_id}')
+    finally:
+        app.view_functions['routes.get_visita'].query_budget = 2
@@ -0,0 +1,36 @@
+from models import db, Empresa
+from PIL import Image as PILImage
+from render_context import render_context
+from pypdf import PdfReader
+import io
+import os
+
+
+def _logo(path, color):
+    PILImage.new('RGB', (300, 300), color).save(path)
+    return path
+
+
+def test_logo_se_decodifica_una_vez_por_version(tmp_path):
+    path = _logo(str(tmp_path / 'logo.jpg'), 'red')
+    reader = render_context.logo(path)
+    assert render_context.logo(path) is reader
+    assert reader._data is not None  # píxeles ya decodificados
+
+    # Cada uso lee el JPEG desde su propia copia
+    assert reader.jpeg_fh() is not reader.jpeg_fh()
+
+    _logo(path, 'blue')
+    os.utime(path, (1, 1))  # otra versión del archivo
+    assert render_context.logo(path) is not reader
+
+
+def test_pdf_con_logo_cacheado(app, client, datos, crear_visita):
+    _logo(os.path.join(app.config['UPLOAD_FOLDER'], 'logo.jpg'), 'green')
+    Empresa.query.update({'logo_url': '/uploads/logo.jpg'})
+    db.session.commit()
+    for _ in range(2):
+        visita_id = crear_visita()
+        response = client.post(f'/generar-pdf/{visita_id}')
+        assert response.status_code == 200
+        assert len(PdfReader(io.BytesIO(response.data)).pages) >= 1
@@ -0,0 +1,32 @@
+from datetime import datetime
+from models import db, Visita
+import sincronizacion
+
+
+# Simula otra petición que tomó el mismo id entre la consulta y el INSERT
+def test_crear_visita_reintenta_id_ocupado(client, crear_visita, monkeypatch):
+    ocupado = crear_visita()
+    original = sincronizacion.nuevos_ids_visita
+    llamadas = []
+
+    def nuevos_ids_visita(claves, ahora=None):
+        llamadas.append(claves)
+        return [ocupado] if len(llamadas) == 1 else original(claves, ahora)
+    monkeypatch.setattr(sincronizacion, 'nuevos_ids_visita', nuevos_ids_visita)
+
+    nuevo = crear_visita()
+    assert nuevo != ocupado
+    assert len(llamadas) == 2
+    assert db.session.query(Visita).count() == 2
+
+
+def test_prefijo_sin_comodines(app, datos):
+    ahora = datetime(2024, 3, 1, 12, 0)
+    fecha = datetime(2024, 3, 1)
+    # 'AB' coincidiría con un _ sin escapar
+    db.session.add(Visita(id=sincronizacion.nuevos_ids_visita([(fecha, 'AB')], ahora)[0], fecha=fecha,
+                          supervisor_id=datos['supervisor_id'], cliente_id=datos['cliente_id']))
+    db.session.commit()
+    base = '01032024-A_-1200'
+    assert Visita.query.filter(Visita.id.like(sincronizacion._prefijo(base), escape='\\')).count() == 0
+    assert sincronizacion.nuevos_ids_visita([(fecha, 'A_'), (fecha, 'A%')], ahora) == [base, '01032024-A%-1200']
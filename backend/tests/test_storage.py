@@ -0,0 +1,72 @@
+from chunked_upload import save_stream
+from storage import LocalStorage, shard_dirs
+import hashlib
+import io
+import os
+import pytest
+
+# Los archivos subidos se reparten en subdirectorios según un hash; los que
+# siguen en la raíz (anteriores al reparto) se encuentran igual.
+
+
+def _escribir(path, data=b'datos'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_subdirectorios(tmp_path):
+    digest = hashlib.sha256(b'foto').hexdigest()
+    assert shard_dirs(f'{digest}.jpg') == [digest[:2], digest[2:4]]
+    # Los derivados quedan junto a su original
+    assert shard_dirs(f'{digest}__web.jpg') == shard_dirs(f'{digest}.jpg')
+    # Nombres antiguos: hash del nombre sin extensión ni sufijo de variante
+    antiguo = hashlib.sha256(b'logo_cliente').hexdigest()
+    assert shard_dirs('logo_cliente.png') == [antiguo[:2], antiguo[2:4]]
+    assert shard_dirs('logo_cliente__thumb.jpg') == shard_dirs('logo_cliente.png')
+
+    backend = LocalStorage(tmp_path)
+    assert backend.local_path(f'{digest}.jpg') == os.path.join(tmp_path, digest[:2], digest[2:4], f'{digest}.jpg')
+
+
+def test_lee_archivos_en_la_raiz(tmp_path):
+    backend = LocalStorage(tmp_path)
+    _escribir(os.path.join(tmp_path, 'viejo.jpg'), b'plano')
+    assert backend.exists('viejo.jpg')
+    assert backend.local_path('viejo.jpg') == os.path.join(tmp_path, 'viejo.jpg')
+    with open(backend.local_path('viejo.jpg'), 'rb') as f:
+        assert f.read() == b'plano'
+
+
+def test_migrar_es_idempotente(tmp_path):
+    backend = LocalStorage(tmp_path)
+    for nombre in ('a.jpg', 'b.png'):
+        _escribir(os.path.join(tmp_path, nombre), nombre.encode())
+    _escribir(os.path.join(tmp_path, '.tmp-123'))  # temporales: no se tocan
+
+    assert backend.migrate_flat(dry_run=True) == 2
+    assert os.path.exists(os.path.join(tmp_path, 'a.jpg'))
+    assert backend.migrate_flat() == 2
+    assert backend.migrate_flat() == 0
+    for nombre in ('a.jpg', 'b.png'):
+        assert not os.path.exists(os.path.join(tmp_path, nombre))
+        with open(backend.local_path(nombre), 'rb') as f:
+            assert f.read() == nombre.encode()
+    assert os.path.exists(os.path.join(tmp_path, '.tmp-123'))
+
+
+class StreamRoto(io.RawIOBase):
+    def __init__(self):
+        self._leidos = 0
+
+    def read(self, size=-1):
+        if self._leidos:
+            raise OSError('conexión cerrada')
+        self._leidos += 1
+        return b'x' * 1024
+
+
+def test_subida_cortada_no_deja_temporales(app):
+    with pytest.raises(OSError):
+        save_stream(StreamRoto(), 'foto.jpg')
+    assert [n for n in os.listdir(app.config['UPLOAD_FOLDER']) if n.startswith('.tmp-')] == []
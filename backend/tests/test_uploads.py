@@ -0,0 +1,66 @@
+from PIL import Image as PILImage
+import io
+import pytest
+
+# /uploads/<nombre>: los archivos direccionados por contenido se cachean para
+# siempre; los de nombre libre se revalidan con el ETag. Los dos aceptan Range.
+
+
+def _subir(client, img, formato, nombre):
+    buffer = io.BytesIO()
+    img.save(buffer, formato)
+    buffer.seek(0)
+    response = client.post('/upload', data={'file': (buffer, nombre)}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.json['url']
+
+
+@pytest.fixture
+def foto(client):
+    return _subir(client, PILImage.new('RGB', (300, 200), (200, 30, 30)), 'JPEG', 'foto.jpg')
+
+
+def test_etag_y_304(client, foto):
+    response = client.get(foto)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get(foto, headers={'If-None-Match': etag}).status_code == 304
+    # Cada variante tiene su propio ETag
+    original = client.get(foto, query_string={'variant': 'original'})
+    assert original.headers['ETag'] != etag
+
+
+def test_range(client, foto):
+    completo = client.get(foto, query_string={'variant': 'original'}).data
+    response = client.get(foto, query_string={'variant': 'original'}, headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.data == completo[10:20]
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(completo)}'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_nombre_antiguo_se_revalida(client, datos):
+    url = datos['fotos'][0]
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'no-cache' in response.headers['Cache-Control']
+    assert 'immutable' not in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_png_con_transparencia(client):
+    logo = PILImage.new('RGBA', (120, 80), (0, 0, 0, 0))
+    logo.paste((20, 90, 200, 255), (30, 20, 90, 60))
+    url = _subir(client, logo, 'PNG', 'logo.png')
+
+    response = client.get(url)
+    assert response.mimetype == 'image/png'
+    web = PILImage.open(io.BytesIO(response.data))
+    assert web.mode == 'RGBA'
+    assert web.getpixel((0, 0))[3] == 0
+    assert web.getpixel((60, 40)) == (20, 90, 200, 255)
+    # La miniatura sigue siendo JPEG (sobre fondo blanco)
+    thumb = client.get(url, query_string={'variant': 'thumb'})
+    assert thumb.mimetype == 'image/jpeg'
@@ -0,0 +1,49 @@
+from models import db, Zona
+import pytest
+
+# PUT /visita/<id> compara las zonas que llegan con las de la base: conserva
+# los ids de las que siguen, inserta las nuevas y elimina las que no vienen.
+
+
+def _editar(client, visita_id, zonas):
+    visita = client.get(f'/visita/{visita_id}').json
+    return client.put(f'/visita/{visita_id}', json=dict(visita, zonas=zonas))
+
+
+def test_agregar_editar_y_quitar_en_un_put(client, crear_visita):
+    visita_id = crear_visita()
+    zonas = client.get(f'/visita/{visita_id}').json['zonas']
+    sigue, editada, quitada = zonas
+    editada = dict(editada, calificacion='Buena', observaciones='Corregida')
+    nueva = {'seccion': 'Colaborador', 'concepto_actividad': 'Nueva', 'calificacion': 'Media'}
+
+    response = _editar(client, visita_id, [sigue, editada, nueva])
+    assert response.status_code == 200
+    assert response.json['zonas'] == {'insertadas': 1, 'actualizadas': 1, 'eliminadas': 1}
+
+    db.session.expire_all()
+    guardadas = {z.id: z for z in Zona.query.filter_by(visita_id=visita_id)}
+    assert len(guardadas) == 3
+    # SQLite puede reutilizar el id de la eliminada para la nueva
+    assert quitada['concepto_actividad'] not in [z.concepto_actividad for z in guardadas.values()]
+    assert guardadas[sigue['id']].observaciones == sigue['observaciones']
+    assert guardadas[editada['id']].observaciones == 'Corregida'
+    assert [z.concepto_actividad for z in guardadas.values() if z.id not in (sigue['id'], editada['id'])] == ['Nueva']
+
+
+@pytest.mark.parametrize('zona_id', [[1], {'id': 1}, '1', 1.5, True])
+def test_id_invalido(client, crear_visita, zona_id):
+    visita_id = crear_visita()
+    zonas = client.get(f'/visita/{visita_id}').json['zonas']
+    zonas[0]['id'] = zona_id
+    response = _editar(client, visita_id, zonas)
+    assert response.status_code == 400
+    # No se tocó nada
+    db.session.expire_all()
+    assert Zona.query.filter_by(visita_id=visita_id).count() == 3
+
+
+@pytest.mark.parametrize('zonas', [{'id': 1}, ['zona'], [{'id': None, 'seccion': 'Colaborador'}]])
+def test_zonas_mal_formadas(client, crear_visita, zonas):
+    visita_id = crear_visita()
+    assert _editar(client, visita_id, zonas).status_code == 400
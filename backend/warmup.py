@@ -0,0 +1,42 @@
+from models import db
+from render_context import render_context, SECCION_COLORS
+from db_pool import pool_size
+from reportlab.pdfbase import pdfmetrics
+from sqlalchemy import text
+import logging
+import time
+
+# Preparación de un proceso antes de que reciba tráfico (gunicorn lo llama
+# desde post_worker_init): abre las conexiones del pool y carga los recursos
+# del render de PDFs, para que las primeras peticiones no paguen ese costo.
+# DB_POOL_WARM indica cuántas conexiones abrir (por defecto DB_POOL_SIZE).
+
+FONTS = ('Helvetica', 'Helvetica-Bold')
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(app):
+    start = time.perf_counter()
+    with app.app_context():
+        count = app.config.get('DB_POOL_WARM', pool_size(app))
+        connections = []
+        try:
+            # Se piden todas a la vez para que el pool las abra y no reutilice la misma
+            for _ in range(count):
+                connection = db.engine.connect()
+                connections.append(connection)
+                connection.execute(text('SELECT 1'))
+        except Exception as e:
+            logger.warning('No se pudieron abrir las conexiones de la base: %s', e)
+        finally:
+            for connection in connections:
+                connection.close()
+
+        render_context.styles
+        for seccion in SECCION_COLORS:
+            render_context.seccion_style(seccion)
+        for font in FONTS:
+            pdfmetrics.getFont(font)
+    logger.info('Proceso listo en %.0f ms (%s conexiones abiertas)',
+                (time.perf_counter() - start) * 1000, len(connections))
@@ -0,0 +1,4 @@
+from app import create_app
+
+# Punto de entrada para servidores WSGI (gunicorn wsgi:app)
+app = create_app()
@@ -0,0 +1,80 @@
+from models import db, Zona
+from cambios import registrar_eliminaciones, ZONAS
+from sqlalchemy import insert, update
+
+# Escritura de zonas en bloque.
+# Al actualizar una visita se compara lo que llega con lo que hay en la base
+# y solo se insertan, actualizan o eliminan las zonas que cambiaron, de modo
+# que el trabajo (y los bloqueos sobre zonas) es proporcional a la edición.
+
+ZONA_FIELDS = ('seccion', 'concepto_actividad', 'calificacion', 'observaciones', 'foto_url')
+
+
+class ZonaInvalidaError(Exception):
+    pass
+
+
+# Cada zona es un objeto y su id, si viene, un entero (los ids de zonas son
+# numéricos); cualquier otra cosa es un error del cliente, no un 500
+def _validar(zonas_data):
+    if not isinstance(zonas_data, list):
+        raise ZonaInvalidaError('zonas debe ser una lista')
+    for i, zona_data in enumerate(zonas_data):
+        if not isinstance(zona_data, dict):
+            raise ZonaInvalidaError(f'Zona {i}: debe ser un objeto')
+        zona_id = zona_data.get('id')
+        if zona_id is not None and type(zona_id) is not int:
+            raise ZonaInvalidaError(f'Zona {i}: id inválido ({zona_id!r})')
+        faltantes = [f for f in ('seccion', 'concepto_actividad', 'calificacion') if f not in zona_data]
+        if faltantes:
+            raise ZonaInvalidaError(f'Zona {i}: faltan {", ".join(faltantes)}')
+
+
+def zona_values(zona_data):
+    return {
+        'seccion': zona_data['seccion'],
+        'concepto_actividad': zona_data['concepto_actividad'],
+        'calificacion': zona_data['calificacion'],
+        'observaciones': zona_data.get('observaciones', ''),
+        'foto_url': zona_data.get('foto_url', ''),
+    }
+
+
+def bulk_insert_zonas(visita_id, zonas_data):
+    rows = [dict(zona_values(z), visita_id=visita_id) for z in zonas_data]
+    if rows:
+        db.session.execute(insert(Zona), rows)
+    return len(rows)
+
+
+# Las zonas que llegan con un id de esta visita se actualizan si cambió algo;
+# las que no traen id (o traen uno ajeno) se insertan, y las que ya no vienen
+# se eliminan. Devuelve cuántas filas se insertaron, actualizaron y eliminaron.
+# Lanza ZonaInvalidaError (antes de escribir nada) si una zona no tiene la forma esperada.
+def sync_zonas(visita_id, zonas_data):
+    _validar(zonas_data)
+    existentes = {z.id: z for z in Zona.query.filter_by(visita_id=visita_id).all()}
+
+    nuevas = []
+    cambios = []
+    vistas = set()
+    for zona_data in zonas_data:
+        zona_id = zona_data.get('id')
+        actual = existentes.get(zona_id)
+        if actual is None or zona_id in vistas:
+            nuevas.append(zona_data)
+            continue
+        vistas.add(zona_id)
+        values = zona_values(zona_data)
+        if any(getattr(actual, field) != values[field] for field in ZONA_FIELDS):
+            cambios.append(dict(values, id=zona_id))
+
+    eliminadas = [zona_id for zona_id in existentes if zona_id not in vistas]
+
+    if eliminadas:
+        Zona.query.filter(Zona.id.in_(eliminadas)).delete(synchronize_session=False)
+        registrar_eliminaciones(ZONAS, eliminadas)
+    if cambios:
+        db.session.execute(update(Zona), cambios)
+    bulk_insert_zonas(visita_id, nuevas)
+    return {'insertadas': len(nuevas), 'actualizadas': len(cambios), 'eliminadas': len(eliminadas)}
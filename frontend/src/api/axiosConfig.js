@@ -6,4 +6,12 @@ axios.defaults.withCredentials = true;
 // Configurar la URL base
 axios.defaults.baseURL = 'http://localhost:5000';
 
+// Los listados vienen paginados: la siguiente página se anuncia en la
+// cabecera X-Next-Cursor. getPage pide una página y devuelve sus filas y el
+// cursor de la siguiente (null si no hay más), para un botón "Cargar más".
+export const getPage = async (url, params = {}, cursor = null) => {
+  const res = await axios.get(url, { params: cursor ? { ...params, cursor } : params });
+  return { items: res.data, cursor: res.headers['x-next-cursor'] || null };
+};
+
 export default axios;
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Container, Typography, List, ListItem, ListItemText, Button, Box, Grid, Paper, Card, CardContent, CardActions, IconButton, ListItemSecondaryAction } from '@mui/material';
 import { useNavigate } from 'react-router-dom';
-import axios from '../api/axiosConfig';
+import axios, { getPage } from '../api/axiosConfig';
 import Navbar from '../components/Navbar';
 import AddIcon from '@mui/icons-material/Add';
 import BusinessIcon from '@mui/icons-material/Business';
@@ -9,10 +9,32 @@ import SupervisorAccountIcon from '@mui/icons-material/SupervisorAccount';
 import AssignmentIcon from '@mui/icons-material/Assignment';
 import { Download, Visibility, Delete } from '@mui/icons-material';
 
+const PAGE_SIZE = 20;
+
 const Dashboard = () => {
   const [visitas, setVisitas] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [resumen, setResumen] = useState(null);
   const navigate = useNavigate();
 
+  // Una página de visitas; con `siguiente` se agrega la página que sigue
+  const loadVisitas = async (siguiente = null) => {
+    const page = await getPage('/visitas', { limit: PAGE_SIZE, fields: 'id,fecha,cliente,supervisor' }, siguiente);
+    setVisitas(prev => (siguiente ? [...prev, ...page.items] : page.items));
+    setCursor(page.cursor);
+  };
+
+  // Totales de calificaciones desde el resumen de /estadisticas, sin recorrer las visitas
+  const loadResumen = async () => {
+    const res = await axios.get('/estadisticas', { params: { agrupar: 'cliente' } });
+    setResumen(res.data.reduce((acc, g) => ({
+      Buena: acc.Buena + g.Buena,
+      Media: acc.Media + g.Media,
+      Mala: acc.Mala + g.Mala,
+      total: acc.total + g.total,
+    }), { Buena: 0, Media: 0, Mala: 0, total: 0 }));
+  };
+
   const handleDownloadPDF = async (visitaId) => {
     try {
       const response = await axios.post(`/generar-pdf/${visitaId}`, {}, {
@@ -39,8 +61,7 @@ const Dashboard = () => {
         await axios.delete(`/visita/${visitaId}`);
         alert('Visita eliminada exitosamente');
         // Recargar la lista de visitas
-        const res = await axios.get('/visitas');
-        setVisitas(res.data);
+        await Promise.all([loadVisitas(), loadResumen()]);
       } catch (error) {
         console.error('Error al eliminar visita:', error);
         alert('Error al eliminar la visita');
@@ -51,8 +72,7 @@ const Dashboard = () => {
   useEffect(() => {
     const fetchVisitas = async () => {
       try {
-        const res = await axios.get('/visitas');
-        setVisitas(res.data);
+        await Promise.all([loadVisitas(), loadResumen()]);
       } catch (err) {
         console.error('Error fetching visitas:', err);
       }
@@ -169,9 +189,14 @@ const Dashboard = () => {
 
           {/* Lista de visitas recientes */}
           <Paper elevation={2} sx={{ p: 3 }}>
-            <Typography variant="h5" sx={{ mb: 3, fontWeight: 600 }}>
+            <Typography variant="h5" sx={{ mb: 1, fontWeight: 600 }}>
               Visitas Recientes
             </Typography>
+            {resumen && (
+              <Typography variant="body2" color="text.secondary" sx={{ mb: 3 }}>
+                {`Zonas calificadas: ${resumen.total} (Buena ${resumen.Buena} · Media ${resumen.Media} · Mala ${resumen.Mala})`}
+              </Typography>
+            )}
             {visitas.length > 0 ? (
               <List>
         {visitas.map((v) => (
@@ -232,6 +257,16 @@ const Dashboard = () => {
                 </Button>
               </Box>
             )}
+            {cursor && (
+              <Box sx={{ textAlign: 'center', mt: 2 }}>
+                <Button
+                  variant="outlined"
+                  onClick={() => loadVisitas(cursor).catch(err => console.error('Error fetching visitas:', err))}
+                >
+                  Cargar más
+                </Button>
+              </Box>
+            )}
           </Paper>
         </Box>
       </Container>
@@ -21,7 +21,7 @@ const Login = () => {
       localStorage.setItem('rol', res.data.rol);
       
       // Obtener información del usuario
-      const usersRes = await axios.get('/usuarios');
+      const usersRes = await axios.get('/usuarios', { params: { email } });
       const currentUser = usersRes.data.find(u => u.email === email);
       if (currentUser) {
         localStorage.setItem('userName', currentUser.nombre);
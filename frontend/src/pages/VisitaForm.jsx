@@ -18,19 +18,29 @@ import {
   Divider
 } from '@mui/material';
 import { useNavigate, useParams } from 'react-router-dom';
-import axios from '../api/axiosConfig';
+import axios, { getPage } from '../api/axiosConfig';
 import Navbar from '../components/Navbar';
 import ImageUpload from '../components/ImageUpload';
 import AddIcon from '@mui/icons-material/Add';
 import DeleteIcon from '@mui/icons-material/Delete';
 import AssignmentIcon from '@mui/icons-material/Assignment';
 
+// Agrega a la lista el elemento seleccionado si todavía no se cargó su página
+const conActual = (lista, actual) => (
+  actual && !lista.some(item => item.id === actual.id) ? [actual, ...lista] : lista
+);
+
 const VisitaForm = () => {
   const { id } = useParams();
   const navigate = useNavigate();
   const [loading, setLoading] = useState(false);
   const [clientes, setClientes] = useState([]);
   const [supervisores, setSupervisores] = useState([]);
+  // Cursores de la siguiente página de cada lista (null si no hay más)
+  const [clientesCursor, setClientesCursor] = useState(null);
+  const [supervisoresCursor, setSupervisoresCursor] = useState(null);
+  // Cliente y supervisor de la visita que se edita, por si no están en las páginas cargadas
+  const [actuales, setActuales] = useState({ cliente: null, supervisor: null });
   
   const [form, setForm] = useState({
     cliente_id: '',
@@ -53,20 +63,21 @@ const VisitaForm = () => {
     }
   }, [id]);
 
-  const loadClientes = async () => {
+  const loadClientes = async (cursor = null) => {
     try {
-      const response = await axios.get('/clientes');
-      setClientes(response.data);
+      const page = await getPage('/clientes', { fields: 'id,nombre' }, cursor);
+      setClientes(prev => (cursor ? [...prev, ...page.items] : page.items));
+      setClientesCursor(page.cursor);
     } catch (err) {
       console.error('Error cargando clientes:', err);
     }
   };
 
-  const loadSupervisores = async () => {
+  const loadSupervisores = async (cursor = null) => {
     try {
-      const response = await axios.get('/usuarios');
-      const supervisoresData = response.data.filter(user => user.rol === 'supervisor');
-      setSupervisores(supervisoresData);
+      const page = await getPage('/usuarios', { rol: 'supervisor', fields: 'id,nombre' }, cursor);
+      setSupervisores(prev => (cursor ? [...prev, ...page.items] : page.items));
+      setSupervisoresCursor(page.cursor);
     } catch (err) {
       console.error('Error cargando supervisores:', err);
     }
@@ -82,6 +93,10 @@ const VisitaForm = () => {
         fecha: visita.fecha,
         conclusiones: visita.conclusiones || ''
       });
+      setActuales({
+        cliente: { id: visita.cliente_id, nombre: visita.cliente.nombre },
+        supervisor: { id: visita.supervisor_id, nombre: visita.supervisor.nombre }
+      });
       // Cargar zonas por sección
       const zonasData = { aseo: [], seguridad: [], colaborador: [] };
       visita.zonas.forEach(zona => {
@@ -261,13 +276,18 @@ const VisitaForm = () => {
             value={form.cliente_id}
             onChange={(e) => setForm({ ...form, cliente_id: e.target.value })}
                   >
-                    {clientes.map(cliente => (
+                    {conActual(clientes, actuales.cliente).map(cliente => (
                       <MenuItem key={cliente.id} value={cliente.id}>
                         {cliente.nombre}
                       </MenuItem>
                     ))}
           </Select>
         </FormControl>
+                {clientesCursor && (
+                  <Button size="small" onClick={() => loadClientes(clientesCursor)} sx={{ mt: 1 }}>
+                    Cargar más clientes
+                  </Button>
+                )}
               </Grid>
               <Grid size={{ xs: 12, md: 4 }}>
                 <FormControl fullWidth>
@@ -276,13 +296,18 @@ const VisitaForm = () => {
             value={form.supervisor_id}
             onChange={(e) => setForm({ ...form, supervisor_id: e.target.value })}
                   >
-                    {supervisores.map(supervisor => (
+                    {conActual(supervisores, actuales.supervisor).map(supervisor => (
                       <MenuItem key={supervisor.id} value={supervisor.id}>
                         {supervisor.nombre}
                       </MenuItem>
                     ))}
           </Select>
         </FormControl>
+                {supervisoresCursor && (
+                  <Button size="small" onClick={() => loadSupervisores(supervisoresCursor)} sx={{ mt: 1 }}>
+                    Cargar más supervisores
+                  </Button>
+                )}
               </Grid>
               <Grid size={{ xs: 12, md: 4 }}>
                 <TextField